@@ -0,0 +1,78 @@
+"""Face counts and runtime of the convert_svg_to_fbx.py merge stage on triangulated pixel tiles.
+
+Every opaque pixel starts as two triangles, like a per-pixel SVG imported by Blender after remove_doubles.
+The merge helpers run on the same arrays convert_svg_to_fbx.py reads with foreach_get.
+
+python -m benchmarks.bench_face_merge [--size 32] [--tiles 8]
+"""
+import argparse
+import importlib.util
+import os
+import time
+import numpy as np
+from benchmarks.bench_svg_writer import TILE_GENERATORS
+from core.tile_writer import color_keys
+
+__spec = importlib.util.spec_from_file_location(
+    'geometry', os.path.join(os.path.dirname(__file__), '..', 'scripts', 'blender', 'geometry.py'))
+geometry = importlib.util.module_from_spec(__spec)
+__spec.loader.exec_module(geometry)
+
+
+def __triangulated_tile(pixels: np.ndarray) -> dict:
+    keys = color_keys(pixels)
+    height, width = keys.shape
+    ys, xs = np.nonzero(keys)
+
+    def vertex(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        return y * (width + 1) + x
+
+    faces = np.concatenate([np.stack([vertex(xs, ys), vertex(xs + 1, ys), vertex(xs + 1, ys + 1)], axis=1),
+                            np.stack([vertex(xs, ys), vertex(xs + 1, ys + 1), vertex(xs, ys + 1)], axis=1)])
+    grid_y, grid_x = np.mgrid[0:height + 1, 0:width + 1]
+    coords = np.stack([grid_x.ravel(), grid_y.ravel(), np.zeros(grid_x.size)], axis=1).astype(np.float64)
+    loop_edges = np.sort(np.stack([faces, np.roll(faces, -1, axis=1)], axis=2).reshape(-1, 2), axis=1)
+    edges, loop_edge_index = np.unique(loop_edges, axis=0, return_inverse=True)
+    return {'coords': coords, 'faces': faces, 'edges': edges, 'loop_edges': loop_edge_index.reshape(-1),
+            'keys': np.unique(np.concatenate([keys[ys, xs]] * 2), return_inverse=True)[1]}
+
+
+def __merge(tile: dict, grid: bool) -> int:
+    face_count = len(tile['faces'])
+    loop_totals = np.full(face_count, 3)
+    faces = geometry.edge_faces(tile['loop_edges'], geometry.loop_faces(np.arange(face_count) * 3, loop_totals),
+                                len(tile['edges']))
+    normals = np.tile([0.0, 0.0, 1.0], (face_count, 1))
+    edges = geometry.diagonal_edges(tile['coords'][tile['edges']], faces, loop_totals, normals, tile['keys'])
+    # Dissolving a diagonal turns its two triangles into one quad
+    pair_faces = faces[edges]
+    if not grid:
+        return face_count - len(edges)
+    quads = pair_faces.min(axis=1)
+    corners = tile['coords'][tile['faces'][quads]]
+    bounds = np.hstack([corners.min(axis=1)[:, :2], corners.max(axis=1)[:, :2]])
+    _, outlines, _ = geometry.merge_grid(bounds, np.ones(len(quads)), tile['keys'][quads])
+    return len(outlines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', help='tile size in pixels', type=int, default=32)
+    parser.add_argument('--tiles', help='tiles per kind', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f'{"kind":<8} {"merge":<6} {"faces":>8} {"merged":>8} {"ms":>8}')
+    for kind, generator in TILE_GENERATORS.items():
+        tiles = [__triangulated_tile(generator(rng, args.size)) for _ in range(args.tiles)]
+        faces = sum(len(tile['faces']) for tile in tiles) / len(tiles)
+        for merge in ['pairs', 'grid']:
+            start = time.perf_counter()
+            merged = sum(__merge(tile, merge == 'grid') for tile in tiles) / len(tiles)
+            ms = (time.perf_counter() - start) * 1000 / len(tiles)
+            print(f'{kind:<8} {merge:<6} {faces:>8.1f} {merged:>8.1f} {ms:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Compare the per-polygon material consolidation of convert_svg_to_fbx.py with the vectorized grouping.
+
+The polygon loop is replayed on plain lists, the way it ran over obj.data.polygons.
+
+python -m benchmarks.bench_material_groups [--faces 1000 10000 50000] [--colors 100 500]
+"""
+import argparse
+import importlib.util
+import os
+import time
+import numpy as np
+
+__spec = importlib.util.spec_from_file_location(
+    'geometry', os.path.join(os.path.dirname(__file__), '..', 'scripts', 'blender', 'geometry.py'))
+geometry = importlib.util.module_from_spec(__spec)
+__spec.loader.exec_module(geometry)
+
+
+def __loop_groups(polygon_colors: list) -> list:
+    materials = []
+    unique_materials = {}
+    material_indices = []
+    for color in polygon_colors:
+        color_str = f"{color[0]:.3f}_{color[1]:.3f}_{color[2]:.3f}"
+        if color_str not in unique_materials:
+            unique_materials[color_str] = color_str
+            materials.append(color_str)
+        material = unique_materials[color_str]
+        # find_material_index scanned the material list for every polygon
+        material_indices.append(next(i for i, m in enumerate(materials) if m == material))
+    return material_indices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--faces', help='polygon counts', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--colors', help='color counts', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f'{"faces":>7} {"colors":>7} {"loop ms":>9} {"numpy ms":>9} {"speedup":>8}')
+    for faces in args.faces:
+        for colors in args.colors:
+            palette = np.hstack([rng.random((colors, 3)), np.ones((colors, 1))])
+            polygon_colors = palette[rng.integers(0, colors, faces)]
+
+            start = time.perf_counter()
+            expected = __loop_groups(polygon_colors.tolist())
+            loop_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            _, indices = geometry.group_colors(polygon_colors)
+            numpy_ms = (time.perf_counter() - start) * 1000
+
+            assert indices.tolist() == expected
+            print(f'{faces:>7} {colors:>7} {loop_ms:>9.2f} {numpy_ms:>9.2f} {loop_ms / numpy_ms:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
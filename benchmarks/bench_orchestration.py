@@ -0,0 +1,135 @@
+"""Time run_cli end to end with stand-in Aseprite and Blender executables on synthetic sheets.
+
+python -m benchmarks.bench_orchestration [--sheets 4] [--tiles 64] [--tile 32] [--jobs 1,2,4]
+    [--modes blender,stream,persistent,native,cached] [--aseprite_latency 0.2] [--blender_latency 1.0] ...
+
+The stubs in benchmarks/stubs follow the command line contracts of convert_to_svg.lua and convert_svg_to_fbx.py
+and are installed through the [App] paths of a temporary config.ini, no Aseprite or Blender is needed.
+Overhead is the wall time not explained by the process time spread over --jobs.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import numpy as np
+from cli import run_cli
+from core.aseprite_file import write_sprite
+from core.common import parse_args, ScriptError
+from core.config import Config, save_config
+
+# run_cli arguments of every mode, the cached mode converts once to fill the cache before it is timed
+MODES = {
+    'blender': [],
+    'stream': ['--stream'],
+    'persistent': ['--persistent_workers'],
+    'native': ['--backend', 'native'],
+    'cached': []
+}
+STUBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stubs')
+
+
+def __synthetic_sheet(tiles: int, tile: int, seed: int) -> np.ndarray:
+    rows = max(row for row in range(1, int(tiles ** 0.5) + 1) if tiles % row == 0)
+    rng = np.random.default_rng(seed)
+    palette = rng.integers(0, 256, (32, 4), dtype=np.uint8)
+    palette[:, 3] = 255
+    palette[0, 3] = 0
+    blocks = palette[rng.integers(0, len(palette), (rows * tile // 4, tiles // rows * tile // 4))]
+    return np.kron(blocks, np.ones((4, 4, 1), dtype=np.uint8))
+
+
+def __install_stub(directory: str, stub: str, startup_seconds: float, tile_seconds: float) -> str:
+    """Write an executable that runs the stub with its latency, return its path."""
+    path = os.path.join(directory, os.path.splitext(stub)[0])
+    with open(path, 'w') as file:
+        file.write('#!/bin/sh\n'
+                   f'FAKE_STARTUP_SECONDS={startup_seconds} FAKE_TILE_SECONDS={tile_seconds} '
+                   f'exec "{sys.executable}" -u "{os.path.join(STUBS_DIR, stub)}" "$@"\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def __run(argv: list) -> float:
+    args, _ = parse_args(argv)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_cli(args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sheets', help='number of sheets converted in one batch', type=int, default=4)
+    parser.add_argument('--tiles', help='tiles per sheet', type=int, default=64)
+    parser.add_argument('--tile', help='tile size in pixels', type=int, default=32)
+    parser.add_argument('--jobs', help='comma separated --jobs values', default='1,2,4')
+    parser.add_argument('--modes', help=f'comma separated modes: {", ".join(MODES)}', default=','.join(MODES))
+    parser.add_argument('--aseprite_latency', help='aseprite startup seconds', type=float, default=0.2)
+    parser.add_argument('--aseprite_tile_latency', help='aseprite seconds per tile', type=float, default=0.002)
+    parser.add_argument('--blender_latency', help='blender startup seconds', type=float, default=1.0)
+    parser.add_argument('--blender_tile_latency', help='blender seconds per tile', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    modes = args.modes.split(',')
+    if any(mode not in MODES for mode in modes):
+        parser.error(f'--modes must be a comma separated subset of {",".join(MODES)}')
+
+    temp_dir = tempfile.mkdtemp()
+    sheets_dir = os.path.join(temp_dir, 'sheets')
+    os.makedirs(sheets_dir)
+    for i in range(args.sheets):
+        write_sprite(os.path.join(sheets_dir, f'sheet_{i}.aseprite'),
+                     __synthetic_sheet(args.tiles, args.tile, args.seed + i))
+    # load_config reads config.ini from the working directory
+    save_config(Config(blender=__install_stub(temp_dir, 'fake_blender.py', args.blender_latency,
+                                              args.blender_tile_latency),
+                       aseprite=__install_stub(temp_dir, 'fake_aseprite.py', args.aseprite_latency,
+                                               args.aseprite_tile_latency)),
+                os.path.join(temp_dir, 'config.ini'))
+    working_dir = os.getcwd()
+    os.chdir(temp_dir)
+
+    tiles = args.sheets * args.tiles
+    print(f'{args.sheets} sheets of {args.tiles} tiles of {args.tile}x{args.tile}, '
+          f'aseprite {args.aseprite_latency} s + {args.aseprite_tile_latency} s/tile, '
+          f'blender {args.blender_latency} s + {args.blender_tile_latency} s/tile')
+    print(f'{"mode":<11} {"jobs":>4} {"total s":>8} {"tiles/s":>8} {"procs":>6} {"busy s":>8} {"wait s":>8} '
+          f'{"overhead":>8} {"speedup":>8}')
+    try:
+        for mode in modes:
+            baseline = None
+            for jobs in [int(each) for each in args.jobs.split(',')]:
+                name = f'{mode}_{jobs}'
+                profile = os.path.join(temp_dir, f'{name}.json')
+                argv = ['-b', '-i', sheets_dir, '-o', os.path.join(temp_dir, name), '--create_output_dir',
+                        '-s', f'{args.tile}x{args.tile}', '-j', str(jobs), *MODES[mode]]
+                if mode == 'cached':
+                    argv += ['--cache_dir', os.path.join(temp_dir, f'{name}_cache')]
+                    __run(argv)
+                else:
+                    argv.append('--no_cache')
+                try:
+                    seconds = __run(argv + ['--profile', profile])
+                except ScriptError as e:
+                    print(f'{mode:<11} {jobs:>4} failed: {e.message}')
+                    continue
+                with open(profile, encoding='utf-8') as file:
+                    processes = json.load(file)['processes']
+                busy = sum(each['seconds'] for each in processes)
+                waited = sum(each['wait_seconds'] for each in processes)
+                baseline = baseline or seconds
+                print(f'{mode:<11} {jobs:>4} {seconds:>8.2f} {tiles / seconds:>8.1f} {len(processes):>6} '
+                      f'{busy:>8.2f} {waited:>8.2f} {seconds - busy / jobs:>8.2f} {baseline / seconds:>8.2f}')
+    finally:
+        os.chdir(working_dir)
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main()
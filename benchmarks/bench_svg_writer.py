@@ -0,0 +1,95 @@
+"""Compare per-pixel SVG tiles (the Aseprite export) with the merged-rectangle native writer.
+
+python -m benchmarks.bench_svg_writer [--size 32] [--tiles 8] [--blender path/to/blender]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+import numpy as np
+from core.tile_writer import greedy_rectangles, pixel_rectangles, write_svg
+
+__IMPORT_SCRIPT = ('import bpy, sys, time\n'
+                   'start = time.perf_counter()\n'
+                   'bpy.ops.import_curve.svg(filepath=sys.argv[-1])\n'
+                   'print("IMPORT_TIME", time.perf_counter() - start)\n')
+
+
+def __noise_tile(rng: np.random.Generator, size: int) -> np.ndarray:
+    palette = rng.integers(0, 256, (16, 4), dtype=np.uint8)
+    palette[:, 3] = 255
+    palette[0, 3] = 0
+    return palette[rng.integers(0, len(palette), (size, size))]
+
+
+def __blocky_tile(rng: np.random.Generator, size: int) -> np.ndarray:
+    block = max(1, size // 8)
+    return np.kron(__noise_tile(rng, size // block), np.ones((block, block, 1), dtype=np.uint8))
+
+
+def __sprite_tile(rng: np.random.Generator, size: int) -> np.ndarray:
+    y, x = np.mgrid[0:size, 0:size]
+    radius = np.hypot(x - size / 2 + 0.5, y - size / 2 + 0.5)
+    palette = np.array([[0, 0, 0, 0], [40, 40, 60, 255], [200, 80, 60, 255], [250, 200, 120, 255]],
+                       dtype=np.uint8)
+    index = np.select([radius > size * 0.45, radius > size * 0.4, radius > size * 0.2], [0, 1, 2], 3)
+    index[rng.random((size, size)) < 0.02] = 1
+    return palette[index]
+
+
+TILE_GENERATORS: Dict[str, Callable[[np.random.Generator, int], np.ndarray]] = {
+    'noise': __noise_tile,
+    'blocky': __blocky_tile,
+    'sprite': __sprite_tile,
+}
+
+
+def __blender_import_time(blender: str, svg_file: str, script_file: str) -> float:
+    ret = subprocess.run([blender, '-b', '--factory-startup', '-P', script_file, '--', svg_file],
+                         capture_output=True, text=True)
+    for line in ret.stdout.splitlines():
+        if line.startswith('IMPORT_TIME'):
+            return float(line.split()[1])
+    raise RuntimeError(f'Blender import failed: {ret.stderr}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', help='tile size in pixels', type=int, default=32)
+    parser.add_argument('--tiles', help='tiles per kind', type=int, default=8)
+    parser.add_argument('--blender', help='blender executable, measures svg import time when set')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    temp_dir = tempfile.mkdtemp()
+    script_file = os.path.join(temp_dir, 'import_svg.py')
+    with open(script_file, 'w') as file:
+        file.write(__IMPORT_SCRIPT)
+    try:
+        print(f'{"kind":<8} {"writer":<7} {"elements":>9} {"write ms":>9} {"import s":>9}')
+        for kind, generator in TILE_GENERATORS.items():
+            tiles = [generator(rng, args.size) for _ in range(args.tiles)]
+            for writer, merge, count in [('pixel', False, pixel_rectangles), ('merged', True, greedy_rectangles)]:
+                elements = sum(len(count(tile)) for tile in tiles)
+                svg_files = [os.path.join(temp_dir, f'{kind}_{writer}_{i}.svg') for i in range(len(tiles))]
+                start = time.perf_counter()
+                for svg_file, tile in zip(svg_files, tiles):
+                    write_svg(svg_file, tile, merge)
+                write_ms = (time.perf_counter() - start) * 1000 / len(tiles)
+                import_s = ''
+                if args.blender:
+                    times = [__blender_import_time(args.blender, svg_file, script_file) for svg_file in svg_files]
+                    import_s = f'{sum(times) / len(times):.3f}'
+                print(f'{kind:<8} {writer:<7} {elements / len(tiles):>9.1f} {write_ms:>9.2f} {import_s:>9}')
+                sys.stdout.flush()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Time the tile export of a large synthetic sheet with convert_to_svg.lua and the native exporter.
+
+python -m benchmarks.bench_tile_export [--sheet 2048] [--tile 32] [--aseprite path/to/aseprite]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from core.aseprite_file import write_sprite
+from core.common import call_aseprite_script
+from core.config import Size
+from core.tile_writer import export_tiles
+
+
+def __synthetic_sheet(size: int, tile: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    palette = rng.integers(0, 256, (32, 4), dtype=np.uint8)
+    palette[:, 3] = 255
+    palette[0, 3] = 0
+    # Blocks of 4x4 pixels so tiles look like pixel art rather than noise
+    blocks = palette[rng.integers(0, len(palette), (size // 4, size // 4))]
+    sheet = np.kron(blocks, np.ones((4, 4, 1), dtype=np.uint8))
+    # A transparent border in every tile
+    sheet[::tile] = 0
+    sheet[:, ::tile] = 0
+    return sheet
+
+
+def __time(function) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sheet', help='sheet size in pixels', type=int, default=2048)
+    parser.add_argument('--tile', help='tile size in pixels', type=int, default=32)
+    parser.add_argument('--aseprite', help='also time convert_to_svg.lua (aseprite from config.ini)',
+                        default=False, action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    input_file = os.path.join(temp_dir, 'sheet.aseprite')
+    write_sprite(input_file, __synthetic_sheet(args.sheet, args.tile, args.seed))
+    tiles = (args.sheet // args.tile) ** 2
+    print(f'{args.sheet}x{args.sheet} sheet, {tiles} tiles of {args.tile}x{args.tile}')
+    print(f'{"exporter":<10} {"formats":<8} {"total s":>8} {"ms/tile":>8}')
+    try:
+        for formats in [['svg', 'png'], ['svg'], ['png']]:
+            runs = [('native', lambda: export_tiles(input_file, output, Size(args.tile, args.tile), formats=formats))]
+            if args.aseprite:
+                runs.append(('aseprite', lambda: call_aseprite_script(
+                    'scripts/aseprite/convert_to_svg.lua', file=input_file, output=output,
+                    width=args.tile, height=args.tile, formats=','.join(formats))))
+            for exporter, run in runs:
+                output = os.path.join(temp_dir, f'{exporter}_{"_".join(formats)}')
+                os.makedirs(output)
+                seconds = __time(run)
+                print(f'{exporter:<10} {",".join(formats):<8} {seconds:>8.2f} {seconds * 1000 / tiles:>8.2f}')
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Stand-in for Aseprite running convert_to_svg.lua, for benchmarks without Aseprite.
+
+fake_aseprite.py -b --script-param file=sheet.aseprite --script-param output=dir
+    [width, height, formats, shard, shards] --script convert_to_svg.lua
+
+Tiles and the manifest are written by the native exporter with the lines the Lua script prints.
+FAKE_STARTUP_SECONDS and FAKE_TILE_SECONDS add latency at startup and after every svg tile.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.aseprite_file import AsepriteFileError  # noqa: E402
+from core.config import parse_size  # noqa: E402
+from core.manifest import TILE_FORMAT_VALUES  # noqa: E402
+from core.tile_writer import export_tiles  # noqa: E402
+
+
+def main() -> int:
+    time.sleep(float(os.environ.get('FAKE_STARTUP_SECONDS', 0)))
+    tile_seconds = float(os.environ.get('FAKE_TILE_SECONDS', 0))
+    params = {}
+    argv = sys.argv[1:]
+    for i, arg in enumerate(argv):
+        if arg == '--script-param' and i + 1 < len(argv) and '=' in argv[i + 1]:
+            key, value = argv[i + 1].split('=', 1)
+            params[key] = value
+    for key in ['file', 'output']:
+        if key not in params:
+            print(f'Param "{key}" is required!', file=sys.stderr)
+            return 1
+    formats = params.get('formats', ','.join(TILE_FORMAT_VALUES)).split(',')
+    if not all(format in TILE_FORMAT_VALUES for format in formats):
+        print(f'Unknown format: {params["formats"]}', file=sys.stderr)
+        return 1
+    size = parse_size(f'{params["width"]}x{params["height"]}') if 'width' in params and 'height' in params else None
+    shard, shards = int(params.get('shard', 0)), int(params.get('shards', 1))
+    if shards < 1 or not 0 <= shard < shards:
+        print(f'Invalid shard: {shard} of {shards}', file=sys.stderr)
+        return 1
+    try:
+        export_tiles(params['file'], params['output'], size, on_svg=lambda _: time.sleep(tile_seconds),
+                     formats=formats, shard=shard, shards=shards)
+    except (AsepriteFileError, OSError) as e:
+        print(f'Failed to load file: {params["file"]}: {e}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
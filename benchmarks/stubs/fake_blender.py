@@ -0,0 +1,111 @@
+"""Stand-in for Blender running convert_svg_to_fbx.py, for benchmarks without Blender.
+
+fake_blender.py -b -P convert_svg_to_fbx.py -- (-o dir (-i a.svg ... | --input_list files.txt) | --serve
+    | --combine job.json) [options]
+
+Every svg is "converted" to a placeholder fbx with the lines the script prints, --serve answers stdin jobs
+like the real worker. FAKE_STARTUP_SECONDS and FAKE_TILE_SECONDS add latency at startup and per svg.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.common import FBX_EXPORTED_PREFIX, WORKER_RESULT_PREFIX  # noqa: E402
+from core.profiler import TILE_STATS_PREFIX  # noqa: E402
+
+
+class JobArgumentParser(argparse.ArgumentParser):
+    def error(self, message):
+        raise ValueError(message)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = JobArgumentParser(add_help=False)
+    parser.add_argument('-i', '--input', nargs='+', default=[])
+    parser.add_argument('--input_list')
+    parser.add_argument('-o', '--output')
+    parser.add_argument('--serve', default=False, action='store_true')
+    parser.add_argument('--combine')
+    # Mesh options do not change the placeholder output
+    for option in ['--scale', '--extrude', '--pivot', '--merge', '--segments', '--svg_import', '--palette']:
+        parser.add_argument(option)
+    return parser
+
+
+def input_files(args: argparse.Namespace) -> list:
+    if args.input_list is not None:
+        with open(args.input_list, encoding='utf-8') as input_list:
+            args.input += [line.strip() for line in input_list if line.strip()]
+    if args.output is None or not args.input:
+        raise ValueError('-o/--output and -i/--input or --input_list are required')
+    return args.input
+
+
+def convert_files(files: list, output_dir: str, tile_seconds: float) -> list:
+    failed = []
+    for svg_file_path in files:
+        start = time.perf_counter()
+        time.sleep(tile_seconds)
+        if not os.path.isfile(svg_file_path):
+            print(f'{svg_file_path}: No such file', file=sys.stderr)
+            failed.append({'file': svg_file_path, 'error': 'No such file'})
+            continue
+        output_file_path = os.path.join(output_dir, os.path.splitext(os.path.basename(svg_file_path))[0] + '.fbx')
+        with open(output_file_path, 'wb') as file:
+            file.write(b'Kaydara FBX Binary  \0')
+        print(f'{FBX_EXPORTED_PREFIX}{output_file_path}')
+        stats = {'file': svg_file_path, 'vertices': 0, 'faces': 0, 'materials': 0,
+                 'seconds': {'import': 0, 'cleanup': 0, 'extrude': 0, 'export': time.perf_counter() - start}}
+        print(TILE_STATS_PREFIX + json.dumps(stats), flush=True)
+    return failed
+
+
+def combine_tiles(job_file: str, tile_seconds: float):
+    with open(job_file, encoding='utf-8') as file:
+        job = json.load(file)
+    time.sleep(tile_seconds * len(job['meshes']))
+    with open(job['output'], 'wb') as file:
+        file.write(b'Kaydara FBX Binary  \0')
+    print(f'{FBX_EXPORTED_PREFIX}{job["output"]} ({len(job["meshes"])} meshes, {len(job["tiles"])} tiles)')
+
+
+def serve(parser: argparse.ArgumentParser, tile_seconds: float):
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        result = {'id': None, 'failed': [], 'error': None, 'memory': None}
+        try:
+            job = json.loads(line)
+            result['id'] = job.get('id')
+            args = parser.parse_args(job['args'])
+            result['failed'] = convert_files(input_files(args), args.output, tile_seconds)
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            result['error'] = str(e)
+        print(WORKER_RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def main() -> int:
+    time.sleep(float(os.environ.get('FAKE_STARTUP_SECONDS', 0)))
+    tile_seconds = float(os.environ.get('FAKE_TILE_SECONDS', 0))
+    parser = build_parser()
+    script_args = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    try:
+        args = parser.parse_args(script_args)
+        if args.serve:
+            serve(parser, tile_seconds)
+            return 0
+        if args.combine is not None:
+            combine_tiles(args.combine, tile_seconds)
+            return 0
+        failed = convert_files(input_files(args), args.output, tile_seconds)
+    except (ValueError, OSError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
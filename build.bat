@@ -1 +1 @@
-pyinstaller --onefile --add-data scripts/aseprite/convert_to_svg.lua;scripts/aseprite --add-data scripts/blender/convert_svg_to_fbx.py;scripts/blender .\main.py
\ No newline at end of file
+pyinstaller --onefile --add-data scripts/aseprite/convert_to_svg.lua;scripts/aseprite --add-data scripts/blender/convert_svg_to_fbx.py;scripts/blender --add-data scripts/blender/geometry.py;scripts/blender --add-data scripts/blender/svg_mesh.py;scripts/blender .\main.py
\ No newline at end of file
@@ -1,25 +1,191 @@
 import os
 import argparse
+import time
+from typing import List, Optional, Set
 
-from cli.cli_app import run_aseprite, run_blender
-from core.common import parse_args, ArgsError
+from cli.cli_app import run_aseprite, run_blender, run_native, run_streaming, run_native_combined, \
+    run_blender_combined, plan_sheet, restore_cached_tiles, store_cached_tiles, tile_extensions, run_batch, \
+    print_summary, run_watch
+from core.aseprite_file import AsepriteFileError
+from core.common import parse_args, ArgsError, ScriptError, expand_inputs, is_input_pattern, default_jobs, \
+    start_blender_pool, use_blender_pool, ProcessPolicy, use_process_policy
+from core.config import parse_size
+from core.journal import Journal, JOURNAL_DONE, journal_path
+from core.manifest import ManifestError, manifest_path, read_manifest
+from core.palette import export_palette
+from core.profiler import Profiler, use_profiler, profile_stage, profile_tile_counts
+from core.tile_cache import TileCache
+from core.tile_plan import TilePlan, aliases_path, link_aliases, write_aliases, unlink_shared_outputs, \
+    drop_empty_tiles
 
 
 def run_cli(args: argparse.Namespace):
     if args.batch and (args.input is None or args.output is None):
         raise ArgsError('--batch requires --input and --output')
 
-    if not os.path.isfile(args.input):
+    if not os.path.isdir(args.input) and not is_input_pattern(args.input) and not os.path.isfile(args.input):
         raise ArgsError(f'Input is not a file: {args.input}')
 
+    if 'svg' not in args.tile_formats and not args.svg_only and args.backend == 'blender':
+        raise ArgsError('--backend blender requires svg in --tile_formats')
+
+    if args.combine and args.backend == 'native' and args.mesh_format != 'glb':
+        raise ArgsError('--combine requires --mesh_format glb')
+
+    if args.resume and (args.svg_only or args.combine):
+        raise ArgsError('--resume resumes the tile mesh conversion, it cannot be used with --svg_only or --combine')
+
     if args.create_output_dir:
         os.makedirs(args.output, exist_ok=True)
     if not os.path.isdir(args.output):
         raise ArgsError(f'Output is not a directory: {args.output}')
 
-    run_aseprite(args)
-    if not args.svg_only:
-        run_blender(args)
+    if args.log_dir is not None:
+        os.makedirs(args.log_dir, exist_ok=True)
+    use_process_policy(ProcessPolicy(float(args.timeout) if args.timeout is not None else None, args.retries,
+                                     float(args.retry_backoff), args.log_dir))
+    profiler = None
+    if args.profile is not None:
+        profiler = Profiler()
+        use_profiler(profiler)
+    pool = None
+    if args.persistent_workers and not args.svg_only and args.backend == 'blender':
+        pool = start_blender_pool(args.jobs or default_jobs(), args.worker_memory_limit)
+        use_blender_pool(pool)
+    try:
+        if not args.watch:
+            __convert_inputs(args)
+            return
+        try:
+            __convert_inputs(args)
+        except (ScriptError, ManifestError, AsepriteFileError) as e:
+            print(e.message)
+        base_dir = expand_inputs(args.input)[1]
+        run_watch(args, lambda: expand_inputs(args.input)[0], base_dir, convert_file)
+    finally:
+        if pool is not None:
+            use_blender_pool(None)
+            pool.close()
+        use_process_policy(None)
+        if profiler is not None:
+            use_profiler(None)
+            __write_profile(profiler, args.profile)
+
+
+def __write_profile(profiler: Profiler, file_path: str):
+    for line in profiler.summary():
+        print(line)
+    try:
+        profiler.write(file_path)
+    except OSError as e:
+        print(f'Failed to write profile {file_path}: {e}')
+        return
+    print(f'Profile written: {file_path}')
+
+
+def __convert_inputs(args: argparse.Namespace):
+    if os.path.isfile(args.input):
+        convert_file(args)
+        return
+
+    inputs, base_dir = expand_inputs(args.input)
+    if not inputs:
+        raise ArgsError(f'No aseprite files found: {args.input}')
+    start = time.perf_counter()
+    results = run_batch(args, inputs, base_dir, convert_file)
+    print_summary(results, time.perf_counter() - start)
+    failed = [result for result in results if result.error is not None]
+    if failed:
+        raise ScriptError(f'{len(failed)} of {len(results)} files failed')
+
+
+def convert_file(args: argparse.Namespace):
+    cache = None if args.no_cache else TileCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    plan = None
+    combine = args.combine and not args.svg_only
+    # The journal records the tile keys of the conversion of every tile
+    if cache is not None or args.skip_empty or args.dedupe or not args.svg_only:
+        try:
+            with profile_stage('plan', args.input):
+                plan = plan_sheet(args)
+        except (AsepriteFileError, OSError) as e:
+            # Aseprite may still open a file the native reader cannot parse
+            print(f'Tile cache, empty tile skipping, deduplication, combined export and journal disabled: '
+                  f'{getattr(e, "message", e)}')
+            cache = None
+            combine = False
+    names = None
+    resumed = set()
+    if plan is not None:
+        unlink_shared_outputs(list(plan.keys), args.output, tile_extensions(args))
+        with profile_stage('cache restore', args.input):
+            names = set(restore_cached_tiles(args, cache, plan) if cache is not None else plan.unique)
+    journal = None
+    if plan is not None and not args.svg_only and not combine:
+        journal = Journal(journal_path(args.output, args.input), args.resume)
+        if args.resume:
+            resumed = journal.completed(plan.keys) & names
+            names -= resumed
+            print(f'Resumed: {len(resumed)} tiles already converted, {len(names)} left')
+
+    if args.materials == 'palette' and not args.svg_only:
+        with profile_stage('palette', args.input):
+            export_palette(args.input, args.output, parse_size(args.size))
+
+    try:
+        __convert_tiles(args, plan, names, combine, journal)
+    finally:
+        if journal is not None:
+            journal.close()
+
+    if plan is not None:
+        with profile_stage('link', args.input):
+            link_aliases(plan, args.output, tile_extensions(args))
+            if plan.empty:
+                drop_empty_tiles(plan, manifest_path(args.output, args.input))
+            if args.skip_empty or args.dedupe:
+                write_aliases(aliases_path(args.output, args.input), plan)
+    if cache is not None:
+        with profile_stage('cache store', args.input):
+            store_cached_tiles(args, cache, plan, names)
+
+    if args.profile is not None:
+        if plan is not None:
+            profile_tile_counts(args.input, len(plan.keys), len(names), len(plan.unique) - len(names) - len(resumed),
+                                len(resumed))
+        else:
+            tiles = len(read_manifest(manifest_path(args.output, args.input)).tiles)
+            profile_tile_counts(args.input, tiles, tiles)
+
+
+def __convert_tiles(args: argparse.Namespace, plan: Optional[TilePlan], names: Optional[Set[str]], combine: bool,
+                    journal: Optional[Journal]):
+    """Export the tiles and build their meshes, every finished or failed tile goes to the journal."""
+    def record_tile(name: str, files: List[str]):
+        journal.record(name, plan.keys[name], JOURNAL_DONE, files)
+
+    on_tile = record_tile if journal is not None else None
+    try:
+        if args.stream and not args.svg_only and args.backend == 'blender' and not combine:
+            with profile_stage('export and mesh', args.input):
+                run_streaming(args, names, on_tile)
+        else:
+            with profile_stage('export', args.input):
+                run_aseprite(args, names)
+            if not args.svg_only:
+                with profile_stage('mesh', args.input):
+                    if combine and args.backend == 'native':
+                        run_native_combined(args, plan)
+                    elif combine:
+                        run_blender_combined(args, plan)
+                    elif args.backend == 'native':
+                        run_native(args, names, on_tile)
+                    else:
+                        run_blender(args, names, on_tile)
+    except (ScriptError, ManifestError, AsepriteFileError) as e:
+        if journal is not None:
+            journal.record_failed(plan.keys, names, e.message)
+        raise
 
 
 if __name__ == '__main__':
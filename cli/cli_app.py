@@ -1,21 +1,82 @@
 import argparse
+import copy
+import json
 import os
-from core.common import call_aseprite_script, call_blender_script, get_files
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+from core.common import export_sheet, call_blender_script, convert_svg_files, convert_svg_stream, default_jobs, \
+    tool_digest, VERSION, ASEPRITE_SCRIPTS, BLENDER_SCRIPTS, SVG_EXPORTED_PREFIX, FBX_EXPORTED_PREFIX, NO_MESH_PREFIX, \
+    limit_processes, ScriptError, ArgsError
+from core.aseprite_file import read_sprite, read_sprite_size, read_tiles, sprite_tiles, composite_differences, \
+    AsepriteFileError
+from core.config import load_config, parse_size, Size
+from core.manifest import build_manifest, manifest_path, read_manifest, write_manifest, tile_name, ManifestError
+from core.mesher import build_mesh, write_mesh, write_instanced_glb, PIXEL_SIZE
+from core.palette import Palette, sheet_palette, palette_path
+from core.profiler import TileRecord, profile_tile
+from core.tile_cache import TileCache
+from core.tile_plan import TilePlan, plan_tiles, mesh_sources, combined_path
+from core.tile_writer import export_tiles
+from core.watcher import Watcher
 
+# Seconds between two checks of the input files in watch mode
+WATCH_INTERVAL = 0.25
 
-def run_aseprite(args: argparse.Namespace):
+
+def __read_tiles(args: argparse.Namespace) -> Dict[Tuple[int, int], np.ndarray]:
+    size = parse_size(args.size)
+    return read_tiles(args.input, size.width, size.height) if size is not None else read_tiles(args.input)
+
+
+def run_aseprite(args: argparse.Namespace, names: Optional[Set[str]] = None,
+                 on_svg: Optional[Callable[[str], None]] = None):
+    if names is not None and not names:
+        # Every tile was restored from the cache or converted by a resumed run, only the manifest is left to write
+        sprite = read_sprite(args.input)
+        write_manifest(manifest_path(args.output, args.input),
+                       build_manifest(args.input, args.output, Size(sprite.width, sprite.height), parse_size(args.size),
+                                      args.tile_formats))
+        return
+    if args.exporter == 'native':
+        export_tiles(args.input, args.output, parse_size(args.size), names, on_svg, args.tile_formats)
+        return
     kwargs = {
         'file': args.input,
-        'output': args.output
+        'output': args.output,
+        'formats': ','.join(args.tile_formats)
     }
     if args.size is not None:
         [tile_width, tile_height] = args.size.split('x')
         kwargs['width'] = tile_width
         kwargs['height'] = tile_height
-    call_aseprite_script('scripts/aseprite/convert_to_svg.lua', **kwargs)
+
+    def on_line(line: str):
+        if on_svg is not None and line.startswith(SVG_EXPORTED_PREFIX):
+            on_svg(line[len(SVG_EXPORTED_PREFIX):])
+
+    export_sheet(__export_shards(args), on_line, **kwargs)
+
+
+def __export_shards(args: argparse.Namespace) -> int:
+    """Aseprite processes for the export of a sheet, more than one per tile row would export nothing."""
+    shards = args.export_shards or args.jobs or default_jobs()
+    if shards == 1:
+        return 1
+    try:
+        height = read_sprite_size(args.input)[1]
+    except (AsepriteFileError, OSError):
+        # Aseprite reports the error
+        return 1
+    size = parse_size(args.size)
+    rows = height // size.height if size is not None else 1
+    return max(1, min(shards, rows))
 
 
-def run_blender(args: argparse.Namespace):
+def __blender_kwargs(args: argparse.Namespace) -> Dict[str, str]:
     kwargs = {
         '-o': args.output
     }
@@ -25,8 +86,297 @@ def run_blender(args: argparse.Namespace):
         kwargs['--extrude'] = args.extrude
     if args.pivot is not None:
         kwargs['--pivot'] = args.pivot
+    if args.merge is not None:
+        kwargs['--merge'] = args.merge
+    if args.segments is not None:
+        kwargs['--segments'] = args.segments
+    if args.svg_import is not None:
+        kwargs['--svg_import'] = args.svg_import
+    if args.materials == 'palette':
+        kwargs['--palette'] = palette_path(args.output, args.input)
+    return kwargs
+
+
+def __sheet_palette(args: argparse.Namespace, tiles: Dict[Tuple[int, int], np.ndarray]) -> Optional[Palette]:
+    return sheet_palette(tiles.values()) if args.materials == 'palette' else None
+
+
+def __blender_on_line(on_tile: Optional[Callable[[str, List[str]], None]]) -> Optional[Callable[[str], None]]:
+    """Call on_tile with the name and the mesh files of every tile Blender finishes."""
+    if on_tile is None:
+        return None
+
+    def on_line(line: str):
+        if line.startswith(FBX_EXPORTED_PREFIX):
+            file_path = line[len(FBX_EXPORTED_PREFIX):].strip()
+            on_tile(os.path.splitext(os.path.basename(file_path))[0], [file_path])
+        elif line.startswith(NO_MESH_PREFIX):
+            on_tile(os.path.splitext(os.path.basename(line[len(NO_MESH_PREFIX):].strip()))[0], [])
+
+    return on_line
+
+
+def run_blender(args: argparse.Namespace, names: Optional[Set[str]] = None,
+                on_tile: Optional[Callable[[str, List[str]], None]] = None):
+    tiles = read_manifest(manifest_path(args.output, args.input)).tiles
+    files = [tile.svg for tile in tiles if tile.svg is not None and (names is None or tile.name in names)]
+    convert_svg_files(files, args.jobs or default_jobs(), __blender_on_line(on_tile), **__blender_kwargs(args))
+
+
+def run_streaming(args: argparse.Namespace, names: Optional[Set[str]] = None,
+                  on_tile: Optional[Callable[[str, List[str]], None]] = None):
+    """Export the tiles and convert each svg in Blender as soon as it is written."""
+    def produce(submit: Callable[[str], None]):
+        def on_svg(svg_file: str):
+            if names is None or os.path.splitext(os.path.basename(svg_file))[0] in names:
+                submit(svg_file)
+
+        run_aseprite(args, names, on_svg)
+
+    convert_svg_stream(produce, args.jobs or default_jobs(), __blender_on_line(on_tile), **__blender_kwargs(args))
+
+
+def run_native(args: argparse.Namespace, names: Optional[Set[str]] = None,
+               on_tile: Optional[Callable[[str, List[str]], None]] = None):
     filename = os.path.basename(args.input)
-    files = get_files(args.output, f'{filename}_tile_\\d+_\\d+\\.svg$')
-    for file in files:
-        call_blender_script('scripts/blender/convert_svg_to_fbx.py',
-                            **kwargs, **{'-i': file})
+    tiles = __read_tiles(args)
+    palette = __sheet_palette(args, tiles)
+    texture = os.path.basename(palette_path(args.output, args.input))
+    for (x, y), pixels in tiles.items():
+        name = tile_name(filename, x, y)
+        if names is not None and name not in names:
+            continue
+        start = time.perf_counter()
+        mesh = build_mesh(pixels, float(args.extrude or 1), float(args.scale or 1), args.pivot or 'center')
+        if mesh is None:
+            print(f'No opaque pixels in tile: {name}')
+            if on_tile is not None:
+                on_tile(name, [])
+            continue
+        built = time.perf_counter()
+        mesh_file_path = os.path.join(args.output, f'{name}.{args.mesh_format}')
+        write_mesh(mesh_file_path, mesh, palette, texture)
+        print(f'File exported to {args.mesh_format.upper()}: {mesh_file_path}')
+        # The native mesher builds and extrudes in one step
+        profile_tile(TileRecord(mesh_file_path, mesh.face_count * 4, mesh.face_count,
+                                len(np.unique(mesh.colors, axis=0)), extrude_seconds=built - start,
+                                export_seconds=time.perf_counter() - built))
+        if on_tile is not None:
+            files = [mesh_file_path]
+            if args.mesh_format == 'obj':
+                files.append(os.path.splitext(mesh_file_path)[0] + '.mtl')
+            on_tile(name, files)
+
+
+def run_native_combined(args: argparse.Namespace, plan: TilePlan):
+    """Write one glb of the sheet with a mesh per tile key and a node per tile."""
+    filename = os.path.basename(args.input)
+    scale = float(args.scale or 1)
+    meshes, nodes = {}, []
+    tiles = __read_tiles(args)
+    for (x, y), pixels in tiles.items():
+        name = tile_name(filename, x, y)
+        if name in plan.empty:
+            continue
+        key = plan.keys[name]
+        if key not in meshes:
+            meshes[key] = build_mesh(pixels, float(args.extrude or 1), scale, args.pivot or 'center')
+        if meshes[key] is None:
+            continue
+        height, width = pixels.shape[:2]
+        nodes.append((name, key, np.array([x * width, -y * height, 0]) * PIXEL_SIZE * scale + meshes[key].origin))
+    meshes = {key: mesh for key, mesh in meshes.items() if mesh is not None}
+    file_path = combined_path(args.output, args.input, '.glb')
+    write_instanced_glb(file_path, meshes, nodes, __sheet_palette(args, tiles))
+    print(f'File exported to GLB: {file_path} ({len(meshes)} meshes, {len(nodes)} tiles)')
+
+
+def run_blender_combined(args: argparse.Namespace, plan: TilePlan):
+    """Convert the svg of every tile key once in Blender and export the sheet as one fbx of instances."""
+    manifest = read_manifest(manifest_path(args.output, args.input))
+    job = {
+        'output': combined_path(args.output, args.input, '.fbx'),
+        'tile_width': manifest.tile_width,
+        'tile_height': manifest.tile_height,
+        'meshes': {key: os.path.join(args.output, f'{name}.svg') for key, name in mesh_sources(plan).items()},
+        'tiles': [{'name': tile.name, 'key': plan.keys[tile.name], 'x': tile.x, 'y': tile.y}
+                  for tile in manifest.tiles if tile.name in plan.keys and tile.name not in plan.empty]
+    }
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as job_file:
+        json.dump(job, job_file)
+    try:
+        kwargs = __blender_kwargs(args)
+        kwargs['--combine'] = job_file.name
+        call_blender_script('scripts/blender/convert_svg_to_fbx.py', **kwargs)
+    finally:
+        os.remove(job_file.name)
+
+
+def tile_extensions(args: argparse.Namespace) -> List[str]:
+    extensions = [f'.{format}' for format in args.tile_formats]
+    if args.svg_only or args.combine:
+        # A combined mesh belongs to the sheet, not to a tile
+        return extensions
+    if args.backend == 'blender':
+        return extensions + ['.fbx']
+    return extensions + (['.obj', '.mtl'] if args.mesh_format == 'obj' else [f'.{args.mesh_format}'])
+
+
+def __cache_params(args: argparse.Namespace) -> dict:
+    params = {
+        'version': VERSION,
+        'exporter': args.exporter,
+        'extensions': tile_extensions(args),
+        'scale': float(args.scale or 1),
+        'extrude': float(args.extrude or 1),
+        'pivot': args.pivot or 'center',
+        'materials': args.materials or 'color'
+    }
+    if args.backend == 'blender':
+        params['merge'] = args.merge
+        params['segments'] = args.segments
+        params['svg_import'] = args.svg_import
+    # Outputs of older scripts or Aseprite and Blender versions are not reused
+    config = load_config()
+    scripts, executables = [], []
+    if args.exporter == 'aseprite':
+        scripts += ASEPRITE_SCRIPTS
+        executables.append(config.aseprite)
+    else:
+        scripts.append('core/tile_writer.py')
+    if not args.svg_only and args.backend == 'blender':
+        scripts += BLENDER_SCRIPTS
+        executables.append(config.blender)
+    elif not args.svg_only:
+        scripts += ['core/mesher.py', 'core/palette.py']
+    params['tools'] = tool_digest(scripts, executables)
+    return params
+
+
+def plan_sheet(args: argparse.Namespace) -> TilePlan:
+    """Tile keys, empty tiles and duplicates from the natively composited sheet.
+
+    Raises AsepriteFileError when Aseprite exports the tiles and renders the sheet differently.
+    """
+    filename = os.path.basename(args.input)
+    sprite = read_sprite(args.input)
+    differences = composite_differences(sprite)
+    if args.exporter == 'aseprite' and differences:
+        raise AsepriteFileError(f'Tiles are not composited like Aseprite does: {", ".join(differences)}')
+    size = parse_size(args.size)
+    tiles = sprite_tiles(sprite, size.width, size.height) if size is not None else sprite_tiles(sprite)
+    params = __cache_params(args)
+    if args.materials == 'palette':
+        # The texture coordinates of a tile depend on the colors of the whole sheet
+        params['palette'] = sheet_palette(tiles.values()).key
+        # An fbx references the palette image of its sheet by absolute path, an obj by file name, a glb embeds it
+        image = palette_path(args.output, args.input)
+        if args.backend == 'blender':
+            params['palette_image'] = os.path.abspath(image)
+        elif args.mesh_format == 'obj':
+            params['palette_image'] = os.path.basename(image)
+    return plan_tiles({tile_name(filename, x, y): pixels for (x, y), pixels in tiles.items()}, params,
+                      args.skip_empty, args.dedupe)
+
+
+def restore_cached_tiles(args: argparse.Namespace, cache: TileCache, plan: TilePlan) -> List[str]:
+    """Copy the cached tiles to the output directory, return the unique tiles left to convert."""
+    pending = []
+    for name in plan.unique:
+        if cache.fetch(plan.keys[name], args.output, name):
+            print(f'Tile restored from cache: {name}')
+        else:
+            pending.append(name)
+    return pending
+
+
+def store_cached_tiles(args: argparse.Namespace, cache: TileCache, plan: TilePlan, names: Set[str]):
+    for name in names:
+        files = [os.path.join(args.output, name + extension) for extension in tile_extensions(args)]
+        cache.store(plan.keys[name], [file for file in files if os.path.isfile(file)])
+    cache.evict()
+
+
+@dataclass
+class FileResult:
+    input: str
+    tiles: int = 0
+    seconds: float = 0
+    error: Optional[str] = None
+
+
+def batch_file_args(args: argparse.Namespace, input_file: str, base_dir: str) -> argparse.Namespace:
+    """Arguments of one file of a batch, its outputs keep the directory layout below base_dir."""
+    file_args = copy.copy(args)
+    file_args.input = input_file
+    relative_dir = os.path.relpath(os.path.dirname(os.path.abspath(input_file)), os.path.abspath(base_dir))
+    file_args.output = os.path.normpath(os.path.join(args.output, relative_dir))
+    return file_args
+
+
+def run_batch(args: argparse.Namespace, inputs: List[str], base_dir: str,
+              convert: Callable[[argparse.Namespace], None]) -> List[FileResult]:
+    """Convert every input file, files run in parallel and share one limit of --jobs processes."""
+    jobs = args.jobs or default_jobs()
+
+    def run(input_file: str) -> FileResult:
+        result = FileResult(input_file)
+        start = time.perf_counter()
+        try:
+            file_args = batch_file_args(args, input_file, base_dir)
+            os.makedirs(file_args.output, exist_ok=True)
+            convert(file_args)
+            result.tiles = len(read_manifest(manifest_path(file_args.output, input_file)).tiles)
+        except (ScriptError, ArgsError, ManifestError, AsepriteFileError) as e:
+            result.error = e.message
+        except OSError as e:
+            result.error = str(e)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    limit_processes(jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(run, inputs))
+    finally:
+        limit_processes(None)
+
+
+def print_summary(results: List[FileResult], seconds: float):
+    failed = [result for result in results if result.error is not None]
+    tiles = sum(result.tiles for result in results)
+    print(f'Converted {len(results) - len(failed)} of {len(results)} files, {tiles} tiles in {seconds:.1f} s')
+    for result in results:
+        status = 'failed' if result.error is not None else f'{result.tiles} tiles'
+        print(f'  {result.input}: {status} ({result.seconds:.1f} s)')
+    for result in failed:
+        print(f'Failed: {result.input}: {result.error}')
+
+
+def run_watch(args: argparse.Namespace, list_inputs: Callable[[], List[str]], base_dir: str,
+              convert: Callable[[argparse.Namespace], None]):
+    """Reconvert every input file that changes until interrupted.
+
+    Unchanged tiles of a changed sheet are restored from the tile cache, only the edited ones are converted.
+    """
+    watcher = Watcher(list_inputs, float(args.debounce))
+    print(f'Watching {args.input} for changes, press Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            for input_file in watcher.poll():
+                print(f'File changed: {input_file}')
+                start = time.perf_counter()
+                try:
+                    file_args = batch_file_args(args, input_file, base_dir)
+                    os.makedirs(file_args.output, exist_ok=True)
+                    convert(file_args)
+                except (ScriptError, ArgsError, ManifestError, AsepriteFileError) as e:
+                    print(f'Failed: {input_file}: {e.message}')
+                    continue
+                except OSError as e:
+                    print(f'Failed: {input_file}: {e}')
+                    continue
+                print(f'Reconverted {input_file} in {time.perf_counter() - start:.1f} s')
+    except KeyboardInterrupt:
+        print('Watch stopped')
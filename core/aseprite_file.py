@@ -0,0 +1,433 @@
+import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+COLOR_DEPTH_RGBA = 32
+COLOR_DEPTH_GRAYSCALE = 16
+COLOR_DEPTH_INDEXED = 8
+
+LAYER_FLAG_VISIBLE = 1
+LAYER_FLAG_BACKGROUND = 8
+
+LAYER_TYPE_NORMAL = 0
+LAYER_TYPE_GROUP = 1
+LAYER_TYPE_TILEMAP = 2
+
+BLEND_MODE_NORMAL = 0
+
+# Pixels composite blends at a time
+COMPOSITE_BAND_PIXELS = 1 << 20
+
+CEL_TYPE_RAW = 0
+CEL_TYPE_LINKED = 1
+CEL_TYPE_COMPRESSED = 2
+CEL_TYPE_COMPRESSED_TILEMAP = 3
+
+__HEADER_FORMAT = '<IHHHHHIHIIB3xHBBhhHH84x'
+__HEADER_MAGIC = 0xA5E0
+__HEADER_FLAG_LAYER_OPACITY = 1
+__FRAME_FORMAT = '<IHHH2xI'
+__FRAME_MAGIC = 0xF1FA
+__CHUNK_FORMAT = '<IH'
+__CHUNK_OLD_PALETTE = 0x0004
+__CHUNK_OLD_PALETTE_64 = 0x0011
+__CHUNK_LAYER = 0x2004
+__CHUNK_CEL = 0x2005
+__CHUNK_PALETTE = 0x2019
+__CHUNK_TILESET = 0x2023
+__LAYER_FORMAT = '<HHHHHHB3x'
+__CEL_FORMAT = '<HhhBHh5x'
+__TILEMAP_FORMAT = '<HHHIIII10x'
+__TILESET_FORMAT = '<IIIHHh14x'
+__TILESET_FLAG_EXTERNAL = 1
+__TILESET_FLAG_EMBEDDED = 2
+
+
+class AsepriteFileError(Exception):
+    def __init__(self, message='Invalid aseprite file'):
+        self.message = message
+        super().__init__(self.message)
+
+
+@dataclass
+class Layer:
+    name: str
+    flags: int
+    type: int
+    child_level: int
+    blend_mode: int
+    opacity: int
+    tileset_index: Optional[int] = None
+    parent: Optional[int] = None
+
+    @property
+    def background(self) -> bool:
+        return bool(self.flags & LAYER_FLAG_BACKGROUND)
+
+
+@dataclass
+class Cel:
+    layer_index: int
+    x: int
+    y: int
+    opacity: int
+    z_index: int
+    # Pixels in the sprite color mode: (h, w) indices, (h, w, 2) value/alpha or (h, w, 4) RGBA
+    pixels: np.ndarray
+
+
+@dataclass
+class Tileset:
+    # Pixels of every tile stacked vertically: (tile_count * tile_height, tile_width, ...)
+    pixels: np.ndarray
+    tile_width: int
+    tile_height: int
+
+
+@dataclass
+class Sprite:
+    width: int
+    height: int
+    color_depth: int
+    transparent_index: int
+    layers: List[Layer] = field(default_factory=list)
+    frames: List[List[Cel]] = field(default_factory=list)
+    palette: np.ndarray = field(default_factory=lambda: np.zeros((256, 4), dtype=np.uint8))
+    tilesets: Dict[int, Tileset] = field(default_factory=dict)
+
+    def is_visible(self, layer_index: int) -> bool:
+        layer: Optional[Layer] = self.layers[layer_index]
+        while layer is not None:
+            if not layer.flags & LAYER_FLAG_VISIBLE:
+                return False
+            layer = self.layers[layer.parent] if layer.parent is not None else None
+        return True
+
+
+class __Reader:
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = data
+        self.offset = offset
+
+    def unpack(self, fmt: str) -> tuple:
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+    def bytes(self, size: int) -> bytes:
+        value = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return value
+
+    def string(self) -> str:
+        length, = self.unpack('<H')
+        return self.bytes(length).decode('utf-8', errors='replace')
+
+
+def __bytes_per_pixel(color_depth: int) -> int:
+    return color_depth // 8
+
+
+def __decode_pixels(data: bytes, width: int, height: int, color_depth: int) -> np.ndarray:
+    channels = __bytes_per_pixel(color_depth)
+    if len(data) < width * height * channels:
+        raise AsepriteFileError('Cel pixel data is truncated')
+    pixels = np.frombuffer(data, dtype=np.uint8, count=width * height * channels)
+    if channels == 1:
+        return pixels.reshape(height, width)
+    return pixels.reshape(height, width, channels)
+
+
+def __read_palette(reader: __Reader, palette: np.ndarray) -> np.ndarray:
+    size, first, last = reader.unpack('<III8x')
+    if size > len(palette):
+        palette = np.concatenate([palette, np.zeros((size - len(palette), 4), dtype=np.uint8)])
+    for index in range(first, last + 1):
+        flags, r, g, b, a = reader.unpack('<HBBBB')
+        if flags & 1:
+            reader.string()
+        palette[index] = (r, g, b, a)
+    return palette
+
+
+def __read_old_palette(reader: __Reader, palette: np.ndarray, six_bit: bool):
+    packets, = reader.unpack('<H')
+    index = 0
+    for _ in range(packets):
+        skip, count = reader.unpack('<BB')
+        index += skip
+        for _ in range(count or 256):
+            r, g, b = reader.unpack('<BBB')
+            if six_bit:
+                r, g, b = [(value << 2) | (value >> 4) for value in (r, g, b)]
+            if index < len(palette):
+                palette[index] = (r, g, b, 255)
+            index += 1
+
+
+def __read_layer(reader: __Reader, layers: List[Layer], header_flags: int):
+    flags, layer_type, child_level, _, _, blend_mode, opacity = reader.unpack(__LAYER_FORMAT)
+    name = reader.string()
+    tileset_index = reader.unpack('<I')[0] if layer_type == LAYER_TYPE_TILEMAP else None
+    if not header_flags & __HEADER_FLAG_LAYER_OPACITY:
+        opacity = 255
+    # The parent is the closest previous layer one level up
+    parent = None
+    for index in range(len(layers) - 1, -1, -1):
+        if layers[index].child_level < child_level:
+            parent = index
+            break
+    layers.append(Layer(name, flags, layer_type, child_level, blend_mode, opacity, tileset_index, parent))
+
+
+def __read_tileset(reader: __Reader, chunk_end: int, color_depth: int) -> Tuple[int, Optional[Tileset]]:
+    tileset_id, flags, tile_count, tile_width, tile_height, _ = reader.unpack(__TILESET_FORMAT)
+    reader.string()
+    if flags & __TILESET_FLAG_EXTERNAL:
+        reader.unpack('<II')
+    if not flags & __TILESET_FLAG_EMBEDDED:
+        return tileset_id, None
+    length, = reader.unpack('<I')
+    data = zlib.decompress(reader.bytes(min(length, chunk_end - reader.offset)))
+    pixels = __decode_pixels(data, tile_width, tile_height * tile_count, color_depth)
+    return tileset_id, Tileset(pixels, tile_width, tile_height)
+
+
+def __read_cel(reader: __Reader, chunk_end: int, sprite: Sprite, frames: List[List[Cel]]) -> Optional[Cel]:
+    layer_index, x, y, opacity, cel_type, z_index = reader.unpack(__CEL_FORMAT)
+    if cel_type == CEL_TYPE_LINKED:
+        frame_position, = reader.unpack('<H')
+        for cel in frames[frame_position] if frame_position < len(frames) else []:
+            if cel.layer_index == layer_index:
+                return Cel(layer_index, x, y, opacity, z_index, cel.pixels)
+        return None
+    if cel_type == CEL_TYPE_RAW:
+        width, height = reader.unpack('<HH')
+        data = reader.bytes(chunk_end - reader.offset)
+    elif cel_type == CEL_TYPE_COMPRESSED:
+        width, height = reader.unpack('<HH')
+        data = zlib.decompress(reader.bytes(chunk_end - reader.offset))
+    elif cel_type == CEL_TYPE_COMPRESSED_TILEMAP:
+        width, height, bits, id_mask, x_flip, y_flip, _ = reader.unpack(__TILEMAP_FORMAT)
+        if bits != 32:
+            raise AsepriteFileError(f'Unsupported tilemap bits per tile: {bits}')
+        data = zlib.decompress(reader.bytes(chunk_end - reader.offset))
+        tiles = np.frombuffer(data, dtype='<u4', count=width * height).reshape(height, width)
+        layer = sprite.layers[layer_index]
+        tileset = sprite.tilesets.get(layer.tileset_index)
+        if tileset is None:
+            return None
+        pixels = __render_tilemap(tiles, tileset, id_mask, x_flip, y_flip)
+        return Cel(layer_index, x, y, opacity, z_index, pixels)
+    else:
+        raise AsepriteFileError(f'Unsupported cel type: {cel_type}')
+    return Cel(layer_index, x, y, opacity, z_index, __decode_pixels(data, width, height, sprite.color_depth))
+
+
+def __render_tilemap(tiles: np.ndarray, tileset: Tileset, id_mask: int, x_flip: int, y_flip: int) -> np.ndarray:
+    tile_width, tile_height = tileset.tile_width, tileset.tile_height
+    rows, columns = tiles.shape
+    shape = (rows * tile_height, columns * tile_width) + tileset.pixels.shape[2:]
+    pixels = np.zeros(shape, dtype=np.uint8)
+    tile_count = len(tileset.pixels) // tile_height
+    for row in range(rows):
+        for column in range(columns):
+            value = int(tiles[row, column])
+            tile_id = value & id_mask
+            # Tile 0 is the empty tile
+            if tile_id == 0 or tile_id >= tile_count:
+                continue
+            tile = tileset.pixels[tile_id * tile_height:(tile_id + 1) * tile_height]
+            if value & x_flip:
+                tile = tile[:, ::-1]
+            if value & y_flip:
+                tile = tile[::-1]
+            pixels[row * tile_height:(row + 1) * tile_height, column * tile_width:(column + 1) * tile_width] = tile
+    return pixels
+
+
+def read_sprite_size(file_path: str) -> Tuple[int, int]:
+    """Width and height of a sprite from its header, without decoding the frames."""
+    with open(file_path, 'rb') as file:
+        data = file.read(struct.calcsize(__HEADER_FORMAT))
+    if len(data) < struct.calcsize(__HEADER_FORMAT):
+        raise AsepriteFileError(f'File is too small: {file_path}')
+    _, magic, _, width, height = struct.unpack_from('<IHHHH', data)
+    if magic != __HEADER_MAGIC:
+        raise AsepriteFileError(f'Not an aseprite file: {file_path}')
+    return width, height
+
+
+def read_sprite(file_path: str) -> Sprite:
+    with open(file_path, 'rb') as file:
+        data = file.read()
+    if len(data) < struct.calcsize(__HEADER_FORMAT):
+        raise AsepriteFileError(f'File is too small: {file_path}')
+
+    reader = __Reader(data)
+    (_, magic, frame_count, width, height, color_depth, header_flags, _, _, _,
+     transparent_index, _, _, _, _, _, _, _) = reader.unpack(__HEADER_FORMAT)
+    if magic != __HEADER_MAGIC:
+        raise AsepriteFileError(f'Not an aseprite file: {file_path}')
+    if color_depth not in (COLOR_DEPTH_RGBA, COLOR_DEPTH_GRAYSCALE, COLOR_DEPTH_INDEXED):
+        raise AsepriteFileError(f'Unsupported color depth: {color_depth}')
+
+    sprite = Sprite(width, height, color_depth, transparent_index)
+    has_new_palette = False
+    try:
+        for _ in range(frame_count):
+            frame_start = reader.offset
+            frame_size, frame_magic, old_chunk_count, _, chunk_count = reader.unpack(__FRAME_FORMAT)
+            if frame_magic != __FRAME_MAGIC:
+                raise AsepriteFileError(f'Invalid frame header in: {file_path}')
+            cels: List[Cel] = []
+            for _ in range(chunk_count or old_chunk_count):
+                chunk_start = reader.offset
+                chunk_size, chunk_type = reader.unpack(__CHUNK_FORMAT)
+                chunk_end = chunk_start + chunk_size
+                if chunk_type == __CHUNK_LAYER:
+                    __read_layer(reader, sprite.layers, header_flags)
+                elif chunk_type == __CHUNK_CEL:
+                    cel = __read_cel(reader, chunk_end, sprite, sprite.frames)
+                    if cel is not None:
+                        cels.append(cel)
+                elif chunk_type == __CHUNK_PALETTE:
+                    sprite.palette = __read_palette(reader, sprite.palette)
+                    has_new_palette = True
+                elif chunk_type in (__CHUNK_OLD_PALETTE, __CHUNK_OLD_PALETTE_64) and not has_new_palette:
+                    __read_old_palette(reader, sprite.palette, chunk_type == __CHUNK_OLD_PALETTE_64)
+                elif chunk_type == __CHUNK_TILESET:
+                    tileset_id, tileset = __read_tileset(reader, chunk_end, color_depth)
+                    if tileset is not None:
+                        sprite.tilesets[tileset_id] = tileset
+                reader.offset = chunk_end
+            sprite.frames.append(cels)
+            reader.offset = frame_start + frame_size
+    except (struct.error, zlib.error, ValueError, IndexError) as e:
+        # Truncated or corrupt chunks
+        raise AsepriteFileError(f'Invalid aseprite file: {file_path}: {e}')
+    return sprite
+
+
+def __cel_rgba(sprite: Sprite, cel: Cel, pixels: np.ndarray) -> np.ndarray:
+    """RGBA of pixels, a part of the pixels of cel."""
+    if sprite.color_depth == COLOR_DEPTH_RGBA:
+        return pixels
+    if sprite.color_depth == COLOR_DEPTH_GRAYSCALE:
+        value, alpha = pixels[..., 0], pixels[..., 1]
+        return np.stack([value, value, value, alpha], axis=-1)
+    indices = np.minimum(pixels, len(sprite.palette) - 1)
+    rgba = sprite.palette[indices]
+    if not sprite.layers[cel.layer_index].background:
+        rgba = rgba.copy()
+        rgba[pixels == sprite.transparent_index, 3] = 0
+    return rgba
+
+
+def __composite_band(sprite: Sprite, cels: List[Cel], top: int, bottom: int) -> np.ndarray:
+    color = np.zeros((bottom - top, sprite.width, 3), dtype=np.float64)
+    alpha = np.zeros((bottom - top, sprite.width), dtype=np.float64)
+    for cel in cels:
+        layer = sprite.layers[cel.layer_index]
+        height, width = cel.pixels.shape[:2]
+        left, right = max(cel.x, 0), min(cel.x + width, sprite.width)
+        cel_top, cel_bottom = max(cel.y, top), min(cel.y + height, bottom)
+        if left >= right or cel_top >= cel_bottom:
+            continue
+        rgba = __cel_rgba(sprite, cel, cel.pixels[cel_top - cel.y:cel_bottom - cel.y, left - cel.x:right - cel.x])
+        source = rgba.astype(np.float64) / 255
+        source_alpha = source[..., 3] * (cel.opacity / 255) * (layer.opacity / 255)
+        rows = slice(cel_top - top, cel_bottom - top)
+        target_color = color[rows, left:right]
+        target_alpha = alpha[rows, left:right]
+        out_alpha = source_alpha + target_alpha * (1 - source_alpha)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out_color = (source[..., :3] * source_alpha[..., None]
+                         + target_color * (target_alpha * (1 - source_alpha))[..., None]) / out_alpha[..., None]
+        color[rows, left:right] = np.where(out_alpha[..., None] > 0, out_color, 0)
+        alpha[rows, left:right] = out_alpha
+    image = np.concatenate([color, alpha[..., None]], axis=-1)
+    return np.rint(image * 255).astype(np.uint8)
+
+
+def composite(sprite: Sprite, frame: int = 0) -> np.ndarray:
+    """Blend the visible layers of a frame into a (height, width, 4) uint8 RGBA image.
+
+    Every blend mode is treated as normal alpha compositing. Bands of COMPOSITE_BAND_PIXELS pixels are blended
+    at a time, only their float buffers are held in memory besides the image.
+    """
+    cels = sorted(sprite.frames[frame], key=lambda each: (each.layer_index + each.z_index, each.z_index))
+    cels = [cel for cel in cels
+            if sprite.layers[cel.layer_index].type != LAYER_TYPE_GROUP and sprite.is_visible(cel.layer_index)]
+    image = np.zeros((sprite.height, sprite.width, 4), dtype=np.uint8)
+    band_height = max(1, COMPOSITE_BAND_PIXELS // max(1, sprite.width))
+    for top in range(0, sprite.height, band_height):
+        bottom = min(top + band_height, sprite.height)
+        image[top:bottom] = __composite_band(sprite, cels, top, bottom)
+    return image
+
+
+def composite_differences(sprite: Sprite) -> List[str]:
+    """What composite renders differently from Aseprite: blend modes and the opacity of groups of visible layers."""
+    differences = []
+    for index, layer in enumerate(sprite.layers):
+        if layer.type == LAYER_TYPE_GROUP or not sprite.is_visible(index):
+            continue
+        if layer.blend_mode != BLEND_MODE_NORMAL:
+            differences.append(f'blend mode {layer.blend_mode} of layer "{layer.name}"')
+        parent = layer.parent
+        while parent is not None:
+            group = sprite.layers[parent]
+            if group.opacity < 255 or group.blend_mode != BLEND_MODE_NORMAL:
+                differences.append(f'opacity or blend mode of group "{group.name}"')
+            parent = group.parent
+    return list(dict.fromkeys(differences))
+
+
+def split_tiles(image: np.ndarray, tile_width: Optional[int] = None,
+                tile_height: Optional[int] = None) -> Dict[Tuple[int, int], np.ndarray]:
+    """Slice an image into a row-major {(x, y): tile} grid; incomplete edge tiles are dropped."""
+    height, width = image.shape[:2]
+    tile_width = tile_width or width
+    tile_height = tile_height or height
+    tiles = {}
+    for y in range(height // tile_height):
+        for x in range(width // tile_width):
+            tiles[(x, y)] = image[y * tile_height:(y + 1) * tile_height, x * tile_width:(x + 1) * tile_width]
+    return tiles
+
+
+def sprite_tiles(sprite: Sprite, tile_width: Optional[int] = None,
+                 tile_height: Optional[int] = None) -> Dict[Tuple[int, int], np.ndarray]:
+    try:
+        image = composite(sprite)
+    except (ValueError, IndexError) as e:
+        # Cels referencing missing layers, frames or tiles
+        raise AsepriteFileError(f'Invalid cels: {e}')
+    return split_tiles(image, tile_width, tile_height)
+
+
+def read_tiles(file_path: str, tile_width: Optional[int] = None,
+               tile_height: Optional[int] = None) -> Dict[Tuple[int, int], np.ndarray]:
+    return sprite_tiles(read_sprite(file_path), tile_width, tile_height)
+
+
+def write_sprite(file_path: str, image: np.ndarray):
+    """Save an RGBA image as a single frame, single layer aseprite file."""
+    height, width = image.shape[:2]
+    name = b'Layer 1'
+    layer = struct.pack(__LAYER_FORMAT, LAYER_FLAG_VISIBLE, LAYER_TYPE_NORMAL, 0, 0, 0, 0, 255) \
+        + struct.pack('<H', len(name)) + name
+    cel = struct.pack(__CEL_FORMAT, 0, 0, 0, 255, CEL_TYPE_COMPRESSED, 0) \
+        + struct.pack('<HH', width, height) + zlib.compress(np.ascontiguousarray(image, dtype=np.uint8).tobytes())
+    chunks = b''.join(struct.pack(__CHUNK_FORMAT, len(chunk) + 6, chunk_type) + chunk
+                      for chunk_type, chunk in [(__CHUNK_LAYER, layer), (__CHUNK_CEL, cel)])
+    frame = struct.pack(__FRAME_FORMAT, struct.calcsize(__FRAME_FORMAT) + len(chunks), __FRAME_MAGIC, 2, 100, 2) \
+        + chunks
+    header_size = struct.calcsize(__HEADER_FORMAT)
+    header = struct.pack(__HEADER_FORMAT, header_size + len(frame), __HEADER_MAGIC, 1, width, height,
+                         COLOR_DEPTH_RGBA, __HEADER_FLAG_LAYER_OPACITY, 100, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0)
+    with open(file_path, 'wb') as file:
+        file.write(header + frame)
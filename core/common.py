@@ -2,14 +2,66 @@ import os
 import re
 import sys
 import argparse
+import collections
+import glob
+import hashlib
+import itertools
+import json
+import queue
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
 from argparse import Namespace, ArgumentParser
-from typing import List, Tuple
-from core.config import load_config, PIVOT_VALUES
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, ClassVar, List, Optional, Set, TextIO, Tuple
+from core.config import load_config, MATERIAL_VALUES, PIVOT_VALUES
+from core.manifest import TILE_FORMAT_VALUES, manifest_path, merge_manifests, read_manifest, shard_manifest_path, \
+    write_manifest
+from core.mesher import MESH_FORMAT_VALUES
+from core.profiler import ProcessRecord, profile_line, profile_process
+from core.tile_cache import DEFAULT_CACHE_SIZE_MB, default_cache_dir
 
 INPUT_FILE_EXTENSIONS = ['.ase', '.aseprite']
+EXPORTER_VALUES = ['aseprite', 'native']
+BACKEND_VALUES = ['blender', 'native']
+MERGE_VALUES = ['pairs', 'grid']
+SVG_IMPORT_VALUES = ['curve', 'direct']
 VERSION = '0.2.1d'
 
+DEFAULT_WORKER_MEMORY_MB = 2048
+DEFAULT_WORKER_FILES = 500
+# Prefix of the line a Blender worker answers a job with
+WORKER_RESULT_PREFIX = 'WORKER_RESULT '
+# Lines of stdout and stderr kept for the error message of a failed process
+OUTPUT_TAIL_LINES = 50
+
+# Scripts run by Aseprite and Blender, with the helpers the Blender script imports
+ASEPRITE_SCRIPTS = ['scripts/aseprite/convert_to_svg.lua']
+BLENDER_SCRIPTS = ['scripts/blender/convert_svg_to_fbx.py', 'scripts/blender/geometry.py',
+                   'scripts/blender/svg_mesh.py']
+
+# Lines the scripts print for every converted tile
+SVG_EXPORTED_PREFIX = 'File exported to SVG: '
+FBX_EXPORTED_PREFIX = 'File exported to FBX: '
+NO_MESH_PREFIX = 'No objects of type MESH: '
+
+
+def converted_tile(line: str) -> Optional[str]:
+    """Name of the tile a convert_svg_to_fbx.py output line reports as done, None for other lines."""
+    for prefix in [FBX_EXPORTED_PREFIX, NO_MESH_PREFIX]:
+        if line.startswith(prefix):
+            return os.path.splitext(os.path.basename(line[len(prefix):].strip()))[0]
+    return None
+
+
+def unconverted_files(files: List[str], converted: Set[str]) -> List[str]:
+    """The svg files of the tiles not in converted."""
+    return [file for file in files if os.path.splitext(os.path.basename(file))[0] not in converted]
+
 
 class ScriptError(Exception):
     def __init__(self, message='Script execution error'):
@@ -23,7 +75,110 @@ class ArgsError(Exception):
         super().__init__(self.message)
 
 
-def __resource_path(relative_path: str) -> str:
+class ConversionCancelled(Exception):
+    def __init__(self, message='Conversion cancelled'):
+        self.message = message
+        super().__init__(self.message)
+
+
+class CancelToken:
+    """Stops a conversion: running processes are terminated and no new ones start."""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__processes = set()
+        self.__cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancelled
+
+    def cancel(self):
+        with self.__lock:
+            self.__cancelled = True
+            processes = list(self.__processes)
+        for process in processes:
+            process.terminate()
+
+    def start(self, command: List[str]) -> subprocess.Popen:
+        with self.__lock:
+            if self.__cancelled:
+                raise ConversionCancelled()
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            self.__processes.add(process)
+            return process
+
+    def track(self, process: subprocess.Popen):
+        """Terminate an already running process on cancel until it is finished."""
+        with self.__lock:
+            if self.__cancelled:
+                raise ConversionCancelled()
+            self.__processes.add(process)
+
+    def finish(self, process: subprocess.Popen):
+        with self.__lock:
+            self.__processes.discard(process)
+        if self.__cancelled:
+            raise ConversionCancelled()
+
+
+@dataclass
+class ProcessPolicy:
+    """Supervision of the Aseprite and Blender processes."""
+    # Seconds a process or a persistent worker job may run before it is killed, None for no limit
+    timeout: Optional[float] = None
+    # Runs after the first one when a process fails or times out
+    retries: int = 0
+    # Seconds before the first retry, doubled before every next one
+    backoff: float = 1.0
+    # Directory of one log file per process instead of printing the output
+    log_dir: Optional[str] = None
+
+    __runs: ClassVar = itertools.count(1)
+
+    def retry_delay(self, retry: int) -> float:
+        return self.backoff * 2 ** (retry - 1)
+
+    def open_log(self, command: List[str], script: str = '') -> Optional[TextIO]:
+        """A new log file of the process with its command line, None when the output is printed."""
+        if self.log_dir is None:
+            return None
+        name = '_'.join(os.path.splitext(os.path.basename(each))[0] for each in [command[0], script] if each)
+        log = open(os.path.join(self.log_dir, f'{time.strftime("%Y%m%d_%H%M%S")}_{next(self.__runs):04d}_{name}.log'),
+                   'w', encoding='utf-8')
+        log.write(f'{command}\n')
+        return log
+
+
+class OutputSink:
+    """Prints or logs the lines of a process as they arrive and keeps the last OUTPUT_TAIL_LINES of them."""
+
+    def __init__(self, log: Optional[TextIO] = None, echo: bool = True, lock: Optional[threading.Lock] = None):
+        self.log = log
+        self.echo = echo
+        self.__lines = collections.deque(maxlen=OUTPUT_TAIL_LINES)
+        self.__lock = lock or threading.Lock()
+
+    @property
+    def tail(self) -> str:
+        with self.__lock:
+            return ''.join(self.__lines)
+
+    def write(self, line: str):
+        with self.__lock:
+            self.__lines.append(line)
+            if self.log is not None:
+                self.log.write(line)
+                self.log.flush()
+            elif self.echo:
+                print(line, end='')
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+
+
+def __find_resource(relative_path: str) -> str:
     real_path = os.path.abspath(os.path.dirname(sys.argv[0]))
     real_path = os.path.join(real_path, 'plugin')
     real_path = os.path.join(real_path, relative_path)
@@ -32,11 +187,154 @@ def __resource_path(relative_path: str) -> str:
         real_path = os.path.join(base_path, relative_path)
     if not os.path.isfile(real_path):
         real_path = relative_path
+    return real_path
+
+
+def __resource_path(relative_path: str) -> str:
+    real_path = __find_resource(relative_path)
     print(f'Script path: {real_path}')
     return real_path
 
 
-def call_aseprite_script(script: str, **kwargs):
+def tool_digest(scripts: List[str], executables: Optional[List[str]] = None) -> str:
+    """Hash of the contents of the scripts and the size and modification time of the executables.
+
+    scripts are resource paths like those of call_aseprite_script or files below the project directory,
+    an upgraded script or Aseprite or Blender installation changes the hash.
+    """
+    digest = hashlib.sha256()
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for script in scripts:
+        digest.update(script.encode())
+        for path in [__find_resource(script), os.path.join(project_dir, script)]:
+            if os.path.isfile(path):
+                with open(path, 'rb') as file:
+                    digest.update(file.read())
+                break
+    for executable in executables or []:
+        path = shutil.which(executable) or executable
+        digest.update(executable.encode())
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()
+
+
+__process_slots: Optional[threading.Semaphore] = None
+
+
+def limit_processes(count: Optional[int]):
+    """Run at most count Aseprite and Blender processes at a time across all threads, None for no limit."""
+    global __process_slots
+    __process_slots = threading.BoundedSemaphore(count) if count else None
+
+
+__process_policy = ProcessPolicy()
+
+
+def use_process_policy(policy: Optional[ProcessPolicy]):
+    """Timeouts, retries and log files of the processes started from now on, None for the defaults."""
+    global __process_policy
+    __process_policy = policy or ProcessPolicy()
+
+
+def __run_process(command: List[str], on_line: Optional[Callable[[str], None]] = None,
+                  cancel: Optional[CancelToken] = None, script: str = '') -> Tuple[int, str, str]:
+    """Run a command once and pass every stdout line to on_line while it is running.
+
+    stdout is printed, or written with stderr to a log file of the policy, as it arrives. Returns the exit code
+    and the last OUTPUT_TAIL_LINES lines of stdout and stderr, a process killed after the timeout says so in stderr.
+    """
+    cancel = cancel or CancelToken()
+    policy = __process_policy
+    log = policy.open_log(command, script)
+    # Both streams go to the same log file
+    lock = threading.Lock()
+    stdout, stderr = OutputSink(log, lock=lock), OutputSink(log, echo=False, lock=lock)
+    slots = __process_slots
+    queued = time.perf_counter()
+    if slots is not None:
+        slots.acquire()
+    started = time.perf_counter()
+    timed_out = threading.Event()
+    try:
+        process = cancel.start(command)
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        def read_stderr():
+            for line in process.stderr:
+                stderr.write(line)
+
+        watchdog = threading.Timer(policy.timeout, kill) if policy.timeout else None
+        stderr_reader = threading.Thread(target=read_stderr)
+        try:
+            if watchdog is not None:
+                watchdog.start()
+            stderr_reader.start()
+            for line in process.stdout:
+                stdout.write(line)
+                if on_line is not None:
+                    on_line(line.rstrip('\n'))
+        except BaseException:
+            # Nothing reads the output of the process any more
+            process.kill()
+            raise
+        finally:
+            if stderr_reader.is_alive():
+                stderr_reader.join()
+            returncode = process.wait()
+            if watchdog is not None:
+                watchdog.cancel()
+            process.stdout.close()
+            process.stderr.close()
+            cancel.finish(process)
+        if timed_out.is_set():
+            stderr.write(f'Killed after the timeout of {policy.timeout:g} s\n')
+    finally:
+        if slots is not None:
+            slots.release()
+        stdout.close()
+    profile_process(ProcessRecord(os.path.basename(command[0]), os.path.basename(script),
+                                  time.perf_counter() - started, started - queued, returncode))
+    return returncode, stdout.tail, stderr.tail
+
+
+def __run_supervised(command: List[str], on_line: Optional[Callable[[str], None]] = None,
+                     cancel: Optional[CancelToken] = None, script: str = '',
+                     before_retry: Optional[Callable[[], bool]] = None) -> Tuple[int, str, str]:
+    """Run a command until it succeeds or the retries of the policy are used up, with exponential backoff.
+
+    on_line gets every line once: the lines an earlier attempt printed are not passed again. before_retry can
+    narrow down the work of the next attempt, it returns False when nothing is left to retry.
+    """
+    policy = __process_policy
+    delivered: Set[str] = set()
+    for retry in range(policy.retries + 1):
+        if retry:
+            if before_retry is not None and not before_retry():
+                break
+            delay = policy.retry_delay(retry)
+            print(f'{os.path.basename(command[0])} failed, retry {retry} of {policy.retries} in {delay:g} s')
+            time.sleep(delay)
+        earlier = set(delivered)
+
+        def on_attempt_line(line: str):
+            if line not in earlier:
+                delivered.add(line)
+                on_line(line)
+
+        returncode, stdout, stderr = __run_process(command, on_attempt_line if on_line is not None else None,
+                                                   cancel, script)
+        if not returncode:
+            break
+    return returncode, stdout, stderr
+
+
+def call_aseprite_script(script: str, on_line: Optional[Callable[[str], None]] = None,
+                         cancel: Optional[CancelToken] = None, **kwargs):
     actual_script = __resource_path(script)
     print(actual_script)
     config = load_config()
@@ -44,15 +342,17 @@ def call_aseprite_script(script: str, **kwargs):
                '-b',
                *[x for key, value in kwargs.items() for x in ['--script-param', f'{key}={value}']],
                '--script', actual_script]
-    ret = subprocess.run(command, capture_output=True, text=True)
-    print(ret.args)
-    print(ret.stdout)
-    if ret.returncode:
-        error = ret.stdout.splitlines()[-1] if ret.stderr.strip() == '' else ret.stderr
+    print(command)
+    returncode, stdout, stderr = __run_supervised(command, on_line, cancel, script)
+    if returncode:
+        error = (stdout.splitlines() or [f'Aseprite exited with code {returncode}'])[-1] \
+            if stderr.strip() == '' else stderr
         raise ScriptError(error)
 
 
-def call_blender_script(script: str, **kwargs):
+def call_blender_script(script: str, on_line: Optional[Callable[[str], None]] = None,
+                        cancel: Optional[CancelToken] = None, before_retry: Optional[Callable[[], bool]] = None,
+                        **kwargs):
     actual_script = __resource_path(script)
     config = load_config()
     command = [config.blender,
@@ -60,15 +360,346 @@ def call_blender_script(script: str, **kwargs):
                '-P', actual_script,
                '--', *[x for key, value in kwargs.items() for x in [f'{key}', f'{value}']]]
 
-    ret = subprocess.run(command, capture_output=True, text=True)
-    print(ret.args)
-    print(ret.stdout)
-    if ret.returncode:
-        raise ScriptError(ret.stderr)
+    print(command)
+    returncode, stdout, stderr = __run_supervised(command, on_line, cancel, script, before_retry)
+    if returncode:
+        raise ScriptError(stderr)
+
+
+class BlenderWorker:
+    """A Blender process running convert_svg_to_fbx.py --serve, it converts one job at a time."""
+
+    def __init__(self, command: List[str], log: Optional[TextIO] = None):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE, text=True, bufsize=1)
+        self.files = 0
+        self.memory: Optional[float] = None
+        self.__job_id = 0
+        lock = threading.Lock()
+        self.__stdout = OutputSink(log, lock=lock)
+        self.__stderr = OutputSink(log, echo=False, lock=lock)
+        threading.Thread(target=self.__read_stderr, daemon=True).start()
+
+    def __read_stderr(self):
+        for line in self.process.stderr:
+            self.__stderr.write(line)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, args: List[str], on_line: Optional[Callable[[str], None]] = None,
+            timeout: Optional[float] = None) -> dict:
+        """Send the command line arguments of a conversion and wait for its result.
 
+        A job running longer than timeout seconds kills the worker.
+        """
+        self.__job_id += 1
+        timed_out = threading.Event()
 
-def get_files(directory: str, pattern: str) -> List[str]:
-    return [os.path.join(directory, each) for each in os.listdir(directory) if re.match(pattern, each)]
+        def kill():
+            timed_out.set()
+            self.process.kill()
+
+        watchdog = threading.Timer(timeout, kill) if timeout else None
+        if watchdog is not None:
+            watchdog.start()
+        try:
+            try:
+                self.process.stdin.write(json.dumps({'id': self.__job_id, 'args': args}) + '\n')
+                self.process.stdin.flush()
+            except OSError:
+                pass
+            for line in self.process.stdout:
+                if line.startswith(WORKER_RESULT_PREFIX):
+                    result = json.loads(line[len(WORKER_RESULT_PREFIX):])
+                    if result.get('id') == self.__job_id:
+                        return result
+                    continue
+                self.__stdout.write(line)
+                if on_line is not None:
+                    on_line(line.rstrip('\n'))
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+        returncode = self.process.wait()
+        if timed_out.is_set():
+            raise ScriptError(f'Blender worker killed after the timeout of {timeout:g} s: {self.__stderr.tail}')
+        raise ScriptError(f'Blender worker exited with code {returncode}: {self.__stderr.tail}')
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.__stdout.close()
+
+
+class BlenderPool:
+    """Keeps up to size Blender workers alive between conversions and dispatches jobs to them.
+
+    A worker is replaced when it crashes or times out, when its peak memory exceeds max_memory_mb
+    or after it converted max_files files.
+    """
+
+    def __init__(self, command: List[str], size: int, max_memory_mb: float = DEFAULT_WORKER_MEMORY_MB,
+                 max_files: int = DEFAULT_WORKER_FILES, policy: Optional[ProcessPolicy] = None):
+        self.command = command
+        self.policy = policy or ProcessPolicy()
+        self.size = max(1, size)
+        self.max_memory_mb = max_memory_mb
+        self.max_files = max_files
+        self.__slots = threading.BoundedSemaphore(self.size)
+        self.__lock = threading.Lock()
+        self.__idle: List[BlenderWorker] = []
+
+    def __acquire(self) -> BlenderWorker:
+        self.__slots.acquire()
+        with self.__lock:
+            while self.__idle:
+                worker = self.__idle.pop()
+                if worker.alive:
+                    return worker
+        try:
+            return BlenderWorker(self.command, self.policy.open_log(self.command, 'worker'))
+        except OSError:
+            self.__slots.release()
+            raise
+
+    def __release(self, worker: BlenderWorker):
+        if not worker.alive or worker.files >= self.max_files or (worker.memory or 0) > self.max_memory_mb:
+            worker.close()
+        else:
+            with self.__lock:
+                self.__idle.append(worker)
+        self.__slots.release()
+
+    def __run_job(self, files: List[str], args: List[str], on_line: Optional[Callable[[str], None]],
+                  cancel: Optional[CancelToken]) -> dict:
+        queued = time.perf_counter()
+        worker = self.__acquire()
+        started = time.perf_counter()
+        try:
+            if cancel is not None:
+                cancel.track(worker.process)
+            result = worker.run(args + ['-i', *files], on_line, self.policy.timeout)
+            worker.files += len(files)
+            worker.memory = result.get('memory')
+            return result
+        finally:
+            self.__release(worker)
+            # A worker job has no exit code of its own
+            profile_process(ProcessRecord(os.path.basename(self.command[0]), 'worker job',
+                                          time.perf_counter() - started, started - queued))
+            if cancel is not None:
+                cancel.finish(worker.process)
+
+    def run(self, files: List[str], on_line: Optional[Callable[[str], None]] = None,
+            cancel: Optional[CancelToken] = None, **kwargs):
+        """Convert files in one worker, kwargs are convert_svg_to_fbx.py arguments like for call_blender_script."""
+        args = [x for key, value in kwargs.items() for x in [f'{key}', f'{value}']]
+        converted = set()
+
+        def on_job_line(line: str):
+            name = converted_tile(line)
+            if name is not None:
+                converted.add(name)
+            if on_line is not None:
+                on_line(line)
+
+        # A crashed worker is replaced, the job is retried at least once in case the crash was not caused by its files.
+        # A retry converts only the files the crashed worker did not finish
+        retries = max(1, self.policy.retries)
+        for retry in range(retries + 1):
+            try:
+                result = self.__run_job(unconverted_files(files, converted), args, on_job_line, cancel)
+                break
+            except ScriptError as e:
+                if retry == retries or not unconverted_files(files, converted):
+                    raise
+                delay = self.policy.retry_delay(retry + 1)
+                print(f'{e.message}\nRetry {retry + 1} of {retries} in {delay:g} s')
+                time.sleep(delay)
+        if result.get('error'):
+            raise ScriptError(result['error'])
+        if result.get('failed'):
+            raise ScriptError('\n'.join(f'{each["file"]}: {each["error"]}' for each in result['failed']))
+
+    def close(self):
+        with self.__lock:
+            workers, self.__idle = self.__idle, []
+        for worker in workers:
+            worker.close()
+
+
+__blender_pool: Optional[BlenderPool] = None
+
+
+def start_blender_pool(size: int, max_memory_mb: float = DEFAULT_WORKER_MEMORY_MB) -> BlenderPool:
+    config = load_config()
+    command = [config.blender, '-b', '-P', __resource_path('scripts/blender/convert_svg_to_fbx.py'), '--', '--serve']
+    return BlenderPool(command, size, max_memory_mb, policy=__process_policy)
+
+
+def use_blender_pool(pool: Optional[BlenderPool]):
+    """Convert svg files with the workers of pool instead of a new Blender process per batch, None to stop."""
+    global __blender_pool
+    __blender_pool = pool
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+def run_parallel(tasks: List[Callable[[], None]], jobs: int):
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [executor.submit(task) for task in tasks]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except ScriptError as e:
+                errors.append(e.message)
+    if errors:
+        raise ScriptError('\n'.join(errors))
+
+
+def export_sheet(shards: int = 1, on_line: Optional[Callable[[str], None]] = None,
+                 cancel: Optional[CancelToken] = None, **kwargs):
+    """Export the tiles of a sheet with convert_to_svg.lua split by tile rows across shards Aseprite processes.
+
+    kwargs are the script params of convert_to_svg.lua, the manifests of the shards are merged into one.
+    """
+    if shards <= 1:
+        call_aseprite_script('scripts/aseprite/convert_to_svg.lua', on_line, cancel, **kwargs)
+        return
+    run_parallel([partial(call_aseprite_script, 'scripts/aseprite/convert_to_svg.lua', on_line, cancel,
+                          **kwargs, shard=shard, shards=shards) for shard in range(shards)], shards)
+    paths = [shard_manifest_path(kwargs['output'], kwargs['file'], shard) for shard in range(shards)]
+    write_manifest(manifest_path(kwargs['output'], kwargs['file']),
+                   merge_manifests([read_manifest(path) for path in paths]))
+    for path in paths:
+        os.remove(path)
+    print(f'Manifest exported: {manifest_path(kwargs["output"], kwargs["file"])}')
+
+
+def __convert_svg_batch(files: List[str], on_line: Optional[Callable[[str], None]] = None,
+                        cancel: Optional[CancelToken] = None, **kwargs):
+    def on_blender_line(line: str):
+        profile_line(line)
+        if on_line is not None:
+            on_line(line)
+
+    pool = __blender_pool
+    if pool is not None:
+        pool.run(files, on_blender_line, cancel, **kwargs)
+        return
+    converted = set()
+
+    def on_session_line(line: str):
+        name = converted_tile(line)
+        if name is not None:
+            converted.add(name)
+        on_blender_line(line)
+
+    # Pass the file list through a file: a whole sheet of paths can exceed the command line length limit
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as input_list:
+        input_list.write('\n'.join(files))
+
+    def before_retry() -> bool:
+        # A retry converts only the files the failed session did not finish
+        remaining = unconverted_files(files, converted)
+        with open(input_list.name, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(remaining))
+        return bool(remaining)
+
+    try:
+        call_blender_script('scripts/blender/convert_svg_to_fbx.py', on_session_line, cancel, before_retry,
+                            **kwargs, **{'--input_list': input_list.name})
+    finally:
+        os.remove(input_list.name)
+
+
+def convert_svg_files(files: List[str], jobs: int = 1, on_line: Optional[Callable[[str], None]] = None,
+                      cancel: Optional[CancelToken] = None, **kwargs):
+    chunks = min(max(1, jobs), len(files))
+    run_parallel([partial(__convert_svg_batch, files[i::chunks], on_line, cancel, **kwargs) for i in range(chunks)],
+                 jobs)
+
+
+def convert_svg_stream(produce: Callable[[Callable[[str], None]], None], jobs: int = 1,
+                       on_line: Optional[Callable[[str], None]] = None, cancel: Optional[CancelToken] = None,
+                       **kwargs):
+    """Convert the svg files passed to the submit callback of produce(submit) while it is still running.
+
+    Each worker converts everything queued so far, up to its share, in one Blender session. An error of produce
+    or a cancelled conversion stops the workers, the files still queued are not converted.
+    """
+    jobs = max(1, jobs)
+    ready: queue.Queue = queue.Queue()
+    produced = threading.Event()
+    stopped = threading.Event()
+    errors = []
+
+    def worker():
+        while not stopped.is_set() and not (produced.is_set() and ready.empty()):
+            try:
+                files = [ready.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            share = -(-ready.qsize() // jobs)
+            while len(files) <= share:
+                try:
+                    files.append(ready.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                __convert_svg_batch(files, on_line, cancel, **kwargs)
+            except ScriptError as e:
+                errors.append(e.message)
+            except BaseException:
+                stopped.set()
+                raise
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        workers = [executor.submit(worker) for _ in range(jobs)]
+        try:
+            produce(ready.put)
+        except BaseException:
+            stopped.set()
+            raise
+        finally:
+            produced.set()
+            for each in workers:
+                each.result()
+    if errors:
+        raise ScriptError('\n'.join(errors))
+
+
+def is_input_pattern(path: str) -> bool:
+    return re.search('[*?[]', path) is not None
+
+
+def expand_inputs(path: str) -> Tuple[List[str], str]:
+    """Aseprite files of an input file, directory or glob, and the directory their outputs are laid out from."""
+    if os.path.isdir(path):
+        files = [os.path.join(root, each) for root, _, names in os.walk(path) for each in names]
+        base_dir = path
+    elif is_input_pattern(path):
+        files = glob.glob(path, recursive=True)
+        base_dir = None
+    else:
+        return ([path] if os.path.isfile(path) else []), os.path.dirname(path)
+    files = sorted(file for file in files
+                   if os.path.isfile(file) and any(file.endswith(ext) for ext in INPUT_FILE_EXTENSIONS))
+    if base_dir is None:
+        base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(file)) for file in files]) if files else ''
+    return files, base_dir
 
 
 def __type_size(astring: str) -> str:
@@ -83,18 +714,39 @@ def __type_unsigned_float(astring: str) -> str:
     return astring
 
 
-def __type_aseprite_file(astring: str) -> str:
-    if not any(astring.endswith(ext) for ext in INPUT_FILE_EXTENSIONS):
+def __type_positive_int(astring: str) -> int:
+    if not re.match('^[1-9]\\d*$', astring):
+        raise ValueError
+    return int(astring)
+
+
+def __type_unsigned_int(astring: str) -> int:
+    if not re.match('^\\d+$', astring):
+        raise ValueError
+    return int(astring)
+
+
+def __type_tile_formats(astring: str) -> List[str]:
+    formats = astring.split(',')
+    if not all(format in TILE_FORMAT_VALUES for format in formats):
+        raise ValueError
+    return formats
+
+
+def __type_input(astring: str) -> str:
+    if not (os.path.isdir(astring) or is_input_pattern(astring)
+            or any(astring.endswith(ext) for ext in INPUT_FILE_EXTENSIONS)):
         raise ValueError
     return astring
 
 
-def parse_args() -> Tuple[Namespace, ArgumentParser]:
+def parse_args(argv: Optional[List[str]] = None) -> Tuple[Namespace, ArgumentParser]:
     parser = argparse.ArgumentParser()
     parser.add_argument('--version', action='version', version=f'%(prog)s {VERSION}')
     parser.add_argument('-b', '--batch', help='run converter without gui',
                         default=False, action='store_true')
-    parser.add_argument('-i', '--input', help='aseprite file', type=__type_aseprite_file)
+    parser.add_argument('-i', '--input', help='aseprite file, directory or glob pattern of aseprite files',
+                        type=__type_input)
     parser.add_argument('-o', '--output', help='output directory')
     parser.add_argument('--create_output_dir', help='create output dir if not exists',
                         default=False, action='store_true')
@@ -106,5 +758,68 @@ def parse_args() -> Tuple[Namespace, ArgumentParser]:
                         type=__type_unsigned_float)
     parser.add_argument('--svg_only', help='Generate svg file only',
                         default=False, action='store_true')
+    parser.add_argument('--tile_formats', help='comma separated tile image formats: svg, png (default: svg,png)',
+                        type=__type_tile_formats, default=TILE_FORMAT_VALUES)
     parser.add_argument('--pivot', help='model pivot', choices=PIVOT_VALUES)
-    return parser.parse_args(), parser
+    parser.add_argument('--materials', help='one material per color, or one material textured with a palette '
+                                            'image of the sheet colors (default: color)',
+                        choices=MATERIAL_VALUES)
+    parser.add_argument('--exporter', help='tile export backend: aseprite script or native merged-rectangle writer',
+                        choices=EXPORTER_VALUES, default='aseprite')
+    parser.add_argument('--backend', help='mesh backend: blender fbx export or native mesher without blender',
+                        choices=BACKEND_VALUES, default='blender')
+    parser.add_argument('--merge', help='blender face merge: triangle pairs or maximal rectangles of the pixel grid',
+                        choices=MERGE_VALUES, default='pairs')
+    parser.add_argument('--svg_import', help='blender svg import: import_curve.svg or a mesh built '
+                                             'directly from the svg rects',
+                        choices=SVG_IMPORT_VALUES, default='curve')
+    parser.add_argument('--segments', help='blender extrusion in one step with this many side segments '
+                                           '(default: one extrusion step per unit of --extrude)',
+                        type=__type_positive_int)
+    parser.add_argument('--combine', help='write one mesh file per sheet, every distinct tile is stored once '
+                                          'and instanced at each grid position (glb for the native backend)',
+                        default=False, action='store_true')
+    parser.add_argument('--mesh_format', help='output format of the native backend',
+                        choices=MESH_FORMAT_VALUES, default='glb')
+    parser.add_argument('--export_shards', help='number of aseprite processes exporting the tile rows of one sheet '
+                                                '(default: --jobs, at most one per tile row)',
+                        type=__type_positive_int)
+    parser.add_argument('--stream', help='convert tiles in blender while the export is still running',
+                        default=False, action='store_true')
+    parser.add_argument('--skip_empty', help='do not convert fully transparent tiles',
+                        default=False, action='store_true')
+    parser.add_argument('--dedupe', help='convert identical tiles once and link the duplicates to it',
+                        default=False, action='store_true')
+    parser.add_argument('--no_cache', '--no-cache', help='convert every tile without the tile cache',
+                        default=False, action='store_true')
+    parser.add_argument('--cache_dir', help='tile cache directory', default=default_cache_dir())
+    parser.add_argument('--cache_size', help=f'tile cache size limit in MB (default: {DEFAULT_CACHE_SIZE_MB})',
+                        type=__type_positive_int, default=DEFAULT_CACHE_SIZE_MB)
+    parser.add_argument('--persistent_workers', help='keep --jobs blender processes running and reuse them '
+                                                     'for every conversion of the run',
+                        default=False, action='store_true')
+    parser.add_argument('--worker_memory_limit', help=f'restart a persistent blender worker above this peak memory '
+                                                      f'in MB (default: {DEFAULT_WORKER_MEMORY_MB})',
+                        type=__type_positive_int, default=DEFAULT_WORKER_MEMORY_MB)
+    parser.add_argument('--resume', help='skip the tiles a previous run converted with the same pixels and options, '
+                                         'as recorded in the journal of the sheet in the output directory',
+                        default=False, action='store_true')
+    parser.add_argument('--watch', help='keep running and reconvert input files when they are saved',
+                        default=False, action='store_true')
+    parser.add_argument('--debounce', help='seconds a changed file must stay unchanged before --watch reconverts it',
+                        type=__type_unsigned_float, default='1')
+    parser.add_argument('--profile', help='write stage and process timings, tile counts and blender mesh statistics '
+                                          'to this file, csv for a .csv file, json otherwise')
+    parser.add_argument('--timeout', help='seconds an aseprite or blender process may run before it is killed '
+                                          '(default: no limit)',
+                        type=__type_unsigned_float)
+    parser.add_argument('--retries', help='runs of a failed or killed process after the first one, '
+                                          'with a delay doubling from --retry_backoff',
+                        type=__type_unsigned_int, default=0)
+    parser.add_argument('--retry_backoff', help='seconds before the first retry', type=__type_unsigned_float,
+                        default='1')
+    parser.add_argument('--log_dir', help='write the output of every process to a log file in this directory '
+                                          'instead of printing it')
+    parser.add_argument('-j', '--jobs', help='number of parallel aseprite and blender processes (default: cpu count)',
+                        type=__type_positive_int)
+    return parser.parse_args(argv), parser
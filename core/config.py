@@ -4,6 +4,7 @@ from dataclasses import dataclass, asdict
 from typing import Optional
 
 PIVOT_VALUES = ['center', 'bottom']
+MATERIAL_VALUES = ['color', 'palette']
 
 
 @dataclass
@@ -26,12 +27,14 @@ class Config:
     output: Optional[str] = None
     svg_only: Optional[bool] = None
     pivot: Optional[str] = None
+    jobs: Optional[int] = None
+    materials: Optional[str] = None
 
 
 __DEFAULT_CONFIG_FILENAME = 'config.ini'
 
 
-def __validate_size_value(value: Optional[str]) -> Optional[Size]:
+def parse_size(value: Optional[str]) -> Optional[Size]:
     if value is not None and re.match('^\\d+x\\d+$', value):
         width_str, height_str = value.split('x')
         return Size(int(width_str), int(height_str))
@@ -44,12 +47,24 @@ def __validate_unsigned_float(value: Optional[str]) -> Optional[str]:
     return None
 
 
+def __validate_positive_int(value: Optional[str]) -> Optional[int]:
+    if value is not None and re.match('^[1-9]\\d*$', value):
+        return int(value)
+    return None
+
+
 def __validate_pivot(value: Optional[str]) -> Optional[str]:
     if value in PIVOT_VALUES:
         return value
     return None
 
 
+def __validate_materials(value: Optional[str]) -> Optional[str]:
+    if value in MATERIAL_VALUES:
+        return value
+    return None
+
+
 def load_config(config_filename: str = None) -> Config:
     config = configparser.ConfigParser()
     config.read(config_filename or __DEFAULT_CONFIG_FILENAME)
@@ -57,13 +72,15 @@ def load_config(config_filename: str = None) -> Config:
     return Config(
         blender=config.get('App', 'blender', fallback='blender.exe'),
         aseprite=config.get('App', 'aseprite', fallback='Aseprite.exe'),
-        size=__validate_size_value(config.get('User', 'size', fallback=None)),
+        size=parse_size(config.get('User', 'size', fallback=None)),
         scale=__validate_unsigned_float(config.get('User', 'scale', fallback=None)),
         extrude=__validate_unsigned_float(config.get('User', 'extrude', fallback=None)),
         input=config.get('User', 'input', fallback=None),
         output=config.get('User', 'output', fallback=None),
         svg_only=config.getboolean('User', 'svg_only', fallback=False),
-        pivot=__validate_pivot(config.get('User', 'pivot', fallback=None))
+        pivot=__validate_pivot(config.get('User', 'pivot', fallback=None)),
+        jobs=__validate_positive_int(config.get('User', 'jobs', fallback=None)),
+        materials=__validate_materials(config.get('User', 'materials', fallback=None))
     )
 
 
@@ -81,7 +98,7 @@ def save_config(new_config: Config, config_filename: str = None):
     if 'User' not in config:
         config['User'] = {}
 
-    for item in ['size', 'scale', 'extrude', 'input', 'output', 'svg_only', 'pivot']:
+    for item in ['size', 'scale', 'extrude', 'input', 'output', 'svg_only', 'pivot', 'jobs', 'materials']:
         if item == 'size':
             value = new_config.size
         else:
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Set
+
+JOURNAL_DONE = 'done'
+JOURNAL_FAILED = 'failed'
+
+
+@dataclass
+class JournalEntry:
+    name: str
+    # Tile key: hash of the tile pixels and the conversion parameters
+    key: str
+    status: str
+    # Mesh files written for the tile, empty when the tile has no faces
+    files: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    time: float = 0
+
+
+def journal_path(output: str, input_file: str) -> str:
+    return os.path.join(output, f'{os.path.basename(input_file)}_journal.jsonl')
+
+
+class Journal:
+    """Append-only record of the tile conversions of a sheet, one JSON line per finished or failed tile.
+
+    The last line of a tile wins. A line cut short by a crash is ignored when the journal is read.
+    """
+
+    def __init__(self, file_path: str, resume: bool = False):
+        self.file_path = file_path
+        self.__lock = threading.Lock()
+        # Tiles finished by this run
+        self.__finished: Set[str] = set()
+        self.entries: Dict[str, JournalEntry] = self.__read() if resume else {}
+        # A run that does not resume starts a new journal
+        self.__file = open(file_path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and not self.__ends_with_newline():
+            # Ends the line cut short by a crash so the next entry starts on its own line
+            self.__file.write('\n')
+            self.__file.flush()
+
+    def __read(self) -> Dict[str, JournalEntry]:
+        entries = {}
+        if not os.path.isfile(self.file_path):
+            return entries
+        with open(self.file_path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = JournalEntry(**json.loads(line))
+                except (ValueError, TypeError):
+                    continue
+                entries[entry.name] = entry
+        return entries
+
+    def __ends_with_newline(self) -> bool:
+        with open(self.file_path, 'rb') as file:
+            file.seek(0, os.SEEK_END)
+            if file.tell() == 0:
+                return True
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b'\n'
+
+    def completed(self, keys: Dict[str, str]) -> Set[str]:
+        """Tiles converted with the same key by an earlier run whose files still exist."""
+        return {name for name, entry in self.entries.items()
+                if entry.status == JOURNAL_DONE and keys.get(name) == entry.key
+                and all(os.path.isfile(each) for each in entry.files)}
+
+    def record(self, name: str, key: str, status: str, files: Optional[List[str]] = None,
+               error: Optional[str] = None):
+        entry = JournalEntry(name, key, status, files or [], error, time.time())
+        with self.__lock:
+            self.entries[name] = entry
+            if status == JOURNAL_DONE:
+                self.__finished.add(name)
+            # Flushed line by line so a killed run keeps every tile finished before it
+            self.__file.write(json.dumps(asdict(entry)) + '\n')
+            self.__file.flush()
+
+    def record_failed(self, keys: Dict[str, str], names: Set[str], error: str):
+        """Mark the tiles of names this run did not finish as failed."""
+        for name in sorted(names - self.__finished):
+            self.record(name, keys[name], JOURNAL_FAILED, error=error)
+
+    def close(self):
+        self.__file.close()
@@ -0,0 +1,84 @@
+import json
+import os
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional, Tuple
+from core.config import Size
+
+TILE_FORMAT_VALUES = ['svg', 'png']
+
+
+class ManifestError(Exception):
+    def __init__(self, message='Invalid tile manifest'):
+        self.message = message
+        super().__init__(self.message)
+
+
+@dataclass
+class TileEntry:
+    name: str
+    x: int
+    y: int
+    # Tile rectangle in the sprite: x, y, width, height
+    bounds: Tuple[int, int, int, int]
+    svg: Optional[str] = None
+    png: Optional[str] = None
+
+
+@dataclass
+class Manifest:
+    file: str
+    tile_width: int
+    tile_height: int
+    tiles: List[TileEntry] = field(default_factory=list)
+
+
+def tile_name(filename: str, x: int, y: int) -> str:
+    return f'{filename}_tile_{x}_{y}'
+
+
+def manifest_path(output: str, input_file: str) -> str:
+    return os.path.join(output, f'{os.path.basename(input_file)}_tiles.json')
+
+
+def shard_manifest_path(output: str, input_file: str, shard: int) -> str:
+    """Manifest of the tiles one shard of a sharded export wrote."""
+    return os.path.join(output, f'{os.path.basename(input_file)}_tiles_shard_{shard}.json')
+
+
+def merge_manifests(manifests: List[Manifest]) -> Manifest:
+    """One manifest with the tiles of every shard in sheet order."""
+    tiles = sorted((tile for manifest in manifests for tile in manifest.tiles), key=lambda tile: (tile.y, tile.x))
+    return Manifest(manifests[0].file, manifests[0].tile_width, manifests[0].tile_height, tiles)
+
+
+def build_manifest(input_file: str, output: str, sprite_size: Size, size: Optional[Size] = None,
+                   formats: Optional[List[str]] = None, shard: int = 0, shards: int = 1) -> Manifest:
+    """The manifest convert_to_svg.lua writes for a sprite of the given size, for every shards-th tile row."""
+    formats = formats or TILE_FORMAT_VALUES
+    tile_width = size.width if size is not None else sprite_size.width
+    tile_height = size.height if size is not None else sprite_size.height
+    filename = os.path.basename(input_file)
+    manifest = Manifest(input_file, tile_width, tile_height)
+    for y in range(shard, sprite_size.height // tile_height, shards):
+        for x in range(sprite_size.width // tile_width):
+            name = tile_name(filename, x, y)
+            paths = {format: os.path.join(output, f'{name}.{format}') for format in formats}
+            manifest.tiles.append(TileEntry(name, x, y, (x * tile_width, y * tile_height, tile_width, tile_height),
+                                            paths.get('svg'), paths.get('png')))
+    return manifest
+
+
+def write_manifest(file_path: str, manifest: Manifest):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump(asdict(manifest), file, indent=2)
+
+
+def read_manifest(file_path: str) -> Manifest:
+    try:
+        with open(file_path, encoding='utf-8') as file:
+            data = json.load(file)
+        tiles = [TileEntry(each['name'], each['x'], each['y'], tuple(each['bounds']), each.get('svg'), each.get('png'))
+                 for each in data['tiles']]
+        return Manifest(data['file'], data['tile_width'], data['tile_height'], tiles)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise ManifestError(f'Failed to read tile manifest {file_path}: {e}')
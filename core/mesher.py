@@ -0,0 +1,289 @@
+import json
+import os
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from core.palette import Palette
+from core.tile_writer import greedy_rectangles, color_keys, key_color, png_bytes
+
+MESH_FORMAT_VALUES = ['glb', 'obj']
+PALETTE_MATERIAL_NAME = 'Palette'
+# glTF sampler filter: every face samples the center of one palette texel
+NEAREST_FILTER = 9728
+
+# Size of one pixel in meters, the same as an SVG pixel imported by Blender (90 DPI)
+PIXEL_SIZE = 0.3048 / 12.0 / 90.0
+
+
+@dataclass
+class Mesh:
+    # Every face is a quad with its own 4 vertices, so normals stay flat
+    positions: np.ndarray
+    normals: np.ndarray
+    colors: np.ndarray
+    # Pivot the positions are relative to, from the top left corner of the tile with Y up
+    origin: np.ndarray = field(default_factory=lambda: np.zeros(3))
+
+    @property
+    def face_count(self) -> int:
+        return len(self.colors)
+
+
+def srgb_to_linear(values: np.ndarray) -> np.ndarray:
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def material_name(color: Tuple[int, int, int, int]) -> str:
+    r, g, b = srgb_to_linear(np.array(color[:3]) / 255)
+    return f'Color_{r:.3f}_{g:.3f}_{b:.3f}'
+
+
+def __runs(line: np.ndarray) -> List[Tuple[int, int, int]]:
+    """Split a line of color keys into (start, end, key) runs of equal non-zero keys."""
+    runs = []
+    edges = np.flatnonzero(np.diff(line)) + 1
+    for start, end in zip(np.concatenate([[0], edges]), np.concatenate([edges, [len(line)]])):
+        if line[start]:
+            runs.append((int(start), int(end), int(line[start])))
+    return runs
+
+
+def __wall_quads(keys: np.ndarray, depth: float) -> Tuple[List[list], List[int]]:
+    """Side quads along the outline of the opaque pixels, merged along runs of the same color."""
+    quads, quad_keys = [], []
+    height, width = keys.shape
+    opaque = keys != 0
+    padded = np.pad(opaque, 1)
+    # Pixel y grows down, mesh Y grows up
+    for row_step, name in [(-1, 'top'), (1, 'bottom')]:
+        outline = opaque & ~padded[1 + row_step:height + 1 + row_step, 1:-1]
+        for row in range(height):
+            y = -row if name == 'top' else -(row + 1)
+            for start, end, key in __runs(np.where(outline[row], keys[row], 0)):
+                low, high = [start, y, 0], [end, y, 0]
+                if name == 'top':
+                    quads.append([low, [start, y, depth], [end, y, depth], high])
+                else:
+                    quads.append([low, high, [end, y, depth], [start, y, depth]])
+                quad_keys.append(key)
+    for column_step, name in [(-1, 'left'), (1, 'right')]:
+        outline = opaque & ~padded[1:-1, 1 + column_step:width + 1 + column_step]
+        for column in range(width):
+            x = column if name == 'left' else column + 1
+            for start, end, key in __runs(np.where(outline[:, column], keys[:, column], 0)):
+                low, high = [x, -end, 0], [x, -start, 0]
+                if name == 'left':
+                    quads.append([low, [x, -end, depth], [x, -start, depth], high])
+                else:
+                    quads.append([low, high, [x, -start, depth], [x, -end, depth]])
+                quad_keys.append(key)
+    return quads, quad_keys
+
+
+def build_mesh(pixels: np.ndarray, extrude: float = 1, scale: float = 1, pivot: str = 'center') -> Optional[Mesh]:
+    """Extrude the opaque pixels of a tile along +Z, Y up, with the convert_svg_to_fbx.py scale and pivot."""
+    rectangles = greedy_rectangles(pixels)
+    if not rectangles:
+        return None
+    quads, quad_colors = [], []
+    for x, y, width, height, color in rectangles:
+        left, right, bottom, top = x, x + width, -(y + height), -y
+        quads.append([[left, bottom, extrude], [right, bottom, extrude], [right, top, extrude], [left, top, extrude]])
+        quad_colors.append(color)
+        if extrude > 0:
+            quads.append([[left, bottom, 0], [left, top, 0], [right, top, 0], [right, bottom, 0]])
+            quad_colors.append(color)
+    if extrude > 0:
+        keys = color_keys(pixels)
+        walls, wall_keys = __wall_quads(keys, extrude)
+        quads += walls
+        quad_colors += [key_color(key) for key in wall_keys]
+
+    positions = np.array(quads, dtype=np.float64) * PIXEL_SIZE * scale
+    low, high = positions.reshape(-1, 3).min(axis=0), positions.reshape(-1, 3).max(axis=0)
+    origin = (low + high) / 2
+    if pivot == 'bottom':
+        origin[1] = low[1]
+    positions -= origin
+
+    normals = np.cross(positions[:, 1] - positions[:, 0], positions[:, 2] - positions[:, 0])
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    return Mesh(positions.astype(np.float32), np.repeat(normals[:, None], 4, axis=1).astype(np.float32),
+                np.array(quad_colors, dtype=np.uint8), origin)
+
+
+def __color_groups(mesh: Mesh) -> Dict[Tuple[int, int, int, int], np.ndarray]:
+    colors, inverse = np.unique(mesh.colors, axis=0, return_inverse=True)
+    return {tuple(int(c) for c in color): np.flatnonzero(inverse.reshape(-1) == i) for i, color in enumerate(colors)}
+
+
+def write_obj(file_path: str, mesh: Mesh, palette: Optional[Palette] = None, texture: Optional[str] = None):
+    """Write the mesh with a material per color, or with palette and the path of its image with one material
+    and a texture coordinate per face."""
+    mtl_file_path = os.path.splitext(file_path)[0] + '.mtl'
+    groups = __color_groups(mesh)
+    with open(mtl_file_path, 'w') as file:
+        if palette is not None:
+            file.write(f'newmtl {PALETTE_MATERIAL_NAME}\nKd 1.000000 1.000000 1.000000\nmap_Kd {texture}\n'
+                       f'map_d {texture}\n\n')
+        else:
+            for color in groups:
+                r, g, b, a = [c / 255 for c in color]
+                file.write(f'newmtl {material_name(color)}\nKd {r:.6f} {g:.6f} {b:.6f}\nd {a:.6f}\n\n')
+
+    # Faces of the same quad share a normal, positions are deduplicated across quads
+    positions, position_index = np.unique(mesh.positions.reshape(-1, 3), axis=0, return_inverse=True)
+    position_index = position_index.reshape(-1, 4) + 1
+    lines = [f'mtllib {os.path.basename(mtl_file_path)}\n']
+    lines += [f'v {x:.6f} {y:.6f} {z:.6f}\n' for x, y, z in positions]
+    lines += [f'vn {x:.6f} {y:.6f} {z:.6f}\n' for x, y, z in mesh.normals[:, 0]]
+    if palette is not None:
+        colors = np.array(list(groups), dtype=np.uint8)
+        lines += [f'vt {u:.6f} {v:.6f}\n' for u, v in palette.uvs(colors)]
+        lines.append(f'usemtl {PALETTE_MATERIAL_NAME}\n')
+        for uv_index, faces in enumerate(groups.values(), 1):
+            for face in faces:
+                lines.append('f ' + ' '.join(f'{index}/{uv_index}/{face + 1}' for index in position_index[face])
+                             + '\n')
+    else:
+        for color, faces in groups.items():
+            lines.append(f'usemtl {material_name(color)}\n')
+            for face in faces:
+                lines.append('f ' + ' '.join(f'{index}//{face + 1}' for index in position_index[face]) + '\n')
+    with open(file_path, 'w') as file:
+        file.writelines(lines)
+
+
+class __GlbBuilder:
+    """Buffer, accessors and materials of a glb file, materials are shared by every mesh with the same color.
+
+    With a palette every mesh is one primitive of a single material textured with the palette image.
+    """
+
+    def __init__(self, palette: Optional[Palette] = None):
+        self.buffer = bytearray()
+        self.buffer_views, self.accessors, self.materials, self.meshes = [], [], [], []
+        self.images, self.textures, self.samplers = [], [], []
+        self.palette = palette
+        self.__material_index: Dict[Tuple[int, int, int, int], int] = {}
+
+    def __add_view(self, data: bytes, target: Optional[int] = None) -> int:
+        view = {'buffer': 0, 'byteOffset': len(self.buffer), 'byteLength': len(data)}
+        if target is not None:
+            view['target'] = target
+        self.buffer_views.append(view)
+        self.buffer.extend(data + b'\0' * (-len(data) % 4))
+        return len(self.buffer_views) - 1
+
+    def __palette_material(self) -> int:
+        if not self.materials:
+            self.images.append({'bufferView': self.__add_view(png_bytes(self.palette.image())),
+                                'mimeType': 'image/png'})
+            self.samplers.append({'magFilter': NEAREST_FILTER, 'minFilter': NEAREST_FILTER})
+            self.textures.append({'source': 0, 'sampler': 0})
+            material = {'name': PALETTE_MATERIAL_NAME,
+                        'pbrMetallicRoughness': {'baseColorTexture': {'index': 0},
+                                                 'metallicFactor': 0, 'roughnessFactor': 1}}
+            if (self.palette.colors[:, 3] < 255).any():
+                material['alphaMode'] = 'BLEND'
+            self.materials.append(material)
+        return 0
+
+    def add_palette_mesh(self, name: str, mesh: Mesh) -> int:
+        positions = mesh.positions.reshape(-1, 3)
+        normals = mesh.normals.reshape(-1, 3)
+        # glTF texture coordinates grow down from the top row of the image
+        uvs = np.repeat(self.palette.uvs(mesh.colors), 4, axis=0) * [1, -1] + [0, 1]
+        indices = (np.arange(mesh.face_count, dtype=np.uint32)[:, None] * 4 + np.array([0, 1, 2, 0, 2, 3]))
+        position_accessor = len(self.accessors)
+        self.accessors.append({'bufferView': self.__add_view(positions.tobytes(), 34962), 'componentType': 5126,
+                               'count': len(positions), 'type': 'VEC3',
+                               'min': positions.min(axis=0).tolist(), 'max': positions.max(axis=0).tolist()})
+        self.accessors.append({'bufferView': self.__add_view(normals.tobytes(), 34962), 'componentType': 5126,
+                               'count': len(normals), 'type': 'VEC3'})
+        self.accessors.append({'bufferView': self.__add_view(uvs.astype(np.float32).tobytes(), 34962),
+                               'componentType': 5126, 'count': len(uvs), 'type': 'VEC2'})
+        self.accessors.append({'bufferView': self.__add_view(indices.reshape(-1).tobytes(), 34963),
+                               'componentType': 5125, 'count': indices.size, 'type': 'SCALAR'})
+        self.meshes.append({'name': name, 'primitives': [{
+            'attributes': {'POSITION': position_accessor, 'NORMAL': position_accessor + 1,
+                           'TEXCOORD_0': position_accessor + 2},
+            'indices': position_accessor + 3, 'material': self.__palette_material()}]})
+        return len(self.meshes) - 1
+
+    def __material(self, color: Tuple[int, int, int, int]) -> int:
+        if color not in self.__material_index:
+            rgb = srgb_to_linear(np.array(color[:3]) / 255).tolist()
+            material = {'name': material_name(color),
+                        'pbrMetallicRoughness': {'baseColorFactor': rgb + [color[3] / 255],
+                                                 'metallicFactor': 0, 'roughnessFactor': 1}}
+            if color[3] < 255:
+                material['alphaMode'] = 'BLEND'
+            self.__material_index[color] = len(self.materials)
+            self.materials.append(material)
+        return self.__material_index[color]
+
+    def add_mesh(self, name: str, mesh: Mesh, groups: Dict[Tuple[int, int, int, int], np.ndarray]) -> int:
+        """Add a mesh with a primitive per group of faces of the same color."""
+        primitives = []
+        for color, faces in groups.items():
+            positions = mesh.positions[faces].reshape(-1, 3)
+            normals = mesh.normals[faces].reshape(-1, 3)
+            indices = (np.arange(len(faces), dtype=np.uint32)[:, None] * 4 + np.array([0, 1, 2, 0, 2, 3])).reshape(-1)
+            position_accessor = len(self.accessors)
+            self.accessors.append({'bufferView': self.__add_view(positions.tobytes(), 34962), 'componentType': 5126,
+                                   'count': len(positions), 'type': 'VEC3',
+                                   'min': positions.min(axis=0).tolist(), 'max': positions.max(axis=0).tolist()})
+            self.accessors.append({'bufferView': self.__add_view(normals.tobytes(), 34962), 'componentType': 5126,
+                                   'count': len(normals), 'type': 'VEC3'})
+            self.accessors.append({'bufferView': self.__add_view(indices.astype(np.uint32).tobytes(), 34963),
+                                   'componentType': 5125, 'count': len(indices), 'type': 'SCALAR'})
+            primitives.append({'attributes': {'POSITION': position_accessor, 'NORMAL': position_accessor + 1},
+                               'indices': position_accessor + 2, 'material': self.__material(color)})
+        self.meshes.append({'name': name, 'primitives': primitives})
+        return len(self.meshes) - 1
+
+    def write(self, file_path: str, nodes: List[dict]):
+        document = {'asset': {'version': '2.0', 'generator': 'aseprite_to_blender_converter'},
+                    'scene': 0, 'scenes': [{'nodes': list(range(len(nodes)))}], 'nodes': nodes,
+                    'meshes': self.meshes, 'materials': self.materials, 'accessors': self.accessors,
+                    'bufferViews': self.buffer_views, 'buffers': [{'byteLength': len(self.buffer)}]}
+        if self.images:
+            document.update(images=self.images, textures=self.textures, samplers=self.samplers)
+        json_chunk = json.dumps(document, separators=(',', ':')).encode()
+        json_chunk += b' ' * (-len(json_chunk) % 4)
+        with open(file_path, 'wb') as file:
+            file.write(struct.pack('<III', 0x46546C67, 2, 12 + 8 + len(json_chunk) + 8 + len(self.buffer)))
+            file.write(struct.pack('<II', len(json_chunk), 0x4E4F534A) + json_chunk)
+            file.write(struct.pack('<II', len(self.buffer), 0x004E4942) + bytes(self.buffer))
+
+
+def __add_glb_mesh(builder: __GlbBuilder, name: str, mesh: Mesh) -> int:
+    if builder.palette is not None:
+        return builder.add_palette_mesh(name, mesh)
+    return builder.add_mesh(name, mesh, __color_groups(mesh))
+
+
+def write_glb(file_path: str, mesh: Mesh, palette: Optional[Palette] = None):
+    builder = __GlbBuilder(palette)
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    builder.write(file_path, [{'name': name, 'mesh': __add_glb_mesh(builder, name, mesh)}])
+
+
+def write_instanced_glb(file_path: str, meshes: Dict[str, Mesh], nodes: List[Tuple[str, str, np.ndarray]],
+                        palette: Optional[Palette] = None):
+    """One glb with every mesh stored once and a node per (name, mesh key, translation) using it."""
+    builder = __GlbBuilder(palette)
+    mesh_index = {key: __add_glb_mesh(builder, key[:16], mesh) for key, mesh in meshes.items()}
+    builder.write(file_path, [{'name': name, 'mesh': mesh_index[key],
+                               'translation': [float(value) for value in translation]}
+                              for name, key, translation in nodes])
+
+
+def write_mesh(file_path: str, mesh: Mesh, palette: Optional[Palette] = None, texture: Optional[str] = None):
+    """Write a glb or obj, with palette the faces are textured with the palette image at texture (obj only)."""
+    if file_path.endswith('.obj'):
+        write_obj(file_path, mesh, palette, texture)
+    else:
+        write_glb(file_path, mesh, palette)
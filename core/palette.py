@@ -0,0 +1,62 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Iterable, Optional
+import numpy as np
+from core.aseprite_file import read_tiles
+from core.config import Size
+from core.tile_writer import color_keys, write_png
+
+
+@dataclass
+class Palette:
+    # Distinct RGBA colors, color i is the texel (i % width, i // width) of the palette image
+    colors: np.ndarray
+
+    @property
+    def width(self) -> int:
+        return max(1, int(np.ceil(np.sqrt(len(self.colors)))))
+
+    @property
+    def height(self) -> int:
+        return max(1, -(-len(self.colors) // self.width))
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha256(np.ascontiguousarray(self.colors, dtype=np.uint8).tobytes()).hexdigest()
+
+    def image(self) -> np.ndarray:
+        texels = np.zeros((self.width * self.height, 4), dtype=np.uint8)
+        texels[:len(self.colors)] = self.colors
+        return texels.reshape(self.height, self.width, 4)
+
+    def index(self, colors: np.ndarray) -> np.ndarray:
+        """Palette index of every RGBA color, the colors must be in the palette."""
+        palette_keys = color_keys(self.colors)
+        order = np.argsort(palette_keys)
+        return order[np.searchsorted(palette_keys[order], color_keys(colors))]
+
+    def uvs(self, colors: np.ndarray) -> np.ndarray:
+        """Texel center of every RGBA color, v grows up from the bottom row of the image."""
+        index = self.index(colors)
+        return np.column_stack([(index % self.width + 0.5) / self.width,
+                                1 - (index // self.width + 0.5) / self.height])
+
+
+def sheet_palette(tiles: Iterable[np.ndarray]) -> Palette:
+    """The colors of the opaque pixels of the tiles, ordered by RGBA value."""
+    keys = np.unique(np.concatenate([color_keys(tile).reshape(-1) for tile in tiles] or [np.zeros(0, np.uint32)]))
+    keys = keys[keys != 0]
+    return Palette(np.column_stack([(keys >> shift) & 0xFF for shift in (24, 16, 8, 0)]).astype(np.uint8))
+
+
+def palette_path(output: str, input_file: str) -> str:
+    return os.path.join(output, f'{os.path.basename(input_file)}_palette.png')
+
+
+def export_palette(input_file: str, output: str, size: Optional[Size] = None) -> Palette:
+    """Write the palette image of the tiles of a sheet for palette materials."""
+    tiles = read_tiles(input_file, size.width, size.height) if size is not None else read_tiles(input_file)
+    palette = sheet_palette(tiles.values())
+    write_png(palette_path(output, input_file), palette.image())
+    return palette
@@ -0,0 +1,203 @@
+import csv
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, asdict, fields
+from typing import Callable, ContextManager, Dict, List, Optional
+
+# Line convert_svg_to_fbx.py prints after every converted tile, followed by a JSON object
+TILE_STATS_PREFIX = 'Tile stats: '
+# Blender script phases timed for every tile
+TILE_PHASES = ['import', 'cleanup', 'extrude', 'export']
+SLOWEST_TILES = 5
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    input: Optional[str]
+    seconds: float
+
+
+@dataclass
+class ProcessRecord:
+    program: str
+    script: str
+    seconds: float
+    # Time spent waiting for a free process slot or worker before the process ran
+    wait_seconds: float
+    returncode: Optional[int] = None
+
+
+@dataclass
+class TileRecord:
+    file: str
+    vertices: int = 0
+    faces: int = 0
+    materials: int = 0
+    import_seconds: float = 0
+    cleanup_seconds: float = 0
+    extrude_seconds: float = 0
+    export_seconds: float = 0
+
+    @property
+    def seconds(self) -> float:
+        return self.import_seconds + self.cleanup_seconds + self.extrude_seconds + self.export_seconds
+
+
+@dataclass
+class FileRecord:
+    input: str
+    tiles: int = 0
+    converted: int = 0
+    cached: int = 0
+    # Tiles converted by an earlier run, skipped by --resume
+    resumed: int = 0
+
+
+class Profiler:
+    """Wall time of pipeline stages and processes, tile counts and per tile mesh statistics of a run."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.__clock = clock
+        self.__started = clock()
+        self.__lock = threading.Lock()
+        self.stages: List[StageRecord] = []
+        self.processes: List[ProcessRecord] = []
+        self.tiles: List[TileRecord] = []
+        self.files: Dict[str, FileRecord] = {}
+
+    @property
+    def seconds(self) -> float:
+        return self.__clock() - self.__started
+
+    @contextmanager
+    def stage(self, name: str, input_file: Optional[str] = None):
+        start = self.__clock()
+        try:
+            yield
+        finally:
+            with self.__lock:
+                self.stages.append(StageRecord(name, input_file, self.__clock() - start))
+
+    def add_process(self, record: ProcessRecord):
+        with self.__lock:
+            self.processes.append(record)
+
+    def add_tile(self, record: TileRecord):
+        with self.__lock:
+            self.tiles.append(record)
+
+    def count_tiles(self, input_file: str, tiles: int = 0, converted: int = 0, cached: int = 0, resumed: int = 0):
+        with self.__lock:
+            record = self.files.setdefault(input_file, FileRecord(input_file))
+            record.tiles += tiles
+            record.converted += converted
+            record.cached += cached
+            record.resumed += resumed
+
+    def record_line(self, line: str):
+        """Add the tile statistics of a convert_svg_to_fbx.py output line, other lines are ignored."""
+        if not line.startswith(TILE_STATS_PREFIX):
+            return
+        try:
+            stats = json.loads(line[len(TILE_STATS_PREFIX):])
+            record = TileRecord(stats['file'], stats['vertices'], stats['faces'], stats['materials'],
+                                *[stats['seconds'][phase] for phase in TILE_PHASES])
+        except (ValueError, KeyError, TypeError):
+            return
+        self.add_tile(record)
+
+    def report(self) -> dict:
+        with self.__lock:
+            return {'seconds': self.seconds,
+                    'stages': [asdict(each) for each in self.stages],
+                    'processes': [asdict(each) for each in self.processes],
+                    'files': [asdict(each) for each in self.files.values()],
+                    'tiles': [asdict(each) for each in self.tiles]}
+
+    def write(self, file_path: str):
+        """Write the report as CSV for a .csv file, as JSON otherwise."""
+        report = self.report()
+        if not file_path.lower().endswith('.csv'):
+            with open(file_path, 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            return
+        # One row per record, the columns of the other record types stay empty
+        columns = ['record']
+        for record_type in [StageRecord, ProcessRecord, FileRecord, TileRecord]:
+            columns += [each.name for each in fields(record_type) if each.name not in columns]
+        with open(file_path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, columns)
+            writer.writeheader()
+            writer.writerow({'record': 'run', 'seconds': report['seconds']})
+            for key, record in [('stages', 'stage'), ('processes', 'process'), ('files', 'file'), ('tiles', 'tile')]:
+                for row in report[key]:
+                    writer.writerow({'record': record, **row})
+
+    def summary(self) -> List[str]:
+        with self.__lock:
+            stages, processes = list(self.stages), list(self.processes)
+            tiles, files = list(self.tiles), list(self.files.values())
+        lines = [f'Profile: {self.seconds:.2f} s']
+        stage_names = list(dict.fromkeys(each.stage for each in stages))
+        for name in stage_names:
+            records = [each for each in stages if each.stage == name]
+            lines.append(f'  {name}: {len(records)} runs, {sum(each.seconds for each in records):.2f} s')
+        for program in dict.fromkeys(each.program for each in processes):
+            records = [each for each in processes if each.program == program]
+            lines.append(f'  {program}: {len(records)} processes, {sum(each.seconds for each in records):.2f} s, '
+                         f'waited {sum(each.wait_seconds for each in records):.2f} s')
+        if files:
+            lines.append(f'  tiles: {sum(each.tiles for each in files)}, '
+                         f'converted {sum(each.converted for each in files)}, '
+                         f'cached {sum(each.cached for each in files)}, '
+                         f'resumed {sum(each.resumed for each in files)}')
+        if tiles:
+            phases = ', '.join(f'{phase} {sum(getattr(each, f"{phase}_seconds") for each in tiles):.2f} s'
+                               for phase in TILE_PHASES)
+            lines.append(f'  meshes: {len(tiles)}, {sum(each.vertices for each in tiles)} vertices, '
+                         f'{sum(each.faces for each in tiles)} faces, {phases}')
+            lines.append('  slowest tiles:')
+            for each in sorted(tiles, key=lambda tile: tile.seconds, reverse=True)[:SLOWEST_TILES]:
+                lines.append(f'    {each.file}: {each.seconds:.3f} s, {each.faces} faces, {each.materials} materials')
+        return lines
+
+
+__profiler: Optional[Profiler] = None
+
+
+def use_profiler(profiler: Optional[Profiler]):
+    """Record the stages, processes and tiles of the following conversions in profiler, None to stop."""
+    global __profiler
+    __profiler = profiler
+
+
+def profile_stage(name: str, input_file: Optional[str] = None) -> ContextManager:
+    profiler = __profiler
+    return profiler.stage(name, input_file) if profiler is not None else nullcontext()
+
+
+def profile_process(record: ProcessRecord):
+    profiler = __profiler
+    if profiler is not None:
+        profiler.add_process(record)
+
+
+def profile_tile(record: TileRecord):
+    profiler = __profiler
+    if profiler is not None:
+        profiler.add_tile(record)
+
+
+def profile_line(line: str):
+    profiler = __profiler
+    if profiler is not None:
+        profiler.record_line(line)
+
+
+def profile_tile_counts(input_file: str, tiles: int = 0, converted: int = 0, cached: int = 0, resumed: int = 0):
+    profiler = __profiler
+    if profiler is not None:
+        profiler.count_tiles(input_file, tiles, converted, cached, resumed)
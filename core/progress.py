@@ -0,0 +1,32 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class Progress:
+    """Done and total tiles of a conversion stage with a linear estimate of the remaining time."""
+
+    def __init__(self, total: int = 0, clock: Callable[[], float] = time.monotonic):
+        self.total = total
+        self.done = 0
+        self.__clock = clock
+        self.__started = clock()
+        self.__lock = threading.Lock()
+
+    def advance(self, count: int = 1) -> int:
+        with self.__lock:
+            self.done += count
+            return self.done
+
+    def eta(self) -> Optional[float]:
+        """Seconds left, None until a tile is done or without a total."""
+        if not self.done or self.total <= 0:
+            return None
+        elapsed = self.__clock() - self.__started
+        return max(0.0, elapsed / self.done * (self.total - self.done))
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02}:{seconds:02}' if hours else f'{minutes}:{seconds:02}'
@@ -0,0 +1,213 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+from typing import Optional
+import numpy as np
+from core.aseprite_file import (read_sprite, read_sprite_size, write_sprite, composite, composite_differences,
+                                split_tiles, read_tiles, AsepriteFileError, COLOR_DEPTH_GRAYSCALE, COLOR_DEPTH_INDEXED,
+                                COLOR_DEPTH_RGBA)
+
+
+TILE_X_FLIP = 0x80000000
+TILE_Y_FLIP = 0x40000000
+
+
+def chunk(chunk_type: int, data: bytes) -> bytes:
+    return struct.pack('<IH', len(data) + 6, chunk_type) + data
+
+
+def layer_chunk(name: str, flags: int = 1, child_level: int = 0, layer_type: int = 0, opacity: int = 255,
+                blend_mode: int = 0, tileset_index: Optional[int] = None) -> bytes:
+    encoded = name.encode()
+    return chunk(0x2004, struct.pack('<HHHHHHB3x', flags, layer_type, child_level, 0, 0, blend_mode, opacity)
+                 + struct.pack('<H', len(encoded)) + encoded
+                 + (struct.pack('<I', tileset_index) if tileset_index is not None else b''))
+
+
+def tileset_chunk(tileset_id: int, tiles: np.ndarray) -> bytes:
+    """An embedded tileset of (count, height, width, 4) RGBA tiles."""
+    count, height, width = tiles.shape[:3]
+    data = zlib.compress(tiles.astype(np.uint8).tobytes())
+    return chunk(0x2023, struct.pack('<IIIHHh14x', tileset_id, 2, count, width, height, 1)
+                 + struct.pack('<H', 0) + struct.pack('<I', len(data)) + data)
+
+
+def tilemap_cel_chunk(layer_index: int, x: int, y: int, tiles: np.ndarray) -> bytes:
+    """A compressed tilemap cel of 32 bit tile ids with the x flip, y flip and diagonal flip bits on top."""
+    height, width = tiles.shape
+    return chunk(0x2005, struct.pack('<HhhBHh5x', layer_index, x, y, 255, 3, 0)
+                 + struct.pack('<HHHIIII10x', width, height, 32, 0x1fffffff, TILE_X_FLIP, TILE_Y_FLIP, 0x20000000)
+                 + zlib.compress(tiles.astype('<u4').tobytes()))
+
+
+def cel_chunk(layer_index: int, x: int, y: int, pixels: np.ndarray, opacity: int = 255) -> bytes:
+    height, width = pixels.shape[:2]
+    return chunk(0x2005, struct.pack('<HhhBHh5x', layer_index, x, y, opacity, 2, 0)
+                 + struct.pack('<HH', width, height) + zlib.compress(pixels.astype(np.uint8).tobytes()))
+
+
+def linked_cel_chunk(layer_index: int, frame: int) -> bytes:
+    return chunk(0x2005, struct.pack('<HhhBHh5x', layer_index, 0, 0, 255, 1, 0) + struct.pack('<H', frame))
+
+
+def palette_chunk(colors) -> bytes:
+    data = struct.pack('<III8x', len(colors), 0, len(colors) - 1)
+    for color in colors:
+        data += struct.pack('<HBBBB', 0, *color)
+    return chunk(0x2019, data)
+
+
+def sprite_bytes(width: int, height: int, color_depth: int, frames, transparent_index: int = 0) -> bytes:
+    body = b''
+    for chunks in frames:
+        data = b''.join(chunks)
+        body += struct.pack('<IHHH2xI', 16 + len(data), 0xF1FA, len(chunks), 100, len(chunks)) + data
+    header = struct.pack('<IHHHHHIHIIB3xHBBhhHH84x', 128 + len(body), 0xA5E0, len(frames), width, height,
+                         color_depth, 1, 100, 0, 0, transparent_index, 0, 1, 1, 0, 0, 0, 0)
+    return header + body
+
+
+class TestAsepriteFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_file = tempfile.mktemp(suffix='.aseprite')
+
+    def tearDown(self):
+        if os.path.exists(self.temp_file):
+            os.remove(self.temp_file)
+
+    def write(self, data: bytes):
+        with open(self.temp_file, 'wb') as file:
+            file.write(data)
+
+    def test_write_and_read_rgba(self):
+        image = np.random.default_rng(1).integers(0, 256, (6, 8, 4), dtype=np.uint8)
+        image[..., 3] = 255
+        write_sprite(self.temp_file, image)
+        sprite = read_sprite(self.temp_file)
+        self.assertEqual((sprite.width, sprite.height, sprite.color_depth), (8, 6, COLOR_DEPTH_RGBA))
+        np.testing.assert_array_equal(composite(sprite), image)
+        self.assertEqual(read_sprite_size(self.temp_file), (8, 6))
+
+    def test_indexed_transparent_index(self):
+        palette = [(0, 0, 0, 255), (255, 0, 0, 255), (0, 255, 0, 255)]
+        indices = np.array([[0, 1], [2, 0]])
+        self.write(sprite_bytes(2, 2, COLOR_DEPTH_INDEXED,
+                                [[palette_chunk(palette), layer_chunk('a'), cel_chunk(0, 0, 0, indices)]]))
+        image = composite(read_sprite(self.temp_file))
+        np.testing.assert_array_equal(image[0, 1], [255, 0, 0, 255])
+        np.testing.assert_array_equal(image[1, 0], [0, 255, 0, 255])
+        self.assertEqual(image[0, 0, 3], 0)
+
+    def test_indexed_background_layer_is_opaque(self):
+        palette = [(10, 20, 30, 255), (255, 0, 0, 255)]
+        self.write(sprite_bytes(1, 1, COLOR_DEPTH_INDEXED,
+                                [[palette_chunk(palette), layer_chunk('bg', flags=1 | 8),
+                                  cel_chunk(0, 0, 0, np.array([[0]]))]]))
+        np.testing.assert_array_equal(composite(read_sprite(self.temp_file))[0, 0], [10, 20, 30, 255])
+
+    def test_grayscale(self):
+        pixels = np.array([[[100, 255], [200, 0]]])
+        self.write(sprite_bytes(2, 1, COLOR_DEPTH_GRAYSCALE, [[layer_chunk('a'), cel_chunk(0, 0, 0, pixels)]]))
+        image = composite(read_sprite(self.temp_file))
+        np.testing.assert_array_equal(image[0, 0], [100, 100, 100, 255])
+        self.assertEqual(image[0, 1, 3], 0)
+
+    def test_layers_visibility_opacity_and_offsets(self):
+        red = np.array([[[255, 0, 0, 255]]])
+        blue = np.array([[[0, 0, 255, 255]]])
+        green = np.array([[[0, 255, 0, 255]]])
+        self.write(sprite_bytes(3, 1, COLOR_DEPTH_RGBA, [[
+            layer_chunk('bottom'), layer_chunk('hidden group', flags=0, layer_type=1),
+            layer_chunk('child', child_level=1), layer_chunk('top', opacity=128),
+            cel_chunk(0, 0, 0, np.repeat(red, 3, axis=1)), cel_chunk(2, 1, 0, green),
+            cel_chunk(3, 2, 0, blue), cel_chunk(3, -5, 0, blue)]]))
+        sprite = read_sprite(self.temp_file)
+        self.assertFalse(sprite.is_visible(2))
+        image = composite(sprite)
+        np.testing.assert_array_equal(image[0, 1], [255, 0, 0, 255])
+        np.testing.assert_array_equal(image[0, 2], [127, 0, 128, 255])
+
+    def test_composite_in_bands(self):
+        rng = np.random.default_rng(2)
+        bottom, top = (rng.integers(0, 256, (7, 5, 4), dtype=np.uint8) for _ in range(2))
+        self.write(sprite_bytes(6, 9, COLOR_DEPTH_RGBA, [[
+            layer_chunk('bottom'), layer_chunk('top', opacity=200),
+            cel_chunk(0, 0, 1, bottom), cel_chunk(1, 2, -2, top, opacity=100)]]))
+        sprite = read_sprite(self.temp_file)
+        image = composite(sprite)
+        for band_pixels in [6 * 2, 1]:
+            with mock.patch('core.aseprite_file.COMPOSITE_BAND_PIXELS', band_pixels):
+                np.testing.assert_array_equal(composite(sprite), image)
+
+    def test_linked_cel(self):
+        pixels = np.array([[[1, 2, 3, 255]]])
+        self.write(sprite_bytes(1, 1, COLOR_DEPTH_RGBA, [[layer_chunk('a'), cel_chunk(0, 0, 0, pixels)],
+                                                         [linked_cel_chunk(0, 0)]]))
+        np.testing.assert_array_equal(composite(read_sprite(self.temp_file), frame=1)[0, 0], [1, 2, 3, 255])
+
+    def test_composite_differences(self):
+        self.write(sprite_bytes(1, 1, COLOR_DEPTH_RGBA, [[
+            layer_chunk('bottom'), layer_chunk('group', layer_type=1, opacity=128),
+            layer_chunk('child', child_level=1), layer_chunk('multiply', blend_mode=1),
+            layer_chunk('hidden', flags=0, blend_mode=2)]]))
+        self.assertEqual(composite_differences(read_sprite(self.temp_file)),
+                         ['opacity or blend mode of group "group"', 'blend mode 1 of layer "multiply"'])
+        self.write(sprite_bytes(1, 1, COLOR_DEPTH_RGBA, [[
+            layer_chunk('group', layer_type=1), layer_chunk('child', child_level=1)]]))
+        self.assertEqual(composite_differences(read_sprite(self.temp_file)), [])
+
+    def test_tilemap(self):
+        tile = np.arange(16, dtype=np.uint8).reshape(2, 2, 4) + 1
+        tile[..., 3] = 255
+        tiles = np.stack([np.zeros_like(tile), tile])
+        tilemap = np.array([[1, 0, 1 | TILE_X_FLIP], [1 | TILE_Y_FLIP, 1 | TILE_X_FLIP | TILE_Y_FLIP, 0]],
+                           dtype=np.uint32)
+        self.write(sprite_bytes(6, 4, COLOR_DEPTH_RGBA, [[
+            tileset_chunk(0, tiles), layer_chunk('tilemap', layer_type=2, tileset_index=0),
+            tilemap_cel_chunk(0, 0, 0, tilemap)]]))
+        image = composite(read_sprite(self.temp_file))
+        np.testing.assert_array_equal(image[0:2, 0:2], tile)
+        # Tile 0 is empty
+        np.testing.assert_array_equal(image[0:2, 2:4], 0)
+        np.testing.assert_array_equal(image[0:2, 4:6], tile[:, ::-1])
+        np.testing.assert_array_equal(image[2:4, 0:2], tile[::-1])
+        np.testing.assert_array_equal(image[2:4, 2:4], tile[::-1, ::-1])
+
+    def test_split_tiles(self):
+        image = np.arange(5 * 4 * 4, dtype=np.uint8).reshape(4, 5, 4)
+        tiles = split_tiles(image, 2, 2)
+        self.assertEqual(list(tiles.keys()), [(0, 0), (1, 0), (0, 1), (1, 1)])
+        np.testing.assert_array_equal(tiles[(1, 1)], image[2:4, 2:4])
+        self.assertEqual(list(split_tiles(image).keys()), [(0, 0)])
+
+    def test_read_tiles(self):
+        image = np.zeros((4, 4, 4), dtype=np.uint8)
+        image[2:, 2:] = 255
+        write_sprite(self.temp_file, image)
+        tiles = read_tiles(self.temp_file, 2, 2)
+        self.assertEqual(tiles[(1, 1)].min(), 255)
+        self.assertEqual(tiles[(0, 0)].max(), 0)
+
+    def test_invalid_file(self):
+        self.write(b'\0' * 200)
+        with self.assertRaises(AsepriteFileError):
+            read_sprite(self.temp_file)
+        with self.assertRaises(AsepriteFileError):
+            read_sprite_size(self.temp_file)
+
+    def test_truncated_file(self):
+        write_sprite(self.temp_file, np.full((8, 8, 4), 255, dtype=np.uint8))
+        with open(self.temp_file, 'rb') as file:
+            data = file.read()
+        # Cut inside the compressed cel pixels, then inside a chunk header
+        for size in [len(data) - 4, 140]:
+            self.write(data[:size])
+            with self.assertRaises(AsepriteFileError):
+                read_sprite(self.temp_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
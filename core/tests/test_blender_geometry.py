@@ -0,0 +1,97 @@
+import importlib.util
+import os
+import unittest
+import numpy as np
+
+__spec = importlib.util.spec_from_file_location(
+    'geometry', os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'blender', 'geometry.py'))
+geometry = importlib.util.module_from_spec(__spec)
+__spec.loader.exec_module(geometry)
+
+
+class TestGroupColors(unittest.TestCase):
+    def test_group_colors(self):
+        colors = [(0.5, 0.2, 0.1, 1), (0.1, 0.1, 0.1, 1), (0.5001, 0.2, 0.1, 1), (0.1, 0.1, 0.1, 0.5)]
+        groups, indices = geometry.group_colors(colors)
+        # Groups keep the order of first appearance, alpha does not split groups
+        np.testing.assert_array_equal(groups, [colors[0], colors[1]])
+        np.testing.assert_array_equal(indices, [0, 1, 0, 1])
+
+    def test_group_colors_empty(self):
+        groups, indices = geometry.group_colors(np.zeros((0, 4)))
+        self.assertEqual(len(groups), 0)
+        self.assertEqual(len(indices), 0)
+
+
+class TestMergeFaces(unittest.TestCase):
+    def setUp(self):
+        # A unit square split along its diagonal 0-2, plus a triangle of another color on its right side
+        self.coords = np.array([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (2, 0, 0)], dtype=np.float64)
+        self.faces = [[0, 1, 2], [0, 2, 3], [1, 4, 2]]
+        self.edges = [(0, 1), (1, 2), (0, 2), (2, 3), (0, 3), (1, 4), (2, 4)]
+
+    def test_edge_faces(self):
+        loop_edges = [self.edges.index(tuple(sorted((face[i], face[(i + 1) % 3]))))
+                      for face in self.faces for i in range(3)]
+        faces = geometry.edge_faces(loop_edges, geometry.loop_faces([0, 3, 6], [3, 3, 3]), len(self.edges))
+        np.testing.assert_array_equal(faces[[0, 1, 2, 3]], [[-1, -1], [0, 2], [0, 1], [-1, -1]])
+
+    def test_loop_faces(self):
+        np.testing.assert_array_equal(geometry.loop_faces([4, 0], [3, 4]), [1, 1, 1, 1, 0, 0, 0])
+
+    def test_diagonal_edges(self):
+        edge_coords = self.coords[np.array(self.edges)]
+        faces = np.full((len(self.edges), 2), -1)
+        faces[1] = (0, 2)
+        faces[2] = (0, 1)
+        normals = np.tile([0.0, 0.0, 1.0], (3, 1))
+        np.testing.assert_array_equal(geometry.diagonal_edges(edge_coords, faces, [3, 3, 3], normals, [0, 0, 1]),
+                                      [2])
+        # Different colors are not merged
+        self.assertEqual(len(geometry.diagonal_edges(edge_coords, faces, [3, 3, 3], normals, [0, 1, 1])), 0)
+
+    def test_merge_grid(self):
+        bounds = [(0, 0, 1, 1), (1, 0, 2, 1), (0, 1, 1, 2), (1, 1, 2, 2)]
+        points, outlines, keys = geometry.merge_grid(bounds, [1, 1, 1, 1], [0, 0, 0, 1])
+        self.assertEqual(len(outlines), 3)
+        np.testing.assert_array_equal(keys, [0, 0, 1])
+        # The bottom row outline passes through the corner of the rectangles above it
+        np.testing.assert_array_equal(points[outlines[0]], [(0, 0), (2, 0), (2, 1), (1, 1), (0, 1)])
+        points, outlines, keys = geometry.merge_grid(bounds, [1, 1, 1, 1], [0, 0, 0, 0])
+        np.testing.assert_array_equal(points[outlines[0]], [(0, 0), (2, 0), (2, 2), (0, 2)])
+
+    def test_merge_grid_not_rectangles(self):
+        self.assertIsNone(geometry.merge_grid([(0, 0, 1, 1)], [0.5], [0]))
+        self.assertIsNone(geometry.merge_grid([(0, 0, 2, 1), (1, 0, 2, 1)], [2, 1], [0, 0]))
+
+    def test_enclosed_walls(self):
+        # Two touching unit squares: the walls on their shared side are hidden, the outer walls are not
+        footprints = [(0, 0, 1, 1), (1, 0, 2, 1)]
+        centers = [(1, 0.5), (1, 0.5), (0, 0.5), (2, 0.5), (0.5, 0)]
+        normals = [(1, 0), (-1, 0), (-1, 0), (1, 0), (0, -1)]
+        np.testing.assert_array_equal(geometry.enclosed_walls(centers, normals, footprints, 0.01), [0, 1])
+
+
+class TestPalette(unittest.TestCase):
+    def test_linear_to_srgb(self):
+        srgb = np.array([0, 0.002, 0.2, 0.5, 1])
+        linear = np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+        np.testing.assert_allclose(geometry.linear_to_srgb(linear), srgb, atol=1e-9)
+
+    def test_nearest_texels(self):
+        # The last texel pads the image and is never chosen
+        texels = [(1, 0, 0, 1), (0, 0, 1, 1), (0, 1, 0, 1), (0, 0, 0, 0)]
+        colors = [(0.1, 0.1, 0.9), (0.9, 0.1, 0), (0, 0, 0)]
+        np.testing.assert_array_equal(geometry.nearest_texels(colors, texels)[:2], [1, 0])
+        self.assertNotEqual(geometry.nearest_texels(colors, texels)[2], 3)
+
+    def test_has_translucent_texels(self):
+        self.assertFalse(geometry.has_translucent_texels([(1, 0, 0, 1), (0, 0, 0, 0)]))
+        self.assertTrue(geometry.has_translucent_texels([(1, 0, 0, 1), (0, 0, 1, 0.5), (0, 0, 0, 0)]))
+
+    def test_texel_uvs(self):
+        np.testing.assert_allclose(geometry.texel_uvs([0, 3], 2, 2), [(0.25, 0.25), (0.75, 0.75)])
+
+
+if __name__ == '__main__':
+    unittest.main()
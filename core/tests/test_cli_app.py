@@ -0,0 +1,178 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+import numpy as np
+from cli import run_cli
+from cli.cli_app import run_batch, print_summary
+from core.aseprite_file import write_sprite
+from core.common import parse_args, export_sheet, ScriptError
+from core.config import Config, save_config
+from core.manifest import manifest_path, read_manifest
+
+STUBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'benchmarks', 'stubs')
+
+
+def install_stub(directory: str, stub: str) -> str:
+    """Write an executable running a stand-in of benchmarks/stubs, return its path."""
+    path = os.path.join(directory, os.path.splitext(stub)[0])
+    with open(path, 'w') as file:
+        file.write(f'#!/bin/sh\nexec "{sys.executable}" -u "{os.path.abspath(os.path.join(STUBS_DIR, stub))}" "$@"\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+def sheet(colors, tile: int = 2) -> np.ndarray:
+    """One tile row, every tile filled with its color."""
+    image = np.zeros((tile, tile * len(colors), 4), dtype=np.uint8)
+    for i, color in enumerate(colors):
+        image[:, i * tile:(i + 1) * tile] = color
+    return image
+
+
+@unittest.skipUnless(os.name == 'posix', 'the stand-in executables are shell scripts')
+class CliTestCase(unittest.TestCase):
+    """run_cli with the stand-in Aseprite and Blender of benchmarks/stubs, installed by the config.ini of a
+    temporary working directory."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        save_config(Config(blender=install_stub(self.temp_dir, 'fake_blender.py'),
+                           aseprite=install_stub(self.temp_dir, 'fake_aseprite.py')),
+                    os.path.join(self.temp_dir, 'config.ini'))
+        self.working_dir = os.getcwd()
+        os.chdir(self.temp_dir)
+
+    def tearDown(self):
+        os.chdir(self.working_dir)
+        shutil.rmtree(self.temp_dir)
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.temp_dir, *parts)
+
+    def write_sheet(self, relative_path: str, image: np.ndarray) -> str:
+        file_path = self.path(relative_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        write_sprite(file_path, image)
+        return file_path
+
+    def run_cli(self, *argv: str):
+        """Run the converter, its printed output is left in self.output."""
+        args, _ = parse_args(['-b', '--create_output_dir', '--cache_dir', self.path('cache'), *argv])
+        self.output = io.StringIO()
+        with contextlib.redirect_stdout(self.output):
+            run_cli(args)
+
+
+class TestTileCache(CliTestCase):
+    def test_sheets_sharing_a_palette(self):
+        # Same colors, so the same palette, but every sheet has its own palette image
+        self.write_sheet('sheet.aseprite', sheet([(255, 0, 0, 255), (0, 0, 255, 255)]))
+        self.write_sheet('sheet2.aseprite', sheet([(255, 0, 0, 255), (0, 0, 255, 255)]))
+        for name, output in [('sheet', 'outA'), ('sheet2', 'outB')]:
+            self.run_cli('-i', self.path(f'{name}.aseprite'), '-o', self.path(output), '-s', '2x2',
+                         '--backend', 'native', '--mesh_format', 'obj', '--materials', 'palette')
+        with open(self.path('outB', 'sheet2.aseprite_tile_0_0.mtl')) as file:
+            self.assertIn('map_Kd sheet2.aseprite_palette.png', file.read())
+        self.assertTrue(os.path.isfile(self.path('outB', 'sheet2.aseprite_palette.png')))
+
+
+class TestBatch(CliTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_sheet(os.path.join('sheets', 'a.aseprite'), sheet([(255, 0, 0, 255)]))
+        self.write_sheet(os.path.join('sheets', 'sub', 'b.aseprite'), sheet([(0, 255, 0, 255), (0, 0, 255, 255)]))
+
+    def test_nested_output_layout(self):
+        self.run_cli('-i', self.path('sheets'), '-o', self.path('out'), '-s', '2x2', '--backend', 'native')
+        self.assertTrue(os.path.isfile(self.path('out', 'a.aseprite_tile_0_0.glb')))
+        self.assertTrue(os.path.isfile(self.path('out', 'sub', 'b.aseprite_tile_1_0.glb')))
+        self.assertFalse(os.path.exists(self.path('out', 'b.aseprite_tiles.json')))
+
+    def test_failed_file_does_not_stop_the_others(self):
+        with open(self.path('sheets', 'broken.aseprite'), 'wb') as file:
+            file.write(b'not a sprite')
+        with self.assertRaises(ScriptError) as context:
+            self.run_cli('-i', self.path('sheets'), '-o', self.path('out'), '-s', '2x2', '--backend', 'native')
+        self.assertEqual(context.exception.message, '1 of 3 files failed')
+        self.assertIn(f'Failed: {self.path("sheets", "broken.aseprite")}: ', self.output.getvalue())
+        self.assertTrue(os.path.isfile(self.path('out', 'a.aseprite_tile_0_0.glb')))
+        self.assertTrue(os.path.isfile(self.path('out', 'sub', 'b.aseprite_tile_1_0.glb')))
+
+    def test_run_batch_collects_failures(self):
+        args, _ = parse_args(['-b', '-i', self.path('sheets'), '-o', self.path('out'), '-j', '2'])
+        inputs = [self.path('sheets', 'a.aseprite'), self.path('sheets', 'sub', 'b.aseprite')]
+        outputs = []
+
+        def convert(file_args):
+            outputs.append(file_args.output)
+            if file_args.input == inputs[0]:
+                raise ScriptError('Aseprite crashed')
+            with open(os.path.join(file_args.output, 'b.aseprite_tiles.json'), 'w') as file:
+                file.write('{"file": "b.aseprite", "tile_width": 2, "tile_height": 2, "tiles": []}')
+
+        results = run_batch(args, inputs, self.path('sheets'), convert)
+        self.assertEqual(sorted(outputs), [self.path('out'), self.path('out', 'sub')])
+        self.assertEqual([(result.input, result.error) for result in results],
+                         [(inputs[0], 'Aseprite crashed'), (inputs[1], None)])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            print_summary(results, 1)
+        self.assertEqual(output.getvalue().splitlines()[0], 'Converted 1 of 2 files, 0 tiles in 1.0 s')
+        self.assertIn(f'Failed: {inputs[0]}: Aseprite crashed', output.getvalue())
+
+
+class TestShardedExport(CliTestCase):
+    def test_merged_manifest(self):
+        # 3 rows of 2 tiles
+        rows = [sheet([(i, 0, 0, 255), (0, i, 0, 255)]) for i in range(1, 4)]
+        file_path = self.write_sheet('sheet.aseprite', np.concatenate(rows))
+        os.makedirs(self.path('out'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            export_sheet(3, file=file_path, output=self.path('out'), width=2, height=2, formats='svg')
+        tiles = read_manifest(manifest_path(self.path('out'), file_path)).tiles
+        self.assertEqual([(tile.x, tile.y) for tile in tiles], [(x, y) for y in range(3) for x in range(2)])
+        self.assertTrue(all(os.path.isfile(tile.svg) for tile in tiles))
+        # The manifests of the shards are merged and removed
+        self.assertEqual(sorted(each for each in os.listdir(self.path('out')) if each.endswith('.json')),
+                         ['sheet.aseprite_tiles.json'])
+
+
+class TestCombine(CliTestCase):
+    def test_blender_job(self):
+        # Keeps a copy of the --combine job file the converter removes
+        blender = self.path('blender')
+        with open(blender, 'w') as file:
+            file.write('#!/bin/sh\n'
+                       'previous=""\n'
+                       'for arg in "$@"; do\n'
+                       f'  if [ "$previous" = "--combine" ]; then cp "$arg" "{self.path("job.json")}"; fi\n'
+                       '  previous="$arg"\n'
+                       'done\n'
+                       f'exec "{self.path("fake_blender")}" "$@"\n')
+        os.chmod(blender, os.stat(blender).st_mode | stat.S_IXUSR)
+        save_config(Config(blender=blender, aseprite=self.path('fake_aseprite')), self.path('config.ini'))
+        red, blue = (255, 0, 0, 255), (0, 0, 255, 255)
+        self.write_sheet('sheet.aseprite', sheet([red, blue, red, (0, 0, 0, 0)]))
+        self.run_cli('-i', self.path('sheet.aseprite'), '-o', self.path('out'), '-s', '2x2', '--combine',
+                     '--skip_empty')
+        with open(self.path('job.json')) as file:
+            job = json.load(file)
+        self.assertEqual(job['output'], self.path('out', 'sheet.aseprite_combined.fbx'))
+        self.assertEqual((job['tile_width'], job['tile_height']), (2, 2))
+        self.assertEqual(sorted(os.path.basename(each) for each in job['meshes'].values()),
+                         ['sheet.aseprite_tile_0_0.svg', 'sheet.aseprite_tile_1_0.svg'])
+        # The empty tile is left out, both red tiles are instances of one mesh
+        self.assertEqual([(tile['x'], tile['y']) for tile in job['tiles']], [(0, 0), (1, 0), (2, 0)])
+        self.assertEqual(job['tiles'][0]['key'], job['tiles'][2]['key'])
+        self.assertEqual(set(job['meshes']), {tile['key'] for tile in job['tiles']})
+        self.assertTrue(os.path.isfile(job['output']))
+
+
+if __name__ == '__main__':
+    unittest.main()
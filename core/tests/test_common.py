@@ -0,0 +1,323 @@
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import unittest
+from core.common import run_parallel, ScriptError, CancelToken, ConversionCancelled, expand_inputs, BlenderPool, \
+    ProcessPolicy, OutputSink, tool_digest, call_aseprite_script, convert_svg_files, convert_svg_stream, \
+    use_process_policy, WORKER_RESULT_PREFIX, OUTPUT_TAIL_LINES
+from core.config import Config, save_config
+
+
+class TestCommon(unittest.TestCase):
+    def test_run_parallel_runs_all_tasks(self):
+        done = []
+        run_parallel([lambda i=i: done.append(i) for i in range(10)], 4)
+        self.assertEqual(sorted(done), list(range(10)))
+
+    def test_run_parallel_collects_failures(self):
+        done = []
+
+        def fail(message: str):
+            raise ScriptError(message)
+
+        tasks = [lambda: fail('first'), lambda: done.append(1), lambda: fail('second'), lambda: done.append(2)]
+        with self.assertRaises(ScriptError) as context:
+            run_parallel(tasks, 2)
+        self.assertEqual(sorted(done), [1, 2])
+        self.assertEqual(sorted(context.exception.message.splitlines()), ['first', 'second'])
+
+    def test_cancel_terminates_processes(self):
+        cancel = CancelToken()
+        process = cancel.start([sys.executable, '-c', 'import time; time.sleep(30)'])
+        start = time.monotonic()
+        cancel.cancel()
+        process.communicate()
+        self.assertLess(time.monotonic() - start, 10)
+        with self.assertRaises(ConversionCancelled):
+            cancel.finish(process)
+        with self.assertRaises(ConversionCancelled):
+            cancel.start([sys.executable, '-c', 'pass'])
+
+    def test_tool_digest(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            script = os.path.join(temp_dir, 'convert.py')
+            executable = os.path.join(temp_dir, 'blender')
+            for path in [script, executable]:
+                with open(path, 'w') as file:
+                    file.write('1')
+            digest = tool_digest([script], [executable])
+            self.assertEqual(tool_digest([script], [executable]), digest)
+            with open(script, 'w') as file:
+                file.write('2')
+            self.assertNotEqual(tool_digest([script], [executable]), digest)
+            digest = tool_digest([script], [executable])
+            with open(executable, 'w') as file:
+                file.write('upgraded')
+            self.assertNotEqual(tool_digest([script], [executable]), digest)
+
+
+class TestProcessOutput(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_output_tail(self):
+        sink = OutputSink(echo=False)
+        for i in range(OUTPUT_TAIL_LINES * 2):
+            sink.write(f'{i}\n')
+        lines = sink.tail.splitlines()
+        self.assertEqual(len(lines), OUTPUT_TAIL_LINES)
+        self.assertEqual(lines[-1], str(OUTPUT_TAIL_LINES * 2 - 1))
+
+    def test_log_file(self):
+        policy = ProcessPolicy(log_dir=self.temp_dir)
+        sink = OutputSink(policy.open_log(['/usr/bin/blender', '-b'], 'scripts/convert_svg_to_fbx.py'))
+        sink.write('File exported to FBX: a.fbx\n')
+        sink.close()
+        [name] = os.listdir(self.temp_dir)
+        self.assertTrue(name.endswith('_blender_convert_svg_to_fbx.log'))
+        with open(os.path.join(self.temp_dir, name), encoding='utf-8') as file:
+            self.assertEqual(file.read().splitlines()[1:], ['File exported to FBX: a.fbx'])
+        self.assertIsNone(ProcessPolicy().open_log(['blender']))
+
+    def test_retry_delay(self):
+        self.assertEqual([ProcessPolicy(backoff=0.5).retry_delay(retry) for retry in [1, 2, 3]], [0.5, 1, 2])
+
+
+class TestExpandInputs(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.files = [os.path.join(self.temp_dir, 'a.aseprite'), os.path.join(self.temp_dir, 'sub', 'b.ase'),
+                      os.path.join(self.temp_dir, 'sub', 'notes.txt')]
+        for file in self.files:
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            open(file, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_file(self):
+        self.assertEqual(expand_inputs(self.files[0]), ([self.files[0]], self.temp_dir))
+        self.assertEqual(expand_inputs(os.path.join(self.temp_dir, 'missing.aseprite'))[0], [])
+
+    def test_directory(self):
+        self.assertEqual(expand_inputs(self.temp_dir), (self.files[:2], self.temp_dir))
+
+    def test_glob(self):
+        files, base_dir = expand_inputs(os.path.join(self.temp_dir, '**', '*.ase*'))
+        self.assertEqual(files, self.files[:2])
+        self.assertEqual(base_dir, os.path.abspath(self.temp_dir))
+        self.assertEqual(expand_inputs(os.path.join(self.temp_dir, 'sub', '*')),
+                         ([self.files[1]], os.path.abspath(os.path.join(self.temp_dir, 'sub'))))
+
+
+# Answers jobs like convert_svg_to_fbx.py --serve, a file named crash ends the process, crash_after ends it
+# after the files before it
+FAKE_WORKER_SCRIPT = f'''
+import json, os, sys, time
+for line in sys.stdin:
+    job = json.loads(line)
+    files = job['args'][job['args'].index('-i') + 1:]
+    if 'crash' in files:
+        sys.exit(3)
+    if 'hang' in files:
+        time.sleep(30)
+    print('Worker ' + str(os.getpid()), flush=True)
+    for file in files:
+        if file == 'crash_after':
+            sys.exit(3)
+        print('File exported to FBX: ' + file, flush=True)
+    failed = [{{'file': file, 'error': 'bad'}} for file in files if file == 'bad']
+    result = {{'id': job['id'], 'failed': failed, 'error': None, 'memory': 100}}
+    print({WORKER_RESULT_PREFIX!r} + json.dumps(result), flush=True)
+'''
+
+
+class TestBlenderPool(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        script = os.path.join(self.temp_dir, 'worker.py')
+        with open(script, 'w') as file:
+            file.write(FAKE_WORKER_SCRIPT)
+        self.pool = BlenderPool([sys.executable, script], 1, policy=ProcessPolicy(backoff=0))
+        self.lines = []
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.temp_dir)
+
+    def __workers(self, runs: int) -> int:
+        for _ in range(runs):
+            self.pool.run(['a.svg'], self.lines.append, **{'-o': 'out'})
+        return len({line for line in self.lines if line.startswith('Worker ')})
+
+    def test_reuses_workers(self):
+        self.pool.run(['a.svg', 'b.svg'], self.lines.append, **{'-o': 'out'})
+        self.assertEqual(self.lines[1:], ['File exported to FBX: a.svg', 'File exported to FBX: b.svg'])
+        self.assertEqual(self.__workers(2), 1)
+
+    def test_failed_files(self):
+        with self.assertRaises(ScriptError) as context:
+            self.pool.run(['a.svg', 'bad'], **{'-o': 'out'})
+        self.assertEqual(context.exception.message, 'bad: bad')
+
+    def test_replaces_crashed_workers(self):
+        with self.assertRaises(ScriptError):
+            self.pool.run(['crash'], **{'-o': 'out'})
+        self.assertEqual(self.__workers(1), 1)
+
+    def test_retries_unconverted_files(self):
+        with self.assertRaises(ScriptError):
+            self.pool.run(['a.svg', 'crash_after'], self.lines.append, **{'-o': 'out'})
+        # The retry runs only the file the crashed worker did not convert
+        self.assertEqual([line for line in self.lines if not line.startswith('Worker ')],
+                         ['File exported to FBX: a.svg'])
+
+    def test_kills_timed_out_workers(self):
+        self.pool.policy.timeout = 1
+        start = time.monotonic()
+        with self.assertRaises(ScriptError) as context:
+            self.pool.run(['hang'], **{'-o': 'out'})
+        self.assertIn('timeout', context.exception.message)
+        # The job and its retry are both killed after one second
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(self.__workers(1), 1)
+
+    def test_recycles_workers(self):
+        self.pool.max_files = 2
+        self.assertEqual(self.__workers(4), 2)
+        self.lines.clear()
+        self.pool.max_memory_mb = 50
+        self.assertEqual(self.__workers(2), 2)
+
+
+# Stands in for Aseprite and Blender: every run is recorded, the first one fails after converting the files
+# before the one named bad.svg
+FAKE_TOOL_SCRIPT = '''
+import os, sys, time
+runs_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runs.txt')
+args = sys.argv[1:]
+if '--input_list' in args:
+    with open(args[args.index('--input_list') + 1]) as file:
+        args = file.read().split()
+with open(runs_file, 'a') as file:
+    file.write(' '.join(args) + '\\n')
+with open(runs_file) as file:
+    first_run = len(file.readlines()) == 1
+if 'hang=1' in args:
+    time.sleep(30)
+if 'slow.svg' in args:
+    time.sleep(1)
+for arg in args:
+    if arg == 'bad.svg' and first_run:
+        sys.exit(1)
+    if arg.endswith('.svg'):
+        print('File exported to FBX: ' + arg, flush=True)
+    elif arg.startswith('file='):
+        print('File exported to SVG: a.svg', flush=True)
+        if first_run:
+            sys.exit(1)
+        print('File exported to SVG: b.svg', flush=True)
+'''
+
+
+@unittest.skipUnless(os.name == 'posix', 'the stand-in executables are shell scripts')
+class StandInTestCase(unittest.TestCase):
+    """Aseprite and Blender replaced by FAKE_TOOL_SCRIPT."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        script = os.path.join(self.temp_dir, 'tool.py')
+        with open(script, 'w') as file:
+            file.write(FAKE_TOOL_SCRIPT)
+        executable = os.path.join(self.temp_dir, 'tool')
+        with open(executable, 'w') as file:
+            file.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        os.chmod(executable, os.stat(executable).st_mode | stat.S_IXUSR)
+        # load_config reads config.ini from the working directory
+        save_config(Config(blender=executable, aseprite=executable), os.path.join(self.temp_dir, 'config.ini'))
+        self.working_dir = os.getcwd()
+        os.chdir(self.temp_dir)
+        self.lines = []
+
+    def tearDown(self):
+        use_process_policy(None)
+        os.chdir(self.working_dir)
+        shutil.rmtree(self.temp_dir)
+
+    def runs(self) -> list:
+        with open(os.path.join(self.temp_dir, 'runs.txt')) as file:
+            return file.read().splitlines()
+
+
+class TestSupervisedProcesses(StandInTestCase):
+    def test_retry_passes_every_line_once(self):
+        use_process_policy(ProcessPolicy(retries=2, backoff=0))
+        call_aseprite_script('convert_to_svg.lua', self.lines.append, file='sheet.aseprite')
+        self.assertEqual(len(self.runs()), 2)
+        self.assertEqual(self.lines, ['File exported to SVG: a.svg', 'File exported to SVG: b.svg'])
+
+    def test_retries_used_up(self):
+        with self.assertRaises(ScriptError):
+            call_aseprite_script('convert_to_svg.lua', self.lines.append, file='sheet.aseprite')
+        self.assertEqual(len(self.runs()), 1)
+
+    def test_retry_converts_only_unfinished_files(self):
+        use_process_policy(ProcessPolicy(retries=1, backoff=0))
+        convert_svg_files(['a.svg', 'bad.svg', 'c.svg'], 1, self.lines.append, **{'-o': self.temp_dir})
+        self.assertEqual(self.runs(), ['a.svg bad.svg c.svg', 'bad.svg c.svg'])
+        self.assertEqual(self.lines, [f'File exported to FBX: {each}' for each in ['a.svg', 'bad.svg', 'c.svg']])
+
+    def test_timeout_kills_the_process(self):
+        use_process_policy(ProcessPolicy(timeout=0.5, retries=1, backoff=0))
+        start = time.monotonic()
+        with self.assertRaises(ScriptError) as context:
+            call_aseprite_script('convert_to_svg.lua', hang='1')
+        self.assertIn('Killed after the timeout of 0.5 s', context.exception.message)
+        # Both runs are killed
+        self.assertEqual(len(self.runs()), 2)
+        self.assertLess(time.monotonic() - start, 10)
+
+
+class TestConvertSvgStream(StandInTestCase):
+    def test_converts_every_file_once(self):
+        files = [f'{i}.svg' for i in range(20)]
+
+        def produce(submit):
+            for file in files:
+                submit(file)
+                time.sleep(0.01)
+
+        convert_svg_stream(produce, 3, self.lines.append, **{'-o': self.temp_dir})
+        self.assertEqual(sorted(file for run in self.runs() for file in run.split()), sorted(files))
+        self.assertEqual(sorted(self.lines), sorted(f'File exported to FBX: {file}' for file in files))
+
+    def test_producer_error_stops_the_run(self):
+        def produce(submit):
+            submit('slow.svg')
+            # The only worker is converting slow.svg when b.svg is queued
+            while not os.path.exists(os.path.join(self.temp_dir, 'runs.txt')):
+                time.sleep(0.01)
+            submit('b.svg')
+            raise ScriptError('export failed')
+
+        with self.assertRaises(ScriptError) as context:
+            convert_svg_stream(produce, 1, self.lines.append, **{'-o': self.temp_dir})
+        self.assertEqual(context.exception.message, 'export failed')
+        self.assertEqual(self.runs(), ['slow.svg'])
+
+    def test_cancel(self):
+        cancel = CancelToken()
+        cancel.cancel()
+        with self.assertRaises(ConversionCancelled):
+            convert_svg_stream(lambda submit: submit('a.svg'), 1, self.lines.append, cancel, **{'-o': self.temp_dir})
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'runs.txt')))
+
+
+if __name__ == '__main__':
+    unittest.main()
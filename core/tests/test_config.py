@@ -32,6 +32,8 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(loaded_config.input, None)
         self.assertEqual(loaded_config.output, None)
         self.assertEqual(loaded_config.svg_only, False)
+        self.assertEqual(loaded_config.jobs, None)
+        self.assertEqual(loaded_config.materials, None)
 
     def test_save_valid_optional_values_to_config(self):
         pairs = {'size': [None, '16x16', '0x0', None],
@@ -40,7 +42,9 @@ class TestConfig(unittest.TestCase):
                  'input': [None, '', 'file.ext', None],
                  'output': [None, '', 'dir/', None],
                  'svg_only': [True, False],
-                 'pivot': [None, 'center', 'bottom', None]}
+                 'pivot': [None, 'center', 'bottom', None],
+                 'jobs': [None, 1, 32, None],
+                 'materials': [None, 'color', 'palette', None]}
         for key, values in pairs.items():
             for value in values:
                 config = Config(aseprite='1', blender='2')
@@ -60,7 +64,9 @@ class TestConfig(unittest.TestCase):
                  'scale': ['', '-1', '-1.0'],
                  'extrude': ['', '-1', '-1.0'],
                  'svg_only': [None],
-                 'pivot': ['abc']}
+                 'pivot': ['abc'],
+                 'jobs': ['', '0', '-1', '1.5', 'abc'],
+                 'materials': ['', 'abc']}
         for key, values in pairs.items():
             for value in values:
                 config = Config(aseprite='1', blender='2')
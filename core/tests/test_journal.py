@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+from core.journal import Journal, JOURNAL_DONE, JOURNAL_FAILED, journal_path
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = journal_path(self.temp_dir, 'sheet.aseprite')
+        self.mesh = os.path.join(self.temp_dir, 'a.fbx')
+        with open(self.mesh, 'w'):
+            pass
+        self.keys = {'a': 'key_a', 'b': 'key_b', 'c': 'key_c'}
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_resume(self):
+        journal = Journal(self.file_path)
+        journal.record('a', 'key_a', JOURNAL_DONE, [self.mesh])
+        journal.record('c', 'key_c', JOURNAL_DONE)
+        journal.record_failed(self.keys, {'a', 'b', 'c'}, 'Blender crashed')
+        journal.close()
+
+        journal = Journal(self.file_path, resume=True)
+        self.assertEqual(journal.entries['b'].status, JOURNAL_FAILED)
+        self.assertEqual(journal.entries['b'].error, 'Blender crashed')
+        self.assertEqual(journal.completed(self.keys), {'a', 'c'})
+        # Changed pixels or options change the key
+        self.assertEqual(journal.completed({**self.keys, 'a': 'other'}), {'c'})
+        os.remove(self.mesh)
+        self.assertEqual(journal.completed(self.keys), {'c'})
+        journal.close()
+
+    def test_truncated_line(self):
+        journal = Journal(self.file_path)
+        journal.record('a', 'key_a', JOURNAL_DONE, [self.mesh])
+        journal.close()
+        with open(self.file_path, 'a', encoding='utf-8') as file:
+            file.write('{"name": "b", "key"')
+        journal = Journal(self.file_path, resume=True)
+        self.assertEqual(journal.completed(self.keys), {'a'})
+        # Entries recorded after the cut line are read by the next resume
+        journal.record('c', 'key_c', JOURNAL_DONE)
+        journal.close()
+        journal = Journal(self.file_path, resume=True)
+        self.assertEqual(journal.completed(self.keys), {'a', 'c'})
+        journal.close()
+
+    def test_new_run_starts_new_journal(self):
+        journal = Journal(self.file_path)
+        journal.record('a', 'key_a', JOURNAL_DONE, [self.mesh])
+        journal.close()
+        Journal(self.file_path).close()
+        journal = Journal(self.file_path, resume=True)
+        self.assertEqual(journal.entries, {})
+        journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
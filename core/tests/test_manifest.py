@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+from core.config import Size
+from core.manifest import build_manifest, manifest_path, merge_manifests, read_manifest, shard_manifest_path, \
+    write_manifest, ManifestError
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_build_manifest(self):
+        manifest = build_manifest('sprites/sheet.aseprite', 'out', Size(70, 40), Size(32, 16))
+        self.assertEqual([(tile.x, tile.y) for tile in manifest.tiles], [(0, 0), (1, 0), (0, 1), (1, 1)])
+        tile = manifest.tiles[3]
+        self.assertEqual(tile.name, 'sheet.aseprite_tile_1_1')
+        self.assertEqual(tile.bounds, (32, 16, 32, 16))
+        self.assertEqual(tile.svg, os.path.join('out', 'sheet.aseprite_tile_1_1.svg'))
+        self.assertEqual(len(build_manifest('sheet.ase', 'out', Size(70, 40)).tiles), 1)
+
+    def test_build_manifest_formats(self):
+        tile = build_manifest('sheet.aseprite', 'out', Size(2, 2), formats=['png']).tiles[0]
+        self.assertIsNone(tile.svg)
+        self.assertEqual(tile.png, os.path.join('out', 'sheet.aseprite_tile_0_0.png'))
+
+    def test_merge_shard_manifests(self):
+        shards = [build_manifest('sheet.aseprite', 'out', Size(4, 6), Size(2, 2), shard=shard, shards=2)
+                  for shard in range(2)]
+        self.assertEqual([tile.y for tile in shards[0].tiles], [0, 0, 2, 2])
+        self.assertEqual([tile.y for tile in shards[1].tiles], [1, 1])
+        self.assertEqual(merge_manifests(shards), build_manifest('sheet.aseprite', 'out', Size(4, 6), Size(2, 2)))
+        self.assertEqual(os.path.basename(shard_manifest_path('out', 'sprites/sheet.aseprite', 1)),
+                         'sheet.aseprite_tiles_shard_1.json')
+
+    def test_write_and_read_manifest(self):
+        manifest = build_manifest('sheet.aseprite', self.temp_dir, Size(4, 4), Size(2, 2))
+        file_path = manifest_path(self.temp_dir, 'sprites/sheet.aseprite')
+        self.assertEqual(os.path.basename(file_path), 'sheet.aseprite_tiles.json')
+        write_manifest(file_path, manifest)
+        self.assertEqual(read_manifest(file_path), manifest)
+
+    def test_read_invalid_manifest(self):
+        with self.assertRaises(ManifestError):
+            read_manifest(os.path.join(self.temp_dir, 'missing.json'))
+        file_path = os.path.join(self.temp_dir, 'broken.json')
+        with open(file_path, 'w') as file:
+            file.write('{"tiles": [{}]}')
+        with self.assertRaises(ManifestError):
+            read_manifest(file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import numpy as np
+from core.mesher import build_mesh, write_glb, write_instanced_glb, write_obj, PIXEL_SIZE
+from core.palette import sheet_palette
+
+
+def read_glb_document(file_path: str) -> dict:
+    with open(file_path, 'rb') as file:
+        data = file.read()
+    json_length, = struct.unpack('<I', data[12:16])
+    return json.loads(data[20:20 + json_length])
+
+
+def signed_volume(positions: np.ndarray) -> float:
+    volume = 0.0
+    for a, b, c, d in positions.astype(np.float64):
+        volume += np.dot(a, np.cross(b, c)) + np.dot(a, np.cross(c, d))
+    return volume / 6
+
+
+class TestMesher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.pixels = np.zeros((4, 4, 4), dtype=np.uint8)
+        self.pixels[0:3, 0] = (255, 0, 0, 255)
+        self.pixels[2, 1:3] = (0, 255, 0, 255)
+        self.pixels[0, 3] = (0, 0, 255, 255)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_closed_volume(self):
+        mesh = build_mesh(self.pixels, extrude=2, scale=3)
+        expected = 6 * 2 * (PIXEL_SIZE * 3) ** 3
+        self.assertAlmostEqual(signed_volume(mesh.positions) / expected, 1, places=4)
+
+    def test_faces_are_merged(self):
+        mesh = build_mesh(np.full((8, 8, 4), 255, dtype=np.uint8))
+        self.assertEqual(mesh.face_count, 6)
+
+    def test_pivot(self):
+        center = build_mesh(self.pixels, pivot='center').positions.reshape(-1, 3)
+        np.testing.assert_allclose(center.min(axis=0), -center.max(axis=0), atol=1e-9)
+        bottom = build_mesh(self.pixels, pivot='bottom').positions.reshape(-1, 3)
+        self.assertAlmostEqual(float(bottom[:, 1].min()), 0, places=9)
+        self.assertAlmostEqual(float(bottom[:, 1].max()), 3 * PIXEL_SIZE, places=7)
+
+    def test_origin(self):
+        mesh = build_mesh(self.pixels, pivot='bottom')
+        # Opaque pixels span x 0..4 and y 0..-3 from the top left corner of the tile
+        np.testing.assert_allclose(mesh.origin, np.array([2, -3, 0.5]) * PIXEL_SIZE, atol=1e-9)
+
+    def test_flat_and_empty(self):
+        self.assertEqual(build_mesh(self.pixels, extrude=0).face_count, 3)
+        self.assertIsNone(build_mesh(np.zeros((4, 4, 4), dtype=np.uint8)))
+
+    def test_write_glb(self):
+        file_path = os.path.join(self.temp_dir, 'tile.glb')
+        write_glb(file_path, build_mesh(self.pixels))
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        magic, version, length = struct.unpack('<III', data[:12])
+        self.assertEqual((magic, version, length), (0x46546C67, 2, len(data)))
+        json_length, = struct.unpack('<I', data[12:16])
+        document = json.loads(data[20:20 + json_length])
+        self.assertEqual(len(document['materials']), 3)
+        self.assertEqual(len(document['meshes'][0]['primitives']), 3)
+
+    def test_write_instanced_glb(self):
+        file_path = os.path.join(self.temp_dir, 'sheet.glb')
+        other = np.zeros((4, 4, 4), dtype=np.uint8)
+        other[1, 1] = (255, 0, 0, 255)
+        meshes = {'a': build_mesh(self.pixels), 'b': build_mesh(other)}
+        nodes = [('t_0_0', 'a', np.zeros(3)), ('t_1_0', 'b', np.array([1, 0, 0])), ('t_2_0', 'a', np.ones(3))]
+        write_instanced_glb(file_path, meshes, nodes)
+        document = read_glb_document(file_path)
+        self.assertEqual(len(document['meshes']), 2)
+        self.assertEqual([node['mesh'] for node in document['nodes']], [0, 1, 0])
+        self.assertEqual(document['nodes'][2]['translation'], [1, 1, 1])
+        # The red of both meshes is one material
+        self.assertEqual(len(document['materials']), 3)
+
+    def test_write_obj(self):
+        file_path = os.path.join(self.temp_dir, 'tile.obj')
+        mesh = build_mesh(self.pixels)
+        write_obj(file_path, mesh)
+        with open(file_path) as file:
+            lines = file.read().splitlines()
+        self.assertEqual(sum(line.startswith('f ') for line in lines), mesh.face_count)
+        self.assertEqual(sum(line.startswith('usemtl ') for line in lines), 3)
+        self.assertTrue(os.path.isfile(os.path.join(self.temp_dir, 'tile.mtl')))
+
+    def test_write_glb_palette(self):
+        file_path = os.path.join(self.temp_dir, 'tile.glb')
+        write_glb(file_path, build_mesh(self.pixels), sheet_palette([self.pixels]))
+        document = read_glb_document(file_path)
+        self.assertEqual(len(document['materials']), 1)
+        self.assertEqual(document['materials'][0]['pbrMetallicRoughness']['baseColorTexture'], {'index': 0})
+        self.assertEqual(document['images'][0]['mimeType'], 'image/png')
+        primitives = document['meshes'][0]['primitives']
+        self.assertEqual(len(primitives), 1)
+        self.assertIn('TEXCOORD_0', primitives[0]['attributes'])
+
+    def test_write_obj_palette(self):
+        file_path = os.path.join(self.temp_dir, 'tile.obj')
+        mesh = build_mesh(self.pixels)
+        write_obj(file_path, mesh, sheet_palette([self.pixels]), 'sheet_palette.png')
+        with open(file_path) as file:
+            lines = file.read().splitlines()
+        self.assertEqual(sum(line.startswith('vt ') for line in lines), 3)
+        self.assertEqual(sum(line.startswith('usemtl ') for line in lines), 1)
+        self.assertEqual(len([line for line in lines if line.startswith('f ')][0].split()[1].split('/')), 3)
+        with open(os.path.join(self.temp_dir, 'tile.mtl')) as file:
+            self.assertIn('map_Kd sheet_palette.png', file.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from core.aseprite_file import write_sprite
+from core.config import Size
+from core.palette import Palette, sheet_palette, palette_path, export_palette
+
+
+class TestPalette(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.tile = np.zeros((2, 2, 4), dtype=np.uint8)
+        self.tile[0, 0] = (255, 0, 0, 255)
+        self.tile[1, 1] = (0, 0, 255, 128)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_sheet_palette(self):
+        other = np.zeros((2, 2, 4), dtype=np.uint8)
+        other[:] = (255, 0, 0, 255)
+        palette = sheet_palette([self.tile, other])
+        # Transparent pixels are not in the palette, colors are ordered by RGBA value
+        np.testing.assert_array_equal(palette.colors, [(0, 0, 255, 128), (255, 0, 0, 255)])
+        self.assertEqual(len(sheet_palette([]).colors), 0)
+
+    def test_index_and_uvs(self):
+        palette = Palette(np.array([(i, 0, 0, 255) for i in range(5)], dtype=np.uint8))
+        self.assertEqual((palette.width, palette.height), (3, 2))
+        colors = np.array([(4, 0, 0, 255), (0, 0, 0, 255)], dtype=np.uint8)
+        np.testing.assert_array_equal(palette.index(colors), [4, 0])
+        # Texel (1, 1) is in the bottom row, texel (0, 0) in the top row
+        np.testing.assert_allclose(palette.uvs(colors), [(0.5, 0.25), (1 / 6, 0.75)])
+
+    def test_image(self):
+        palette = sheet_palette([self.tile])
+        image = palette.image()
+        self.assertEqual(image.shape, (1, 2, 4))
+        np.testing.assert_array_equal(image[0], palette.colors)
+        # Texels past the last color are transparent
+        self.assertEqual(Palette(np.ones((3, 4), dtype=np.uint8)).image()[1, 1, 3], 0)
+
+    def test_key(self):
+        self.assertEqual(sheet_palette([self.tile]).key, sheet_palette([self.tile, self.tile]).key)
+        self.assertNotEqual(sheet_palette([self.tile]).key, sheet_palette([self.tile[:1]]).key)
+
+    def test_export_palette(self):
+        input_file = os.path.join(self.temp_dir, 'sheet.aseprite')
+        write_sprite(input_file, np.concatenate([self.tile, self.tile], axis=1))
+        palette = export_palette(input_file, self.temp_dir, Size(2, 2))
+        self.assertEqual(len(palette.colors), 2)
+        self.assertTrue(os.path.isfile(palette_path(self.temp_dir, input_file)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from core.profiler import Profiler, ProcessRecord, TILE_STATS_PREFIX
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.profiler = Profiler(lambda: self.now[0])
+
+    def test_stage(self):
+        with self.profiler.stage('export', 'a.aseprite'):
+            self.now[0] = 1.5
+        with self.assertRaises(ValueError):
+            with self.profiler.stage('mesh', 'a.aseprite'):
+                self.now[0] = 2.0
+                raise ValueError
+        self.assertEqual([(each.stage, each.seconds) for each in self.profiler.stages],
+                         [('export', 1.5), ('mesh', 0.5)])
+
+    def test_record_line(self):
+        stats = {'file': 'a.svg', 'vertices': 8, 'faces': 6, 'materials': 1,
+                 'seconds': {'import': 0.1, 'cleanup': 0.2, 'extrude': 0.3, 'export': 0.4}}
+        self.profiler.record_line(TILE_STATS_PREFIX + json.dumps(stats))
+        self.profiler.record_line('File exported to FBX: a.fbx')
+        self.profiler.record_line(TILE_STATS_PREFIX + '{"file": "b.svg"}')
+        self.assertEqual(len(self.profiler.tiles), 1)
+        self.assertEqual(self.profiler.tiles[0].faces, 6)
+        self.assertAlmostEqual(self.profiler.tiles[0].seconds, 1.0)
+
+    def test_count_tiles(self):
+        self.profiler.count_tiles('a.aseprite', 4, 3, 1)
+        self.profiler.count_tiles('a.aseprite', converted=1, resumed=2)
+        record = self.profiler.files['a.aseprite']
+        self.assertEqual((record.tiles, record.converted, record.cached, record.resumed), (4, 4, 1, 2))
+        self.assertIn('  tiles: 4, converted 4, cached 1, resumed 2', self.profiler.summary())
+
+    def test_write(self):
+        with self.profiler.stage('export', 'a.aseprite'):
+            self.now[0] = 1.0
+        self.profiler.add_process(ProcessRecord('aseprite', 'convert_to_svg.lua', 0.75, 0.25, 0))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            json_path = os.path.join(temp_dir, 'profile.json')
+            self.profiler.write(json_path)
+            with open(json_path, encoding='utf-8') as file:
+                report = json.load(file)
+            self.assertEqual(report['processes'][0]['wait_seconds'], 0.25)
+            self.assertEqual(report['stages'][0]['stage'], 'export')
+
+            csv_path = os.path.join(temp_dir, 'profile.csv')
+            self.profiler.write(csv_path)
+            with open(csv_path, encoding='utf-8', newline='') as file:
+                rows = list(csv.DictReader(file))
+            self.assertEqual([row['record'] for row in rows], ['run', 'stage', 'process'])
+            self.assertEqual(rows[2]['script'], 'convert_to_svg.lua')
+
+    def test_summary(self):
+        self.profiler.add_process(ProcessRecord('blender', 'convert_svg_to_fbx.py', 2.0, 0.5, 0))
+        self.profiler.add_process(ProcessRecord('blender', 'convert_svg_to_fbx.py', 1.0, 0.0, 0))
+        summary = self.profiler.summary()
+        self.assertIn('  blender: 2 processes, 3.00 s, waited 0.50 s', summary)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from core.progress import Progress, format_duration
+
+
+class TestProgress(unittest.TestCase):
+    def test_eta(self):
+        now = [10.0]
+        progress = Progress(4, lambda: now[0])
+        self.assertIsNone(progress.eta())
+        now[0] = 16.0
+        self.assertEqual(progress.advance(), 1)
+        self.assertEqual(progress.eta(), 18.0)
+        progress.advance(3)
+        self.assertEqual(progress.eta(), 0.0)
+
+    def test_eta_without_total(self):
+        progress = Progress()
+        progress.advance()
+        self.assertIsNone(progress.eta())
+
+    def test_format_duration(self):
+        self.assertEqual(format_duration(5.4), '0:05')
+        self.assertEqual(format_duration(754), '12:34')
+        self.assertEqual(format_duration(3725), '1:02:05')
+
+
+if __name__ == '__main__':
+    unittest.main()
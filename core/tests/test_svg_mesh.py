@@ -0,0 +1,72 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from core.tile_writer import greedy_rectangles, write_svg
+
+__spec = importlib.util.spec_from_file_location(
+    'svg_mesh', os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'blender', 'svg_mesh.py'))
+svg_mesh = importlib.util.module_from_spec(__spec)
+__spec.loader.exec_module(svg_mesh)
+
+
+class TestSvgMesh(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def __write(self, content: str) -> str:
+        file_path = os.path.join(self.temp_dir, 'tile.svg')
+        with open(file_path, 'w') as file:
+            file.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="4px" height="4px">{content}</svg>')
+        return file_path
+
+    def test_read_tile_svg(self):
+        pixels = np.zeros((3, 3, 4), dtype=np.uint8)
+        pixels[0, :2] = (255, 0, 0, 255)
+        pixels[2, 2] = (0, 0, 255, 128)
+        svg_file = os.path.join(self.temp_dir, 'tile.svg')
+        write_svg(svg_file, pixels)
+        shapes = svg_mesh.read_svg_shapes(svg_file)
+        self.assertEqual(len(shapes), len(greedy_rectangles(pixels)))
+        self.assertEqual(shapes[0][0], [(0, 0), (2, 0), (2, 1), (0, 1)])
+        np.testing.assert_allclose(shapes[1][1], [0, 0, 1, 128 / 255], atol=1e-6)
+
+    def test_read_path_and_style(self):
+        shapes = svg_mesh.read_svg_shapes(self.__write(
+            '<path style="fill:#00ff00;fill-opacity:0.5" d="M0 0 h2 v1 h-1 v1 H0 z m3 0 l1 0 0 1 -1 0 z" />'
+            '<rect width="1" height="1" fill="none" />'))
+        self.assertEqual([points for points, _ in shapes],
+                         [[(0, 0), (2, 0), (2, 1), (1, 1), (1, 2), (0, 2)], [(3, 0), (4, 0), (4, 1), (3, 1)]])
+        self.assertEqual(shapes[0][1], [0, 1, 0, 0.5])
+
+    def test_read_unsupported(self):
+        with self.assertRaises(ValueError):
+            svg_mesh.read_svg_shapes(self.__write('<path d="M0 0 C1 1 2 2 3 3 z" />'))
+        with self.assertRaises(ValueError):
+            svg_mesh.read_svg_shapes(self.__write('<circle r="1" />'))
+
+    def test_svg_mesh(self):
+        red, blue = [1, 0, 0, 1], [0, 0, 1, 1]
+        shapes = [([(0, 0), (1, 0), (1, 1), (0, 1)], red), ([(1, 0), (1, 1), (2, 1), (2, 0)], blue),
+                  ([(2, 0), (2, 0), (2, 1)], red)]
+        vertices, faces, face_colors, colors = svg_mesh.svg_mesh(shapes, 0.5)
+        # Shared corners become one vertex and zero-area shapes are dropped
+        self.assertEqual(len(vertices), 6)
+        self.assertEqual(len(faces), 2)
+        np.testing.assert_array_equal(colors, [blue, red])
+        np.testing.assert_array_equal(face_colors, [1, 0])
+        for face in faces:
+            corners = vertices[face]
+            # Counter-clockwise with y flipped up
+            self.assertGreater(np.sum(corners[:, 0] * np.roll(corners[:, 1], -1)
+                                      - np.roll(corners[:, 0], -1) * corners[:, 1]), 0)
+        self.assertEqual(vertices[:, 1].min(), -0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
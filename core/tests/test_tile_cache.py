@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import numpy as np
+from core.tile_cache import TileCache, tile_key
+
+
+class TestTileCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.output_dir = os.path.join(self.temp_dir, 'output')
+        os.makedirs(self.output_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name: str, content: str) -> str:
+        file_path = os.path.join(self.temp_dir, name)
+        with open(file_path, 'w') as file:
+            file.write(content)
+        return file_path
+
+    def test_tile_key(self):
+        pixels = np.zeros((2, 2, 4), dtype=np.uint8)
+        changed = pixels.copy()
+        changed[1, 1, 0] = 1
+        self.assertEqual(tile_key(pixels, {'scale': 1}), tile_key(pixels.copy(), {'scale': 1}))
+        self.assertNotEqual(tile_key(pixels, {'scale': 1}), tile_key(changed, {'scale': 1}))
+        self.assertNotEqual(tile_key(pixels, {'scale': 1}), tile_key(pixels, {'scale': 2}))
+
+    def test_store_and_fetch(self):
+        cache = TileCache(self.cache_dir)
+        self.assertFalse(cache.fetch('ab12', self.output_dir, 'sheet_tile_0_0'))
+        cache.store('ab12', [self.write('a_tile_1_1.svg', 'svg'), self.write('a_tile_1_1.obj', 'mtllib a.mtl\nv\n')])
+        self.assertTrue(cache.fetch('ab12', self.output_dir, 'sheet_tile_0_0'))
+        with open(os.path.join(self.output_dir, 'sheet_tile_0_0.svg')) as file:
+            self.assertEqual(file.read(), 'svg')
+        with open(os.path.join(self.output_dir, 'sheet_tile_0_0.obj')) as file:
+            self.assertEqual(file.read(), 'mtllib sheet_tile_0_0.mtl\nv\n')
+
+    def test_evict_least_recently_used(self):
+        cache = TileCache(self.cache_dir, max_size=25)
+        for key in ['aa01', 'bb02', 'cc03']:
+            cache.store(key, [self.write('tile.fbx', '0123456789')])
+        old_time = time.time() - 100
+        os.utime(os.path.join(self.cache_dir, 'aa', 'aa01'), (old_time, old_time))
+        os.utime(os.path.join(self.cache_dir, 'bb', 'bb02'), (old_time - 100, old_time - 100))
+        self.assertTrue(cache.fetch('bb02', self.output_dir, 'tile'))
+        cache.evict()
+        self.assertFalse(cache.fetch('aa01', self.output_dir, 'tile'))
+        self.assertTrue(cache.fetch('bb02', self.output_dir, 'tile'))
+        self.assertTrue(cache.fetch('cc03', self.output_dir, 'tile'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from core.config import Size
+from core.manifest import build_manifest, read_manifest, write_manifest, tile_name
+from core.tile_plan import plan_tiles, link_aliases, write_aliases, mesh_sources, unlink_shared_outputs, \
+    drop_empty_tiles
+
+
+class TestTilePlan(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        empty = np.zeros((2, 2, 4), dtype=np.uint8)
+        red = empty.copy()
+        red[0, 0] = (255, 0, 0, 255)
+        blue = empty.copy()
+        blue[1, 1] = (0, 0, 255, 255)
+        self.tiles = {'t_0_0': red, 't_1_0': empty, 't_2_0': red.copy(), 't_3_0': blue, 't_4_0': empty.copy()}
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_plan_everything(self):
+        plan = plan_tiles(self.tiles, {})
+        self.assertEqual(plan.unique, list(self.tiles))
+        self.assertEqual(plan.keys['t_0_0'], plan.keys['t_2_0'])
+
+    def test_skip_empty_and_dedupe(self):
+        plan = plan_tiles(self.tiles, {}, skip_empty=True, dedupe=True)
+        self.assertEqual(plan.unique, ['t_0_0', 't_3_0'])
+        self.assertEqual(plan.empty, {'t_1_0', 't_4_0'})
+        self.assertEqual(plan.aliases, {'t_2_0': 't_0_0'})
+        self.assertEqual(plan_tiles(self.tiles, {}, dedupe=True).aliases, {'t_2_0': 't_0_0', 't_4_0': 't_1_0'})
+
+    def test_mesh_sources(self):
+        plan = plan_tiles(self.tiles, {}, skip_empty=True)
+        self.assertEqual(sorted(mesh_sources(plan).values()), ['t_0_0', 't_3_0'])
+        self.assertEqual(len(mesh_sources(plan_tiles(self.tiles, {}))), 3)
+
+    def test_link_and_write_aliases(self):
+        plan = plan_tiles(self.tiles, {}, skip_empty=True, dedupe=True)
+        with open(os.path.join(self.temp_dir, 't_0_0.fbx'), 'w') as file:
+            file.write('mesh')
+        link_aliases(plan, self.temp_dir, ['.fbx', '.svg'])
+        with open(os.path.join(self.temp_dir, 't_2_0.fbx')) as file:
+            self.assertEqual(file.read(), 'mesh')
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 't_2_0.svg')))
+        link_aliases(plan, self.temp_dir, ['.fbx'])
+
+        file_path = os.path.join(self.temp_dir, 'aliases.json')
+        write_aliases(file_path, plan)
+        with open(file_path) as file:
+            self.assertEqual(json.load(file), {'aliases': {'t_2_0': 't_0_0'}, 'empty': ['t_1_0', 't_4_0']})
+
+    def test_rerun_after_editing_a_duplicate(self):
+        plan = plan_tiles(self.tiles, {}, dedupe=True)
+        original = os.path.join(self.temp_dir, 't_0_0.svg')
+        alias = os.path.join(self.temp_dir, 't_2_0.svg')
+        with open(original, 'w') as file:
+            file.write('red')
+        link_aliases(plan, self.temp_dir, ['.svg'])
+        # The edited tile is no longer a duplicate, its svg is written again in place
+        with open(original, 'w') as file:
+            file.write('edited')
+        with open(alias) as file:
+            self.assertEqual(file.read(), 'red')
+
+    def test_unlink_shared_outputs(self):
+        # A hard link left by an older run
+        original = os.path.join(self.temp_dir, 't_0_0.svg')
+        with open(original, 'w') as file:
+            file.write('red')
+        os.link(original, os.path.join(self.temp_dir, 't_2_0.svg'))
+        with open(os.path.join(self.temp_dir, 't_3_0.svg'), 'w') as file:
+            file.write('blue')
+        unlink_shared_outputs(list(self.tiles), self.temp_dir, ['.svg'])
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['t_3_0.svg'])
+
+    def test_drop_empty_tiles(self):
+        plan = plan_tiles({tile_name('t', x, 0): pixels for x, pixels in enumerate(self.tiles.values())}, {},
+                          skip_empty=True)
+        manifest = build_manifest('t', self.temp_dir, Size(10, 2), Size(2, 2), ['svg', 'png'])
+        for file in (manifest.tiles[0].svg, manifest.tiles[1].svg):
+            with open(file, 'w'):
+                pass
+        manifest_file = os.path.join(self.temp_dir, 'tiles.json')
+        write_manifest(manifest_file, manifest)
+        drop_empty_tiles(plan, manifest_file)
+        tiles = read_manifest(manifest_file).tiles
+        self.assertEqual([tile.svg is None for tile in tiles], [False, True, False, False, True])
+        self.assertEqual([tile.png is None for tile in tiles], [False, True, False, False, True])
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['t_tile_0_0.svg', 'tiles.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+import numpy as np
+from core.aseprite_file import write_sprite
+from core.config import Size
+from core.tile_writer import greedy_rectangles, pixel_rectangles, tile_to_svg, write_png, export_tiles
+
+
+def rasterize(rectangles, width: int, height: int) -> np.ndarray:
+    image = np.zeros((height, width, 4), dtype=np.uint8)
+    for x, y, rect_width, rect_height, color in rectangles:
+        image[y:y + rect_height, x:x + rect_width] = color
+    return image
+
+
+class TestTileWriter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_greedy_rectangles_cover_pixels(self):
+        rng = np.random.default_rng(2)
+        palette = np.array([[0, 0, 0, 0], [255, 0, 0, 255], [0, 0, 255, 128]], dtype=np.uint8)
+        pixels = palette[rng.integers(0, 3, (16, 16))]
+        rectangles = greedy_rectangles(pixels)
+        np.testing.assert_array_equal(rasterize(rectangles, 16, 16), pixels)
+        self.assertLess(len(rectangles), len(pixel_rectangles(pixels)))
+        covered = sum(width * height for _, _, width, height, _ in rectangles)
+        self.assertEqual(covered, int((pixels[..., 3] > 0).sum()))
+
+    def test_greedy_rectangles_solid_tile(self):
+        pixels = np.full((8, 8, 4), 255, dtype=np.uint8)
+        self.assertEqual(greedy_rectangles(pixels), [(0, 0, 8, 8, (255, 255, 255, 255))])
+
+    def test_tile_to_svg(self):
+        pixels = np.zeros((2, 2, 4), dtype=np.uint8)
+        pixels[0] = (255, 0, 16, 255)
+        pixels[1, 1] = (0, 0, 0, 51)
+        svg = tile_to_svg(pixels)
+        self.assertIn('width="2px" height="2px"', svg)
+        self.assertIn('<rect x="0" y="0" width="2" height="1" fill="#FF0010" />', svg)
+        self.assertIn('<rect x="1" y="1" width="1" height="1" fill="#000000" fill-opacity="0.200000" />', svg)
+
+    def test_write_png(self):
+        pixels = np.arange(3 * 2 * 4, dtype=np.uint8).reshape(2, 3, 4)
+        file_path = os.path.join(self.temp_dir, 'tile.png')
+        write_png(file_path, pixels)
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        self.assertEqual(struct.unpack('>II', data[16:24]), (3, 2))
+        idat_length, = struct.unpack('>I', data[33:37])
+        raw = np.frombuffer(zlib.decompress(data[41:41 + idat_length]), dtype=np.uint8).reshape(2, 13)
+        np.testing.assert_array_equal(raw[:, 1:].reshape(2, 3, 4), pixels)
+
+    def test_export_tiles(self):
+        input_file = os.path.join(self.temp_dir, 'sheet.aseprite')
+        write_sprite(input_file, np.full((4, 6, 4), 255, dtype=np.uint8))
+        svg_files = export_tiles(input_file, self.temp_dir, Size(2, 2))
+        self.assertEqual(len(svg_files), 6)
+        for x, y in [(0, 0), (2, 1)]:
+            self.assertTrue(os.path.isfile(os.path.join(self.temp_dir, f'sheet.aseprite_tile_{x}_{y}.svg')))
+            self.assertTrue(os.path.isfile(os.path.join(self.temp_dir, f'sheet.aseprite_tile_{x}_{y}.png')))
+        self.assertTrue(os.path.isfile(os.path.join(self.temp_dir, 'sheet.aseprite_tiles.json')))
+
+    def test_export_tiles_shard(self):
+        input_file = os.path.join(self.temp_dir, 'sheet.aseprite')
+        write_sprite(input_file, np.full((6, 4, 4), 255, dtype=np.uint8))
+        svg_files = export_tiles(input_file, self.temp_dir, Size(2, 2), shard=1, shards=2)
+        self.assertEqual([os.path.basename(file) for file in svg_files],
+                         ['sheet.aseprite_tile_0_1.svg', 'sheet.aseprite_tile_1_1.svg'])
+        self.assertTrue(os.path.isfile(os.path.join(self.temp_dir, 'sheet.aseprite_tiles_shard_1.json')))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'sheet.aseprite_tiles.json')))
+
+    def test_export_tiles_formats(self):
+        input_file = os.path.join(self.temp_dir, 'sheet.aseprite')
+        write_sprite(input_file, np.full((2, 2, 4), 255, dtype=np.uint8))
+        self.assertEqual(export_tiles(input_file, self.temp_dir, formats=['png']), [])
+        self.assertTrue(os.path.isfile(os.path.join(self.temp_dir, 'sheet.aseprite_tile_0_0.png')))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'sheet.aseprite_tile_0_0.svg')))
+
+
+if __name__ == '__main__':
+    unittest.main()
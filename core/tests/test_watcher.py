@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+from core.watcher import Watcher
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.files = [os.path.join(self.temp_dir, 'a.aseprite'), os.path.join(self.temp_dir, 'b.aseprite')]
+        self.__write(self.files[0], b'a', 1)
+        self.now = 0.0
+        self.watcher = Watcher(lambda: [file for file in self.files if os.path.isfile(file)], 1.0,
+                               lambda: self.now)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def __write(path: str, content: bytes, mtime: int):
+        with open(path, 'wb') as file:
+            file.write(content)
+        os.utime(path, (mtime, mtime))
+
+    def __poll(self, now: float):
+        self.now = now
+        return self.watcher.poll()
+
+    def test_unchanged(self):
+        self.assertEqual(self.__poll(5), [])
+
+    def test_debounce(self):
+        self.__write(self.files[0], b'ab', 2)
+        self.assertEqual(self.__poll(1), [])
+        # Saved again before the delay: the delay starts over
+        self.__write(self.files[0], b'abc', 3)
+        self.assertEqual(self.__poll(1.5), [])
+        self.assertEqual(self.__poll(2), [])
+        self.assertEqual(self.__poll(2.5), [self.files[0]])
+        self.assertEqual(self.__poll(10), [])
+
+    def test_new_file(self):
+        self.__write(self.files[1], b'b', 1)
+        self.assertEqual(self.__poll(1), [])
+        self.assertEqual(self.__poll(2), [self.files[1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import List
+import numpy as np
+
+DEFAULT_CACHE_SIZE_MB = 1024
+
+
+def default_cache_dir() -> str:
+    base_dir = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base_dir, 'aseprite_to_blender_converter')
+
+
+def tile_key(pixels: np.ndarray, params: dict) -> str:
+    digest = hashlib.sha256()
+    digest.update(str(pixels.shape).encode())
+    digest.update(np.ascontiguousarray(pixels).tobytes())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class TileCache:
+    """Outputs of converted tiles stored by tile key, evicted least recently used first."""
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def __entry(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def fetch(self, key: str, output_dir: str, name: str) -> bool:
+        """Copy the cached files of a tile to output_dir as name + extension."""
+        entry = self.__entry(key)
+        if not os.path.isdir(entry):
+            return False
+        for each in os.listdir(entry):
+            extension = os.path.splitext(each)[1]
+            output_file = os.path.join(output_dir, name + extension)
+            if extension == '.obj':
+                with open(os.path.join(entry, each)) as file:
+                    lines = file.readlines()
+                # The material library is referenced by file name
+                lines[0] = f'mtllib {name}.mtl\n'
+                with open(output_file, 'w') as file:
+                    file.writelines(lines)
+            else:
+                shutil.copyfile(os.path.join(entry, each), output_file)
+        os.utime(entry)
+        return True
+
+    def store(self, key: str, files: List[str]):
+        entry = self.__entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=os.path.dirname(entry))
+        for file in files:
+            shutil.copyfile(file, os.path.join(temp_dir, 'tile' + os.path.splitext(file)[1]))
+        shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.rename(temp_dir, entry)
+        except OSError:
+            # Stored concurrently by another run
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def evict(self):
+        entries = []
+        for prefix in os.listdir(self.directory):
+            prefix_dir = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry = os.path.join(prefix_dir, key)
+                try:
+                    size = sum(os.path.getsize(os.path.join(entry, each)) for each in os.listdir(entry))
+                    entries.append((os.path.getmtime(entry), size, entry))
+                except OSError:
+                    # Evicted or replaced concurrently by another run
+                    continue
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+import numpy as np
+from core.manifest import read_manifest, write_manifest
+from core.tile_cache import tile_key
+
+
+@dataclass
+class TilePlan:
+    # Tile key of every tile by name, in sheet order
+    keys: Dict[str, str] = field(default_factory=dict)
+    # Fully transparent tiles that are not converted
+    empty: Set[str] = field(default_factory=set)
+    # Duplicate tile name -> name of the first tile with the same pixels
+    aliases: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def unique(self) -> List[str]:
+        return [name for name in self.keys if name not in self.empty and name not in self.aliases]
+
+
+def plan_tiles(tiles: Dict[str, np.ndarray], params: dict, skip_empty: bool = False,
+               dedupe: bool = False) -> TilePlan:
+    plan = TilePlan()
+    first_tiles = {}
+    for name, pixels in tiles.items():
+        key = tile_key(pixels, params)
+        plan.keys[name] = key
+        if skip_empty and not pixels[..., 3].any():
+            plan.empty.add(name)
+        elif dedupe and key in first_tiles:
+            plan.aliases[name] = first_tiles[key]
+        else:
+            first_tiles.setdefault(key, name)
+    return plan
+
+
+def mesh_sources(plan: TilePlan) -> Dict[str, str]:
+    """Name of the first tile of every tile key, a combined export builds the mesh of the key from it."""
+    sources = {}
+    for name, key in plan.keys.items():
+        if name not in plan.empty:
+            sources.setdefault(key, name)
+    return sources
+
+
+def combined_path(output: str, input_file: str, extension: str) -> str:
+    return os.path.join(output, f'{os.path.basename(input_file)}_combined{extension}')
+
+
+def aliases_path(output: str, input_file: str) -> str:
+    return os.path.join(output, f'{os.path.basename(input_file)}_aliases.json')
+
+
+def write_aliases(file_path: str, plan: TilePlan):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump({'aliases': plan.aliases, 'empty': [name for name in plan.keys if name in plan.empty]},
+                  file, indent=2)
+
+
+def unlink_shared_outputs(names: List[str], output: str, extensions: List[str]):
+    """Remove the outputs of the tiles that share their file with another path.
+
+    Older runs hard linked duplicates to their original, a converter writing in place into one of them
+    would change both.
+    """
+    files = [os.path.join(output, name + extension) for name in names for extension in extensions]
+    # Both paths of a link are removed, the link count drops with the first one
+    shared = [file for file in files if os.path.isfile(file) and os.stat(file).st_nlink > 1]
+    for file in shared:
+        os.remove(file)
+
+
+def drop_empty_tiles(plan: TilePlan, manifest_file: str):
+    """Remove the tile files of the empty tiles and their paths in the tile manifest.
+
+    The Aseprite exporter writes every tile, the native exporter only lists the empty ones.
+    """
+    manifest = read_manifest(manifest_file)
+    for tile in manifest.tiles:
+        if tile.name not in plan.empty:
+            continue
+        for file in (tile.svg, tile.png):
+            if file is not None and os.path.isfile(file):
+                os.remove(file)
+        tile.svg = tile.png = None
+    write_manifest(manifest_file, manifest)
+
+
+def link_aliases(plan: TilePlan, output: str, extensions: List[str]):
+    """Copy the converted files of every original tile to its duplicates.
+
+    Copies rather than hard links: the next run writes the outputs of a tile in place.
+    """
+    for alias, original in plan.aliases.items():
+        for extension in extensions:
+            source = os.path.join(output, original + extension)
+            target = os.path.join(output, alias + extension)
+            if not os.path.isfile(source):
+                continue
+            if os.path.exists(target):
+                os.remove(target)
+            shutil.copyfile(source, target)
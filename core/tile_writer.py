@@ -0,0 +1,121 @@
+import struct
+import zlib
+from typing import Callable, List, Optional, Set, Tuple
+import numpy as np
+from core.aseprite_file import read_sprite, composite, split_tiles
+from core.config import Size
+from core.manifest import build_manifest, manifest_path, shard_manifest_path, write_manifest
+
+Rectangle = Tuple[int, int, int, int, Tuple[int, int, int, int]]
+
+__SVG_HEADER = ('<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+                '<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" '
+                '"http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n'
+                '<svg version="1.1" width="{width}px" height="{height}px" '
+                'xmlns="http://www.w3.org/2000/svg" shape-rendering="crispEdges">\n')
+
+
+def color_keys(pixels: np.ndarray) -> np.ndarray:
+    """Pack RGBA pixels into uint32 keys, fully transparent pixels become 0."""
+    rgba = pixels.astype(np.uint32)
+    keys = (rgba[..., 0] << 24) | (rgba[..., 1] << 16) | (rgba[..., 2] << 8) | rgba[..., 3]
+    keys[rgba[..., 3] == 0] = 0
+    return keys
+
+
+def key_color(key: int) -> Tuple[int, int, int, int]:
+    return (key >> 24) & 0xFF, (key >> 16) & 0xFF, (key >> 8) & 0xFF, key & 0xFF
+
+
+def greedy_rectangles(pixels: np.ndarray) -> List[Rectangle]:
+    """Cover the opaque pixels with maximal same-color rectangles as (x, y, width, height, rgba)."""
+    keys = color_keys(pixels)
+    height, width = keys.shape
+    free = keys != 0
+    rectangles = []
+    for y, x in zip(*np.nonzero(free)):
+        if not free[y, x]:
+            continue
+        key = keys[y, x]
+        row = (keys[y, x:] == key) & free[y, x:]
+        run = int(np.argmin(row)) if not row.all() else width - x
+        bottom = y + 1
+        while bottom < height and np.all((keys[bottom, x:x + run] == key) & free[bottom, x:x + run]):
+            bottom += 1
+        free[y:bottom, x:x + run] = False
+        rectangles.append((int(x), int(y), run, int(bottom - y), key_color(int(key))))
+    return rectangles
+
+
+def pixel_rectangles(pixels: np.ndarray) -> List[Rectangle]:
+    """One rectangle per opaque pixel, the way Aseprite exports SVG."""
+    keys = color_keys(pixels)
+    return [(int(x), int(y), 1, 1, key_color(int(keys[y, x]))) for y, x in zip(*np.nonzero(keys))]
+
+
+def tile_to_svg(pixels: np.ndarray, merge: bool = True) -> str:
+    height, width = pixels.shape[:2]
+    rectangles = greedy_rectangles(pixels) if merge else pixel_rectangles(pixels)
+    lines = [__SVG_HEADER.format(width=width, height=height)]
+    for x, y, rect_width, rect_height, (r, g, b, a) in rectangles:
+        opacity = '' if a == 255 else f' fill-opacity="{a / 255:.6f}"'
+        lines.append(f'<rect x="{x}" y="{y}" width="{rect_width}" height="{rect_height}" '
+                     f'fill="#{r:02X}{g:02X}{b:02X}"{opacity} />\n')
+    lines.append('</svg>\n')
+    return ''.join(lines)
+
+
+def write_svg(file_path: str, pixels: np.ndarray, merge: bool = True):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(tile_to_svg(pixels, merge))
+
+
+def __png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def png_bytes(pixels: np.ndarray) -> bytes:
+    height, width = pixels.shape[:2]
+    rows = np.ascontiguousarray(pixels, dtype=np.uint8).reshape(height, width * 4)
+    # Every row starts with filter type 0 (None)
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rows]).tobytes()
+    return (b'\x89PNG\r\n\x1a\n'
+            + __png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+            + __png_chunk(b'IDAT', zlib.compress(raw))
+            + __png_chunk(b'IEND', b''))
+
+
+def write_png(file_path: str, pixels: np.ndarray):
+    with open(file_path, 'wb') as file:
+        file.write(png_bytes(pixels))
+
+
+def export_tiles(file_path: str, output: str, size: Optional[Size] = None, names: Optional[Set[str]] = None,
+                 on_svg: Optional[Callable[[str], None]] = None, formats: Optional[List[str]] = None,
+                 shard: int = 0, shards: int = 1) -> List[str]:
+    """Write the SVG and PNG of every tile (or only the named ones) and the tile manifest like convert_to_svg.lua.
+
+    on_svg is called with each svg file as soon as it is written. With shards > 1 only every shards-th tile row
+    starting at row shard is written, to the manifest of the shard.
+    """
+    image = composite(read_sprite(file_path))
+    tiles = split_tiles(image, size.width, size.height) if size is not None else split_tiles(image)
+    manifest = build_manifest(file_path, output, Size(image.shape[1], image.shape[0]), size, formats, shard, shards)
+    svg_files = []
+    for tile in manifest.tiles:
+        if names is not None and tile.name not in names:
+            continue
+        pixels = tiles[(tile.x, tile.y)]
+        if tile.svg is not None:
+            write_svg(tile.svg, pixels)
+            print(f'File exported to SVG: {tile.svg}')
+            if on_svg is not None:
+                on_svg(tile.svg)
+            svg_files.append(tile.svg)
+        if tile.png is not None:
+            write_png(tile.png, pixels)
+            print(f'File exported to PNG: {tile.png}')
+    path = manifest_path(output, file_path) if shards == 1 else shard_manifest_path(output, file_path, shard)
+    write_manifest(path, manifest)
+    print(f'Manifest exported: {path}')
+    return svg_files
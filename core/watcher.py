@@ -0,0 +1,48 @@
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# mtime in ns and size of a file
+FileState = Tuple[int, int]
+
+
+def file_state(path: str) -> Optional[FileState]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Watcher:
+    """Polls files for changes, a file is reported once it stays unchanged for the debounce delay.
+
+    Saving a sprite can write it several times in a row, only the last write is converted.
+    """
+
+    def __init__(self, list_files: Callable[[], List[str]], debounce: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic):
+        self.__list_files = list_files
+        self.__debounce = debounce
+        self.__clock = clock
+        self.__known: Dict[str, FileState] = {path: state for path in list_files()
+                                              for state in [file_state(path)] if state is not None}
+        # Changed files: last state seen and when it was first seen
+        self.__pending: Dict[str, Tuple[FileState, float]] = {}
+
+    def poll(self) -> List[str]:
+        now = self.__clock()
+        ready = []
+        for path in self.__list_files():
+            state = file_state(path)
+            if state is None or state == self.__known.get(path):
+                self.__pending.pop(path, None)
+                continue
+            pending = self.__pending.get(path)
+            if pending is None or pending[0] != state:
+                self.__pending[path] = (state, now)
+            elif now - pending[1] >= self.__debounce:
+                del self.__pending[path]
+                self.__known[path] = state
+                ready.append(path)
+        return ready
@@ -0,0 +1,96 @@
+from typing import Dict
+from PyQt5.QtCore import QObject, pyqtSignal
+from core.aseprite_file import AsepriteFileError, read_sprite_size
+from core.common import export_sheet, convert_svg_files, CancelToken, ConversionCancelled, \
+    SVG_EXPORTED_PREFIX, FBX_EXPORTED_PREFIX, NO_MESH_PREFIX
+from core.config import Size
+from core.manifest import manifest_path, read_manifest
+from core.palette import export_palette
+from core.progress import Progress
+
+
+class ConvertWorker(QObject):
+    """Runs the Aseprite export and the Blender conversion off the UI thread."""
+
+    # Stage, tiles done, tiles total (0 when unknown), seconds left (-1 when unknown)
+    progress = pyqtSignal(str, int, int, float)
+    failed = pyqtSignal(str)
+    # True when the conversion was cancelled
+    finished = pyqtSignal(bool)
+
+    def __init__(self, aseprite_kwargs: Dict[str, str], blender_kwargs: Dict[str, str], jobs: int, svg_only: bool):
+        super(ConvertWorker, self).__init__()
+        self.__aseprite_kwargs = aseprite_kwargs
+        self.__blender_kwargs = blender_kwargs
+        self.__jobs = jobs
+        self.__svg_only = svg_only
+        self.__cancel = CancelToken()
+
+    def cancel(self):
+        self.__cancel.cancel()
+
+    def run(self):
+        try:
+            self.__export()
+            if not self.__svg_only:
+                if '--palette' in self.__blender_kwargs:
+                    self.__export_palette()
+                self.__convert()
+        except ConversionCancelled:
+            pass
+        except Exception as e:
+            if not self.__cancel.cancelled:
+                self.failed.emit(getattr(e, 'message', str(e)))
+        self.finished.emit(self.__cancel.cancelled)
+
+    def __emit(self, stage: str, progress: Progress):
+        eta = progress.eta()
+        self.progress.emit(stage, progress.done, progress.total, -1 if eta is None else eta)
+
+    def __tile_count(self) -> int:
+        try:
+            sheet_width, sheet_height = read_sprite_size(self.__aseprite_kwargs['file'])
+        except AsepriteFileError:
+            return 0
+        width = int(self.__aseprite_kwargs.get('width') or sheet_width)
+        height = int(self.__aseprite_kwargs.get('height') or sheet_height)
+        if not width or not height:
+            return 0
+        return (sheet_width // width) * (sheet_height // height)
+
+    def __export_shards(self) -> int:
+        try:
+            height = read_sprite_size(self.__aseprite_kwargs['file'])[1]
+        except AsepriteFileError:
+            return 1
+        tile_height = int(self.__aseprite_kwargs.get('height') or height)
+        return max(1, min(self.__jobs, height // tile_height if tile_height else 1))
+
+    def __export(self):
+        progress = Progress(self.__tile_count())
+        self.__emit('Exporting', progress)
+
+        def on_line(line: str):
+            if line.startswith(SVG_EXPORTED_PREFIX):
+                progress.advance()
+                self.__emit('Exporting', progress)
+
+        export_sheet(self.__export_shards(), on_line, self.__cancel, **self.__aseprite_kwargs)
+
+    def __export_palette(self):
+        width, height = self.__aseprite_kwargs.get('width'), self.__aseprite_kwargs.get('height')
+        size = Size(int(width), int(height)) if width and height else None
+        export_palette(self.__aseprite_kwargs['file'], self.__aseprite_kwargs['output'], size)
+
+    def __convert(self):
+        tiles = read_manifest(manifest_path(self.__aseprite_kwargs['output'], self.__aseprite_kwargs['file'])).tiles
+        files = [tile.svg for tile in tiles if tile.svg is not None]
+        progress = Progress(len(files))
+        self.__emit('Converting', progress)
+
+        def on_line(line: str):
+            if line.startswith(FBX_EXPORTED_PREFIX) or line.startswith(NO_MESH_PREFIX):
+                progress.advance()
+                self.__emit('Converting', progress)
+
+        convert_svg_files(files, self.__jobs, on_line, self.__cancel, **self.__blender_kwargs)
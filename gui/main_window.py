@@ -1,11 +1,15 @@
 import os
 import argparse
-from typing import Optional
+from typing import Dict, Optional
 from PyQt5.QtWidgets import QMainWindow, QPushButton, QCheckBox, QWidget, \
-    QGridLayout, QLabel, QHBoxLayout, QSizePolicy, QMessageBox, QApplication, QComboBox
-from PyQt5.QtCore import Qt, QFileInfo
-from core.common import INPUT_FILE_EXTENSIONS, call_aseprite_script, call_blender_script, get_files, VERSION
-from core.config import load_config, save_config, Size, PIVOT_VALUES
+    QGridLayout, QLabel, QHBoxLayout, QSizePolicy, QMessageBox, QComboBox, QProgressBar
+from PyQt5.QtCore import Qt, QFileInfo, QThread
+from core.common import INPUT_FILE_EXTENSIONS, default_jobs, VERSION, BlenderPool, start_blender_pool, \
+    use_blender_pool
+from core.config import load_config, save_config, Size, MATERIAL_VALUES, PIVOT_VALUES
+from core.palette import palette_path
+from core.progress import format_duration
+from gui.convert_worker import ConvertWorker
 from gui.file_path_widget import FilePathWidget
 from gui.line_edit_number_widget import LineEditNumberWidget
 from gui.settings_window import SettingsWindow
@@ -68,24 +72,43 @@ class MainWindow(QMainWindow):
         grid.addWidget(QLabel('Pivot:'), 5, 0)
         grid.addWidget(self.__pivot_combobox, 5, 1)
 
+        self.__materials_combobox = QComboBox()
+        for materials in MATERIAL_VALUES:
+            self.__materials_combobox.addItem(materials)
+        grid.addWidget(QLabel('Materials:'), 6, 0)
+        grid.addWidget(self.__materials_combobox, 6, 1)
+
+        self.__jobs_line_edit = LineEditNumberWidget(LineEditNumberWidget.NumberType.UNSIGNED_INT)
+        grid.addWidget(QLabel('Parallel jobs:'), 7, 0)
+        grid.addWidget(self.__jobs_line_edit, 7, 1)
+
         self.__svg_only_check_box = QCheckBox('Generate SVG only without FBX')
-        grid.addWidget(self.__svg_only_check_box, 6, 0, 1, 2)
+        grid.addWidget(self.__svg_only_check_box, 8, 0, 1, 2)
 
         self.__convert_button = QPushButton('Convert')
         self.__convert_button.clicked.connect(self.__process_convert)
-        grid.addWidget(self.__convert_button, 7, 0, 1, 2)
+        grid.addWidget(self.__convert_button, 9, 0, 1, 2)
+
+        self.__progress_bar = QProgressBar()
+        self.__progress_bar.setVisible(False)
+        grid.addWidget(self.__progress_bar, 10, 0, 1, 2)
 
         self.__settings_button = QPushButton('Settings')
         self.__settings_button.clicked.connect(self.__show_settings)
-        grid.addWidget(self.__settings_button, 8, 0, 1, 2, Qt.AlignRight | Qt.AlignBottom)
+        grid.addWidget(self.__settings_button, 11, 0, 1, 2, Qt.AlignRight | Qt.AlignBottom)
 
-        grid.setRowStretch(8, 1)
+        grid.setRowStretch(11, 1)
 
         version_label = QLabel(f'Version: {VERSION}')
         font = version_label.font()
         font.setPointSize(8)
         version_label.setFont(font)
-        grid.addWidget(version_label, 9, 0, 1, 2, Qt.AlignLeft)
+        grid.addWidget(version_label, 12, 0, 1, 2, Qt.AlignLeft)
+
+        self.__thread: Optional[QThread] = None
+        self.__worker: Optional[ConvertWorker] = None
+        # Blender workers stay alive between conversions
+        self.__blender_pool: Optional[BlenderPool] = None
 
         self.__fill_ui(args)
 
@@ -93,7 +116,7 @@ class MainWindow(QMainWindow):
         self.__tile_width_line_edit.setDisabled(not checked)
         self.__tile_height_line_edit.setDisabled(not checked)
 
-    def __run_aseprite(self):
+    def __aseprite_kwargs(self) -> Dict[str, str]:
         kwargs = {
             'file': self.__input_file_widget.line_edit.text(),
             'output': self.__output_dir_widget.line_edit.text()
@@ -101,36 +124,82 @@ class MainWindow(QMainWindow):
         if self.__tile_size_check_box.isChecked():
             kwargs['width'] = self.__tile_width_line_edit.text()
             kwargs['height'] = self.__tile_height_line_edit.text()
-        call_aseprite_script('scripts/aseprite/convert_to_svg.lua', **kwargs)
+        return kwargs
 
-    def __run_blender(self):
+    def __blender_kwargs(self) -> Dict[str, str]:
         kwargs = {
             '-o': self.__output_dir_widget.line_edit.text(),
             '--scale': self.__scale_line_edit.text(),
             '--extrude': self.__extrude_line_edit.text(),
             '--pivot': self.__pivot_combobox.currentText(),
         }
-        filename = os.path.basename(self.__input_file_widget.line_edit.text())
-        files = get_files(self.__output_dir_widget.line_edit.text(), f'{filename}_tile_\\d+_\\d+\\.svg$')
-        for file in files:
-            call_blender_script('scripts/blender/convert_svg_to_fbx.py',
-                                **kwargs, **{'-i': file})
+        if self.__materials_combobox.currentText() == 'palette':
+            kwargs['--palette'] = palette_path(self.__output_dir_widget.line_edit.text(),
+                                               self.__input_file_widget.line_edit.text())
+        return kwargs
+
+    def __jobs(self) -> int:
+        return int(self.__jobs_line_edit.text() or '0') or default_jobs()
 
     def __process_convert(self):
-        try:
+        if self.__worker is not None:
             self.__convert_button.setEnabled(False)
-            QApplication.processEvents()
-            self.__run_aseprite()
-            if not self.__svg_only_check_box.isChecked():
-                self.__run_blender()
-        except Exception as e:
-            self.__show_alert('Exception occurred', f'{e}')
-        finally:
-            self.__convert_button.setEnabled(True)
+            self.__convert_button.setText('Cancelling...')
+            self.__worker.cancel()
+            return
+
+        if self.__blender_pool is None or self.__blender_pool.size != self.__jobs():
+            self.__close_blender_pool()
+            self.__blender_pool = start_blender_pool(self.__jobs())
+            use_blender_pool(self.__blender_pool)
+
+        self.__worker = ConvertWorker(self.__aseprite_kwargs(), self.__blender_kwargs(), self.__jobs(),
+                                      self.__svg_only_check_box.isChecked())
+        self.__thread = QThread()
+        self.__worker.moveToThread(self.__thread)
+        self.__thread.started.connect(self.__worker.run)
+        self.__worker.progress.connect(self.__show_progress)
+        self.__worker.failed.connect(lambda message: self.__show_alert('Exception occurred', message))
+        self.__worker.finished.connect(self.__finish_convert)
+
+        self.__convert_button.setText('Cancel')
+        self.__progress_bar.setVisible(True)
+        self.__thread.start()
+
+    def __show_progress(self, stage: str, done: int, total: int, eta: float):
+        # A maximum of 0 shows a busy indicator while the tile count is unknown
+        self.__progress_bar.setMaximum(total)
+        self.__progress_bar.setValue(min(done, total))
+        text = f'{stage}: {done}/{total} tiles' if total else f'{stage}: {done} tiles'
+        if eta >= 0:
+            text += f', ETA {format_duration(eta)}'
+        self.__progress_bar.setFormat(text)
+
+    def __finish_convert(self, cancelled: bool):
+        self.__thread.quit()
+        self.__thread.wait()
+        self.__thread = None
+        self.__worker = None
+        self.__convert_button.setText('Convert')
+        self.__convert_button.setEnabled(True)
+        if cancelled:
+            self.__progress_bar.setFormat('Cancelled')
+        else:
+            self.__progress_bar.setMaximum(max(1, self.__progress_bar.maximum()))
+            self.__progress_bar.setValue(self.__progress_bar.maximum())
+            self.__progress_bar.setFormat('Done')
 
-    @staticmethod
-    def __show_settings():
+    def __close_blender_pool(self):
+        if self.__blender_pool is not None:
+            use_blender_pool(None)
+            self.__blender_pool.close()
+            self.__blender_pool = None
+
+    def __show_settings(self):
         SettingsWindow().exec()
+        # The blender path may have changed
+        if self.__worker is None:
+            self.__close_blender_pool()
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls() and MainWindow.__validate_drag_and_drop(event.mimeData().urls()[0].toLocalFile()):
@@ -150,6 +219,11 @@ class MainWindow(QMainWindow):
         event.accept()
 
     def closeEvent(self, event):
+        if self.__worker is not None:
+            self.__worker.cancel()
+            self.__thread.quit()
+            self.__thread.wait()
+        self.__close_blender_pool()
         self.setFocus()
         config = load_config()
         if self.__tile_size_check_box.isChecked():
@@ -163,6 +237,8 @@ class MainWindow(QMainWindow):
         config.output = self.__output_dir_widget.line_edit.text()
         config.svg_only = self.__svg_only_check_box.isChecked()
         config.pivot = self.__pivot_combobox.currentText()
+        config.materials = self.__materials_combobox.currentText()
+        config.jobs = self.__jobs()
         save_config(config)
         event.accept()
 
@@ -206,6 +282,12 @@ class MainWindow(QMainWindow):
         if pivot is not None:
             self.__pivot_combobox.setCurrentText(pivot)
 
+        materials = args.materials or config.materials
+        if materials is not None:
+            self.__materials_combobox.setCurrentText(materials)
+
+        self.__jobs_line_edit.setText(str(args.jobs or config.jobs or default_jobs()))
+
         self.__svg_only_check_box.setChecked(config.svg_only)
 
     @staticmethod
@@ -3,6 +3,23 @@ function eprint(...)
     io.stderr:write(table.concat({ ... }, "\t") .. "\n")
 end
 
+-- Print a progress line right away, the converter may start on the tile before the export ends
+function report(message)
+    print(message)
+    io.stdout:flush()
+end
+
+-- Quote a string as a JSON value
+function jsonString(value)
+    local escaped = value:gsub('[%c"\\]', function(c)
+        if c == '"' or c == '\\' then
+            return '\\' .. c
+        end
+        return string.format('\\u%04x', string.byte(c))
+    end)
+    return '"' .. escaped .. '"'
+end
+
 -- Validate required params
 local requiredParams = { 'file', 'output' }
 for _, key in ipairs(requiredParams) do
@@ -29,35 +46,96 @@ local spriteHeight = sprite.height
 
 local filename = app.fs.fileName(filePath)
 local output = app.params['output']
-local tileWidth = app.params['width'] or spriteWidth
-local tileHeight = app.params['height'] or spriteHeight
+local tileWidth = tonumber(app.params['width']) or spriteWidth
+local tileHeight = tonumber(app.params['height']) or spriteHeight
+
+-- Output formats: svg, png or both separated by a comma
+local formats = {}
+for format in string.gmatch(app.params['formats'] or 'svg,png', '[^,]+') do
+    if format ~= 'svg' and format ~= 'png' then
+        eprint('Unknown format: ' .. format)
+        return 1
+    end
+    formats[format] = true
+end
 
 local numTilesX = math.floor(spriteWidth / tileWidth)
 local numTilesY = math.floor(spriteHeight / tileHeight)
 
-for y = 0, numTilesY - 1 do
+-- Sharded export: this process writes every shards-th tile row starting at row shard
+local shard = tonumber(app.params['shard']) or 0
+local shards = tonumber(app.params['shards']) or 1
+if shards < 1 or shard < 0 or shard >= shards then
+    eprint('Invalid shard: ' .. tostring(app.params['shard']) .. ' of ' .. tostring(app.params['shards']))
+    return 1
+end
+
+-- Flatten the first frame once, every tile is copied from it
+local flatImage = Image(sprite.spec)
+flatImage:drawSprite(sprite, 1)
+
+-- One small sprite is reused for every tile
+local tileSprite = Sprite(tileWidth, tileHeight, sprite.colorMode)
+if sprite.colorMode == ColorMode.INDEXED then
+    tileSprite:setPalette(sprite.palettes[1])
+    tileSprite.transparentColor = sprite.transparentColor
+end
+local tileCel = tileSprite.cels[1]
+
+-- Save the tile sprite in the format, return the file path or nil on failure
+function saveTile(tileName, format)
+    local tileFilePath = app.fs.joinPath(output, tileName .. '.' .. format)
+    if false == tileSprite:saveCopyAs(tileFilePath) then
+        eprint('Failed to save file: ' .. tileFilePath)
+        return nil
+    end
+    report('File exported to ' .. string.upper(format) .. ': ' .. tileFilePath)
+    return tileFilePath
+end
+
+local manifestTiles = {}
+
+for y = shard, numTilesY - 1, shards do
     for x = 0, numTilesX - 1 do
         local startX = x * tileWidth
         local startY = y * tileHeight
-        sprite:crop(startX, startY, tileWidth, tileHeight)
-
-        local svgFileName = string.format('%s_tile_%d_%d.svg', filename, x, y)
-        local svgFilePath = app.fs.joinPath(output, svgFileName)
-
-        if false == sprite:saveAs(svgFilePath) then
-            eprint('Failed to save file: ' .. svgFilePath)
-            return 1
+        local tileImage = Image(tileWidth, tileHeight, sprite.colorMode)
+        if sprite.colorMode == ColorMode.INDEXED then
+            tileImage:clear(sprite.transparentColor)
         end
-        print('File exported to SVG: ' .. svgFilePath)
+        tileImage:drawImage(flatImage, Point(-startX, -startY))
+        tileCel.image = tileImage
 
-        local pngFileName = string.format('%s_tile_%d_%d.png', filename, x, y)
-        local pngFilePath = app.fs.joinPath(output, pngFileName)
-
-        if false == sprite:saveAs(pngFilePath) then
-            eprint('Failed to save file: ' .. pngFilePath)
-            return 1
+        local tileName = string.format('%s_tile_%d_%d', filename, x, y)
+        local paths = {}
+        for _, format in ipairs({ 'svg', 'png' }) do
+            if formats[format] then
+                paths[format] = saveTile(tileName, format)
+                if not paths[format] then
+                    return 1
+                end
+            end
         end
-        print('File exported to PNG: ' .. pngFilePath)
-        app.command.Undo()
+
+        table.insert(manifestTiles, string.format(
+            '{"name": %s, "x": %d, "y": %d, "bounds": [%d, %d, %d, %d], "svg": %s, "png": %s}',
+            jsonString(tileName), x, y, startX, startY, tileWidth, tileHeight,
+            paths.svg and jsonString(paths.svg) or 'null', paths.png and jsonString(paths.png) or 'null'))
     end
-end
\ No newline at end of file
+end
+tileSprite:close()
+
+-- Tile manifest for the conversion step, the manifests of the shards are merged by the converter
+local manifestFilePath = app.fs.joinPath(output, filename .. '_tiles.json')
+if app.params['shards'] then
+    manifestFilePath = app.fs.joinPath(output, filename .. '_tiles_shard_' .. shard .. '.json')
+end
+local manifestFile = io.open(manifestFilePath, 'w')
+if not manifestFile then
+    eprint('Failed to save file: ' .. manifestFilePath)
+    return 1
+end
+manifestFile:write(string.format('{"file": %s, "tile_width": %d, "tile_height": %d, "tiles": [\n  %s\n]}\n',
+    jsonString(filePath), tileWidth, tileHeight, table.concat(manifestTiles, ',\n  ')))
+manifestFile:close()
+print('Manifest exported: ' .. manifestFilePath)
@@ -4,36 +4,93 @@ import numpy as np
 import math
 import os
 import argparse
+import json
 import sys
+import time
 
+# Blender does not put the directory of a -P script on sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from geometry import diagonal_edges, edge_faces, enclosed_walls, group_colors, has_translucent_texels, \
+    linear_to_srgb, loop_faces, merge_grid, nearest_texels, texel_uvs  # noqa: E402
+from svg_mesh import read_svg_shapes, svg_mesh  # noqa: E402
 
-def find_material_index(obj, material):
-    for i, m in enumerate(obj.data.materials):
-        if m == material:
-            return i
-    return -1
+# Size of one SVG pixel after import_curve.svg (90 DPI user units in meters)
+SVG_PIXEL_SIZE = 0.3048 / 12.0 / 90.0
+MERGE_VALUES = ['pairs', 'grid']
+SVG_IMPORT_VALUES = ['curve', 'direct']
+# Prefix of the stdout line that answers a job in --serve mode
+WORKER_RESULT_PREFIX = 'WORKER_RESULT '
+# Prefix of the stdout line with the mesh statistics and phase timings of a converted tile
+TILE_STATS_PREFIX = 'Tile stats: '
 
 
 def combine_materials_by_color(obj):
-    color_poly = []
-    for i, poly in obj.data.polygons.items():
-        material = obj.data.materials[poly.material_index]
-        color = material.diffuse_color
-        color_poly.append(color)
-
-    obj.data.materials.clear()
-
-    unique_materials = {}
-    for i, color in enumerate(color_poly):
-        color_str = f"{color[0]:.3f}_{color[1]:.3f}_{color[2]:.3f}"
-        if color_str not in unique_materials:
-            material = bpy.data.materials.new(name=f"Color_{color_str}")
-            material.diffuse_color = color
-            unique_materials[color_str] = material
-            obj.data.materials.append(material)
-        else:
-            material = unique_materials[color_str]
-        obj.data.polygons[i].material_index = find_material_index(obj, material)
+    mesh = obj.data
+    if not mesh.materials or not mesh.polygons:
+        return
+    material_colors = np.array([material.diffuse_color[:] for material in mesh.materials], dtype=np.float64)
+    material_indices = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('material_index', material_indices)
+
+    colors, polygon_materials = group_colors(material_colors[material_indices])
+
+    mesh.materials.clear()
+    for color in colors:
+        name = f"Color_{color[0]:.3f}_{color[1]:.3f}_{color[2]:.3f}"
+        # Tiles of a combined export share their materials
+        material = bpy.data.materials.get(name) or bpy.data.materials.new(name=name)
+        material.diffuse_color = color
+        mesh.materials.append(material)
+    mesh.polygons.foreach_set('material_index', polygon_materials.astype(np.int32))
+    mesh.update()
+
+
+def palette_material(image, translucent):
+    """A material showing the texel under each face, shared by every tile using the palette image.
+
+    Alpha blended only when the palette has translucent colors, opaque materials sort and render faster.
+    """
+    name = f'Palette_{image.name}'
+    material = bpy.data.materials.get(name)
+    if material is not None:
+        # A persistent worker reuses the material with the reloaded image of the sheet
+        material.blend_method = 'BLEND' if translucent else 'OPAQUE'
+        return material
+    material = bpy.data.materials.new(name=name)
+    material.use_nodes = True
+    bsdf = material.node_tree.nodes['Principled BSDF']
+    texture = material.node_tree.nodes.new('ShaderNodeTexImage')
+    texture.image = image
+    texture.interpolation = 'Closest'
+    material.node_tree.links.new(texture.outputs['Color'], bsdf.inputs['Base Color'])
+    material.node_tree.links.new(texture.outputs['Alpha'], bsdf.inputs['Alpha'])
+    material.blend_method = 'BLEND' if translucent else 'OPAQUE'
+    return material
+
+
+def assign_palette(obj, palette_file_path):
+    """Replace the materials of the object by the palette material and map every face to the texel of its color."""
+    mesh = obj.data
+    if not mesh.materials or not mesh.polygons:
+        return
+    image = bpy.data.images.load(palette_file_path, check_existing=True)
+    # A persistent worker keeps the image of an earlier conversion of the sheet
+    image.reload()
+    width, height = image.size
+    texels = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(texels)
+    material_colors = linear_to_srgb([material.diffuse_color[:3] for material in mesh.materials])
+    material_uvs = texel_uvs(nearest_texels(material_colors, texels), width, height)
+
+    polygon_materials = foreach_get(mesh.polygons, 'material_index')
+    loops = loop_faces(foreach_get(mesh.polygons, 'loop_start'), foreach_get(mesh.polygons, 'loop_total'))
+    uv_layer = mesh.uv_layers.new(name='Palette')
+    uv_layer.data.foreach_set('uv', material_uvs[polygon_materials[loops]].astype(np.float32).ravel())
+
+    mesh.materials.clear()
+    mesh.materials.append(palette_material(image, has_translucent_texels(texels)))
+    mesh.polygons.foreach_set('material_index', np.zeros(len(mesh.polygons), dtype=np.int32))
+    mesh.update()
 
 
 def reduce_polygons(obj):
@@ -42,125 +99,479 @@ def reduce_polygons(obj):
     bmesh.update_edit_mesh(obj.data)
 
 
-def merge_triangles(obj):
-    bm = bmesh.from_edit_mesh(obj.data)
-    for face in bm.faces:
-        if len(face.edges) == 3:
-            for edge in face.edges:
-                coords1 = np.array(edge.verts[0].co)
-                coords2 = np.array(edge.verts[1].co)
-                diff = np.setxor1d(coords1, coords2)
-                if len(diff) > 2:
-                    bmesh.ops.dissolve_edges(bm, edges=[edge])
-                    break
-    bmesh.update_edit_mesh(obj.data)
+def foreach_get(collection, attribute, width=1, dtype=np.int32):
+    values = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(attribute, values)
+    return values.reshape(-1, width) if width > 1 else values
 
 
-# Get input arguments
-double_dash_index = sys.argv.index('--') if '--' in sys.argv else -1
-if double_dash_index != -1 and double_dash_index + 1 < len(sys.argv):
-    additional_args = sys.argv[double_dash_index + 1:]
-else:
-    additional_args = []
-
-parser = argparse.ArgumentParser(prog=f'{os.path.basename(sys.argv[0])} -b -P {os.path.basename(__file__)}',
-                                 usage='%(prog)s -- [options]',
-                                 add_help=False)
-parser.add_argument('-i', '--input', help='svg file', required=True)
-parser.add_argument('-o', '--output', help='output directory', required=True)
-parser.add_argument('--scale', help='scale', default=1, type=float)
-parser.add_argument('--extrude', help='extrude factor', default=1, type=float)
-parser.add_argument('--pivot', help='model pivot', default='center', choices=['center', 'bottom'])
-args = parser.parse_args(additional_args)
-
-try:
-    # Cleanup scene
-    bpy.ops.object.select_all(action='DESELECT')
-    bpy.ops.object.select_by_type(type='MESH')
-    bpy.ops.object.delete()
-
-    # Import svg
-    svg_file_path = args.input
-    output_file_path = os.path.join(args.output, os.path.splitext(os.path.basename(svg_file_path))[0] + '.fbx')
-    scale_float = args.scale
-    extrude_float = args.extrude
-    pivot = args.pivot
-    bpy.ops.import_curve.svg(filepath=svg_file_path)
+def face_keys(mesh):
+    """Faces whose materials have the same color share a key."""
+    colors = np.array([material.diffuse_color[:] for material in mesh.materials], dtype=np.float64)
+    material_keys = group_colors(colors)[1] if len(colors) else np.zeros(1, dtype=np.int64)
+    return material_keys[foreach_get(mesh.polygons, 'material_index')]
+
+
+def merge_triangles(mesh):
+    """Dissolve the diagonal of every coplanar same-color triangle pair in a single dissolve_edges call."""
+    coords = foreach_get(mesh.vertices, 'co', 3, np.float32).astype(np.float64)
+    edge_vertices = foreach_get(mesh.edges, 'vertices', 2)
+    loop_totals = foreach_get(mesh.polygons, 'loop_total')
+    faces = edge_faces(foreach_get(mesh.loops, 'edge_index'),
+                       loop_faces(foreach_get(mesh.polygons, 'loop_start'), loop_totals), len(mesh.edges))
+    normals = foreach_get(mesh.polygons, 'normal', 3, np.float32).astype(np.float64)
+    edges = diagonal_edges(coords[edge_vertices], faces, loop_totals, normals, face_keys(mesh))
+    if not len(edges):
+        return
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bm.edges.ensure_lookup_table()
+    bmesh.ops.dissolve_edges(bm, edges=[bm.edges[i] for i in edges])
+    bm.to_mesh(mesh)
+    bm.free()
+
+
+def face_bounds(mesh):
+    """x0, y0, x1, y1 of every face."""
+    coords = foreach_get(mesh.vertices, 'co', 3, np.float32).astype(np.float64)
+    loop_coords = coords[foreach_get(mesh.loops, 'vertex_index')]
+    faces = loop_faces(foreach_get(mesh.polygons, 'loop_start'), foreach_get(mesh.polygons, 'loop_total'))
+    low = np.full((len(mesh.polygons), 3), np.inf)
+    high = np.full((len(mesh.polygons), 3), -np.inf)
+    np.minimum.at(low, faces, loop_coords)
+    np.maximum.at(high, faces, loop_coords)
+    return np.hstack([low[:, :2], high[:, :2]])
+
+
+def rectangle_footprints(mesh):
+    """Bounds of the faces that are axis-aligned rectangles."""
+    bounds = face_bounds(mesh)
+    areas = foreach_get(mesh.polygons, 'area', 1, np.float32).astype(np.float64)
+    bound_areas = (bounds[:, 2] - bounds[:, 0]) * (bounds[:, 3] - bounds[:, 1])
+    return bounds[np.abs(bound_areas - areas) <= bound_areas * 1e-3]
 
-    # Select CURVE objects
-    bpy.ops.object.select_all(action='DESELECT')
-    bpy.ops.object.select_by_type(type='CURVE')
+
+def merge_grid_rectangles(mesh):
+    """Rebuild the flat mesh from maximal same-color rectangles, False when its faces are not a pixel grid."""
+    normals = foreach_get(mesh.polygons, 'normal', 3, np.float32)
+    if not len(normals) or np.abs(normals[:, 2]).min() < 1 - 1e-6:
+        return False
+    coords = foreach_get(mesh.vertices, 'co', 3, np.float32).astype(np.float64)
+    keys = face_keys(mesh)
+    areas = foreach_get(mesh.polygons, 'area', 1, np.float32).astype(np.float64)
+    merged = merge_grid(face_bounds(mesh), areas, keys, SVG_PIXEL_SIZE / 1000)
+    if merged is None:
+        return False
+    points, outlines, merged_keys = merged
+
+    # Every merged face takes the material of the first face with its key
+    unique_keys, first_faces = np.unique(keys, return_index=True)
+    key_materials = np.zeros(unique_keys.max() + 1, dtype=np.int64)
+    key_materials[unique_keys] = foreach_get(mesh.polygons, 'material_index')[first_faces]
+    flip = normals[:, 2].sum() < 0
+    z = float(coords[:, 2].mean())
+    bm = bmesh.new()
+    verts = [bm.verts.new((x, y, z)) for x, y in points]
+    for outline, key in zip(outlines, merged_keys):
+        face = bm.faces.new([verts[i] for i in (outline[::-1] if flip else outline)])
+        face.material_index = int(key_materials[key])
+    bm.to_mesh(mesh)
+    bm.free()
+    return True
+
+
+def finish_walls(mesh, footprints, segments):
+    """Drop the side faces hidden between touching faces and split the others into segments along the depth."""
+    normals = foreach_get(mesh.polygons, 'normal', 3, np.float32).astype(np.float64)
+    centers = foreach_get(mesh.polygons, 'center', 3, np.float32).astype(np.float64)
+    walls = np.flatnonzero(np.abs(normals[:, 2]) < 1e-6)
+    hidden = walls[enclosed_walls(centers[walls, :2], normals[walls, :2], footprints, SVG_PIXEL_SIZE / 100)]
+    coords = foreach_get(mesh.vertices, 'co', 3, np.float32).astype(np.float64)
+    edge_coords = coords[foreach_get(mesh.edges, 'vertices', 2)]
+    edge_delta = np.abs(edge_coords[:, 1] - edge_coords[:, 0])
+    vertical = np.flatnonzero((edge_delta[:, :2].max(axis=1) < SVG_PIXEL_SIZE / 1000) & (edge_delta[:, 2] > 0))
+
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bm.faces.ensure_lookup_table()
+    bm.edges.ensure_lookup_table()
+    vertical_edges = [bm.edges[i] for i in vertical]
+    bmesh.ops.delete(bm, geom=[bm.faces[i] for i in hidden], context='FACES')
+    if segments > 1:
+        bmesh.ops.subdivide_edges(bm, edges=[edge for edge in vertical_edges if edge.is_valid],
+                                  cuts=segments - 1, use_grid_fill=True)
+    bm.to_mesh(mesh)
+    bm.free()
+
+
+def reset_scene():
+    if bpy.context.object is not None and bpy.context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+    for collection in list(bpy.data.collections):
+        bpy.data.collections.remove(collection)
+    for data in [bpy.data.meshes, bpy.data.curves, bpy.data.materials]:
+        for block in list(data):
+            if block.users == 0:
+                data.remove(block)
+    bpy.context.scene.cursor.location = (0, 0, 0)
+
+
+def import_svg_curves(svg_file_path):
+    """Import the svg with import_curve.svg and join its curves into a single mesh object.
+
+    Objects already in the scene, like the other tiles of a combined export, are left alone.
+    """
+    existing = set(bpy.context.scene.objects)
+    bpy.ops.import_curve.svg(filepath=svg_file_path)
+    imported = [obj for obj in bpy.context.scene.objects if obj not in existing]
 
     # Convert CURVE to MESH
-    for obj in bpy.context.selected_objects:
-        if obj.type == 'CURVE':
-            bpy.context.view_layer.objects.active = obj
-            bpy.ops.object.convert(target='MESH')
+    bpy.ops.object.select_all(action='DESELECT')
+    curves = [obj for obj in imported if obj.type == 'CURVE']
+    if curves:
+        for obj in curves:
+            obj.select_set(True)
+        bpy.context.view_layer.objects.active = curves[0]
+        bpy.ops.object.convert(target='MESH')
 
     # Select converted objects
     bpy.ops.object.select_all(action='DESELECT')
-    bpy.ops.object.select_by_type(type='MESH')
-
-    if bpy.context.selected_objects:
-        # Bound Box
-        #  z
-        #  | y
-        #  |/__x
-        #   [2]------[6]
-        #   /|       /|
-        # [1]+-----[5]|
-        #  | |      | |
-        #  |[3]-----+[7]
-        #  |/       |/
-        # [0]------[4]
-
-        bounding_box = bpy.context.selected_objects[0].bound_box
-        width = (bounding_box[6][0] - bounding_box[0][0])
-
-        bpy.context.view_layer.objects.active = bpy.context.selected_objects[0]
-        bpy.ops.object.join()
-
-        obj = bpy.context.view_layer.objects.active
-
-        bpy.ops.object.mode_set(mode='EDIT')
-        reduce_polygons(obj)
-        merge_triangles(obj)
-
-        bpy.ops.mesh.select_all(action='SELECT')
+    meshes = [obj for obj in imported if obj.type == 'MESH']
+    if not meshes:
+        return None
+    for obj in meshes:
+        obj.select_set(True)
+
+    bpy.context.view_layer.objects.active = meshes[0]
+    bpy.ops.object.join()
+    return bpy.context.view_layer.objects.active
+
+
+def import_svg_mesh(svg_file_path):
+    """Build a single mesh object from the rects and paths of the svg, without curve objects."""
+    vertices, faces, face_colors, colors = svg_mesh(read_svg_shapes(svg_file_path), SVG_PIXEL_SIZE)
+    if not faces:
+        return None
+    name = os.path.splitext(os.path.basename(svg_file_path))[0]
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(vertices.tolist(), [], faces)
+    for color in colors:
+        material = bpy.data.materials.new(name='SVGMat')
+        material.diffuse_color = color
+        mesh.materials.append(material)
+    mesh.polygons.foreach_set('material_index', face_colors.astype(np.int32))
+    mesh.update()
+
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.collection.objects.link(obj)
+    bpy.ops.object.select_all(action='DESELECT')
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+    return obj
+
+
+def build_tile_object(svg_file_path, scale_float, extrude_float, pivot, merge='pairs', segments=None,
+                      svg_import='curve', seconds=None, palette=None):
+    """Import, merge and extrude a tile into a mesh object at the world origin.
+
+    Returns the object and the position of its pivot relative to the top left corner of the tile,
+    None when the svg has no faces. seconds gets the time of the import, cleanup and extrude phases.
+    With the path of a palette image the faces use one palette material instead of a material per color.
+    """
+    seconds = {} if seconds is None else seconds
+    phase_start = time.perf_counter()
+    obj = None
+    if svg_import == 'direct':
+        try:
+            obj = import_svg_mesh(svg_file_path)
+        except ValueError as e:
+            print(f'Direct import not possible, using import_curve.svg: {svg_file_path}: {e}')
+            svg_import = 'curve'
+    if svg_import == 'curve':
+        obj = import_svg_curves(svg_file_path)
+
+    if obj is None:
+        print(f'No objects of type MESH: {svg_file_path}')
+        return None
+    seconds['import'] = time.perf_counter() - phase_start
+    phase_start = time.perf_counter()
+
+    # Bound Box
+    #  z
+    #  | y
+    #  |/__x
+    #   [2]------[6]
+    #   /|       /|
+    # [1]+-----[5]|
+    #  | |      | |
+    #  |[3]-----+[7]
+    #  |/       |/
+    # [0]------[4]
+
+    bounding_box = obj.bound_box
+    # Extrude by whole pixels: merged rects make the first object wider than one pixel
+    width = SVG_PIXEL_SIZE
+
+    bpy.ops.object.mode_set(mode='EDIT')
+    reduce_polygons(obj)
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    face_count = len(obj.data.polygons)
+    start = time.perf_counter()
+    merge_triangles(obj.data)
+    if merge == 'grid' and not merge_grid_rectangles(obj.data):
+        print(f'Grid merge skipped, faces are not a pixel grid: {svg_file_path}')
+    print(f'Faces merged: {face_count} -> {len(obj.data.polygons)} '
+          f'in {(time.perf_counter() - start) * 1000:.1f} ms: {svg_file_path}')
+    seconds['cleanup'] = time.perf_counter() - phase_start
+    phase_start = time.perf_counter()
+
+    footprints = rectangle_footprints(obj.data) if segments is not None else None
+    bpy.ops.object.mode_set(mode='EDIT')
+    bpy.ops.mesh.select_all(action='SELECT')
+    if segments is None:
         for _ in range(math.floor(extrude_float)):
             bpy.ops.mesh.extrude_region_move(TRANSFORM_OT_translate={'value': (0, 0, width)})
         fractional_part = extrude_float % 1
         if fractional_part > 0:
             bpy.ops.mesh.extrude_region_move(TRANSFORM_OT_translate={'value': (0, 0, width * fractional_part)})
         bpy.ops.object.mode_set(mode='OBJECT')
+    elif extrude_float > 0:
+        # The full depth in one step, side faces do not grow with the extrude factor
+        bpy.ops.mesh.extrude_region_move(TRANSFORM_OT_translate={'value': (0, 0, width * extrude_float)})
+        bpy.ops.object.mode_set(mode='OBJECT')
+        finish_walls(obj.data, footprints, segments)
+    else:
+        bpy.ops.object.mode_set(mode='OBJECT')
 
-        obj.scale.x *= scale_float
-        obj.scale.y *= scale_float
-        obj.scale.z *= scale_float
+    obj.scale.x *= scale_float
+    obj.scale.y *= scale_float
+    obj.scale.z *= scale_float
 
-        obj.rotation_euler.x = math.radians(90)
+    obj.rotation_euler.x = math.radians(90)
 
-        apply_rotation = False
-        apply_scale = True
-        bpy.ops.object.transform_apply(location=False, rotation=apply_rotation, scale=apply_scale)
+    apply_rotation = False
+    apply_scale = True
+    bpy.ops.object.transform_apply(location=False, rotation=apply_rotation, scale=apply_scale)
 
-        bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', center='BOUNDS')
+    bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', center='BOUNDS')
+    origin = obj.location.copy()
+    obj.location = (0, 0, 0)
+    if pivot == 'bottom':
+        scale = 1 if apply_scale else scale_float
+        if apply_rotation:
+            offset = bounding_box[1][2] - bounding_box[0][2]
+        else:
+            offset = bounding_box[3][1] - bounding_box[0][1]
+        bpy.context.scene.cursor.location = (0, 0, -offset * scale / 2)
+        bpy.ops.object.origin_set(type='ORIGIN_CURSOR')
+        origin += bpy.context.scene.cursor.location
         obj.location = (0, 0, 0)
-        if pivot == 'bottom':
-            scale = 1 if apply_scale else scale_float
-            if apply_rotation:
-                offset = bounding_box[1][2] - bounding_box[0][2]
-            else:
-                offset = bounding_box[3][1] - bounding_box[0][1]
-            bpy.context.scene.cursor.location = (0, 0, -offset * scale / 2)
-            bpy.ops.object.origin_set(type='ORIGIN_CURSOR')
-            obj.location = (0, 0, 0)
 
+    if palette is not None:
+        assign_palette(obj, palette)
+    else:
         combine_materials_by_color(obj)
+    seconds['extrude'] = time.perf_counter() - phase_start
+    return obj, tuple(origin)
+
+
+def tile_stats(svg_file_path, obj, seconds):
+    return {'file': svg_file_path, 'vertices': len(obj.data.vertices), 'faces': len(obj.data.polygons),
+            'materials': len(obj.data.materials), 'seconds': seconds}
+
+
+def convert_svg_to_fbx(svg_file_path, output_dir, scale_float, extrude_float, pivot, merge='pairs', segments=None,
+                       svg_import='curve', palette=None):
+    output_file_path = os.path.join(output_dir, os.path.splitext(os.path.basename(svg_file_path))[0] + '.fbx')
+    seconds = {}
+    tile = build_tile_object(svg_file_path, scale_float, extrude_float, pivot, merge, segments, svg_import, seconds,
+                             palette)
+    if tile is None:
+        return
+    obj = tile[0]
+
+    phase_start = time.perf_counter()
+    bpy.ops.export_scene.fbx(filepath=output_file_path, use_selection=True, add_leaf_bones=False)
+    seconds['export'] = time.perf_counter() - phase_start
+    print(f'File exported to FBX: {output_file_path}')
+    print(TILE_STATS_PREFIX + json.dumps(tile_stats(svg_file_path, obj, seconds)))
+
+
+def combine_tiles(args):
+    """Export the tiles of a sheet into one FBX, every tile key is converted once and instanced at each position.
+
+    The --combine JSON file has the output file, the tile size, the svg of every tile key
+    {"output", "tile_width", "tile_height", "meshes": {key: svg}, "tiles": [{"name", "key", "x", "y"}]}.
+    Instances are linked duplicates sharing the mesh data of their key.
+    """
+    with open(args.combine, encoding='utf-8') as file:
+        job = json.load(file)
+    reset_scene()
+    tiles = {}
+    for key, svg_file_path in job['meshes'].items():
+        seconds = {}
+        tile = build_tile_object(svg_file_path, args.scale, args.extrude, args.pivot, args.merge, args.segments,
+                                 args.svg_import, seconds, args.palette)
+        if tile is not None:
+            tiles[key] = tile
+            seconds['export'] = 0
+            print(TILE_STATS_PREFIX + json.dumps(tile_stats(svg_file_path, tile[0], seconds)))
+        bpy.ops.object.select_all(action='DESELECT')
+
+    # A tile is one pixel size per pixel, the y of the svg is the -z of the rotated objects
+    tile_size = SVG_PIXEL_SIZE * args.scale
+    placed = set()
+    instances = []
+    for each in job['tiles']:
+        if each['key'] not in tiles:
+            continue
+        obj, origin = tiles[each['key']]
+        if each['key'] in placed:
+            obj = obj.copy()
+            bpy.context.collection.objects.link(obj)
+        placed.add(each['key'])
+        obj.name = each['name']
+        obj.location = (each['x'] * job['tile_width'] * tile_size + origin[0], origin[1],
+                        -each['y'] * job['tile_height'] * tile_size + origin[2])
+        instances.append(obj)
+
+    if not instances:
+        print(f'No objects of type MESH: {args.combine}')
+        return
+    phase_start = time.perf_counter()
+    for obj in instances:
+        obj.select_set(True)
+    bpy.ops.export_scene.fbx(filepath=job['output'], use_selection=True, add_leaf_bones=False)
+    print(f'File exported to FBX: {job["output"]} ({len(tiles)} meshes, {len(instances)} tiles, '
+          f'{time.perf_counter() - phase_start:.2f} s)')
 
-        bpy.ops.export_scene.fbx(filepath=output_file_path, use_selection=True, add_leaf_bones=False)
+
+class JobArgumentParser(argparse.ArgumentParser):
+    """Reports invalid job arguments to the worker loop instead of exiting Blender."""
+
+    def error(self, message):
+        raise ValueError(message)
+
+
+def build_parser(parser_class=argparse.ArgumentParser):
+    parser = parser_class(prog=f'{os.path.basename(sys.argv[0])} -b -P {os.path.basename(__file__)}',
+                          usage='%(prog)s -- [options]',
+                          add_help=False)
+    parser.add_argument('-i', '--input', help='svg files', nargs='+', default=[])
+    parser.add_argument('--input_list', help='text file with one svg file path per line')
+    parser.add_argument('-o', '--output', help='output directory')
+    parser.add_argument('--scale', help='scale', default=1, type=float)
+    parser.add_argument('--extrude', help='extrude factor', default=1, type=float)
+    parser.add_argument('--pivot', help='model pivot', default='center', choices=['center', 'bottom'])
+    parser.add_argument('--merge', help='face merge: triangle pairs or maximal rectangles of the pixel grid',
+                        default='pairs', choices=MERGE_VALUES)
+    parser.add_argument('--segments', help='extrude the full depth in one step with this many side segments',
+                        type=int)
+    parser.add_argument('--svg_import', help='svg import: import_curve.svg or a mesh built from the svg rects',
+                        default='curve', choices=SVG_IMPORT_VALUES)
+    parser.add_argument('--palette', help='palette png of the sheet: one textured material and a UV per face '
+                                          'instead of a material per color')
+    parser.add_argument('--serve', help='convert jobs read from stdin until it is closed',
+                        default=False, action='store_true')
+    parser.add_argument('--combine', help='JSON file of the tiles of a sheet to export into one fbx '
+                                          'with a shared mesh per tile key')
+    return parser
+
+
+def validate_args(parser, args):
+    if args.input_list is not None:
+        with open(args.input_list, encoding='utf-8') as input_list:
+            args.input += [line.strip() for line in input_list if line.strip()]
+    if args.segments is not None and args.segments < 1:
+        parser.error('argument --segments: must be at least 1')
+    if args.combine is not None:
+        return args
+    if args.output is None:
+        parser.error('the following arguments are required: -o/--output')
+    if not args.input:
+        parser.error('one of the arguments -i/--input --input_list is required')
+    return args
+
+
+def parse_args():
+    # Get input arguments
+    double_dash_index = sys.argv.index('--') if '--' in sys.argv else -1
+    if double_dash_index != -1 and double_dash_index + 1 < len(sys.argv):
+        additional_args = sys.argv[double_dash_index + 1:]
     else:
-        print('No objects of type MESH')
-except Exception as e:
-    print(f"{e}", file=sys.stderr)
-    sys.exit(1)
+        additional_args = []
+
+    parser = build_parser()
+    args = parser.parse_args(additional_args)
+    return args if args.serve else validate_args(parser, args)
+
+
+def convert_files(args):
+    """Convert every input file in this Blender session, return the files that failed with their errors."""
+    failed = []
+    # The scene is reset between files
+    for svg_file_path in args.input:
+        try:
+            reset_scene()
+            convert_svg_to_fbx(svg_file_path, args.output, args.scale, args.extrude, args.pivot, args.merge,
+                               args.segments, args.svg_import, args.palette)
+        except Exception as e:
+            print(f"{svg_file_path}: {e}", file=sys.stderr)
+            failed.append({'file': svg_file_path, 'error': str(e)})
+    return failed
+
+
+def memory_mb():
+    """Peak memory of this Blender process, None where the platform does not report it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def serve():
+    """Convert jobs until stdin is closed.
+
+    Every stdin line is a JSON job {"id": ..., "args": [...]} with the command line arguments of a conversion.
+    Every job is answered by one stdout line WORKER_RESULT_PREFIX + JSON {"id", "failed", "error", "memory"}.
+    """
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = build_parser(JobArgumentParser)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        result = {'id': None, 'failed': [], 'error': None}
+        try:
+            job = json.loads(line)
+            result['id'] = job.get('id')
+            result['failed'] = convert_files(validate_args(parser, parser.parse_args(job['args'])))
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            result['error'] = str(e)
+        reset_scene()
+        if hasattr(bpy.data, 'orphans_purge'):
+            bpy.data.orphans_purge(do_recursive=True)
+        result['memory'] = memory_mb()
+        print(WORKER_RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def main():
+    args = parse_args()
+    if args.serve:
+        serve()
+        return
+    if args.combine is not None:
+        combine_tiles(args)
+        return
+    # One Blender session converts every file
+    if convert_files(args):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
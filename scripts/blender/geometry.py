@@ -0,0 +1,194 @@
+"""Mesh helpers of convert_svg_to_fbx.py that only need NumPy, so they run without Blender."""
+import numpy as np
+
+# Colors closer than this per channel share a material, like the 3 decimals of the material name
+COLOR_DECIMALS = 3
+
+
+def group_colors(colors, decimals=COLOR_DECIMALS):
+    """Group RGBA colors by their RGB rounded to decimals, in order of first appearance.
+
+    Returns the first color of every group and the group index of every color.
+    """
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 4)
+    if not len(colors):
+        return colors, np.zeros(0, dtype=np.int64)
+    channels = np.round(colors[:, :3] * 10 ** decimals).astype(np.int64)
+    channels -= channels.min(axis=0)
+    # One integer per color: np.unique on a flat array is much faster than along axis 0
+    keys = np.ravel_multi_index(channels.T, channels.max(axis=0) + 1)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return colors[first[order]], rank[inverse.reshape(-1)]
+
+
+def loop_faces(loop_starts, loop_totals):
+    """The face of every loop, from the loop_start and loop_total of every face."""
+    loop_starts = np.asarray(loop_starts, dtype=np.int64)
+    loop_totals = np.asarray(loop_totals, dtype=np.int64)
+    offsets = np.arange(loop_totals.sum()) - np.repeat(np.cumsum(loop_totals) - loop_totals, loop_totals)
+    faces = np.empty(len(offsets), dtype=np.int64)
+    faces[np.repeat(loop_starts, loop_totals) + offsets] = np.repeat(np.arange(len(loop_totals)), loop_totals)
+    return faces
+
+
+def edge_faces(loop_edges, faces_of_loops, edge_count):
+    """The two faces of every edge as an (E, 2) array, -1 for edges that do not have exactly two faces."""
+    loop_edges = np.asarray(loop_edges, dtype=np.int64)
+    counts = np.bincount(loop_edges, minlength=edge_count)
+    order = np.argsort(loop_edges, kind='stable')
+    starts = np.cumsum(counts) - counts
+    two = np.flatnonzero(counts == 2)
+    faces = np.full((edge_count, 2), -1, dtype=np.int64)
+    faces[two, 0] = faces_of_loops[order[starts[two]]]
+    faces[two, 1] = faces_of_loops[order[starts[two] + 1]]
+    return faces
+
+
+def diagonal_edges(edge_coords, faces_of_edges, face_sizes, face_normals, face_keys, tolerance=1e-6):
+    """Diagonals shared by two coplanar triangles with the same key in an axis-aligned plane.
+
+    Every triangle is paired at most once, so dissolving the returned edges turns each pair into a quad.
+    """
+    edge_coords = np.asarray(edge_coords, dtype=np.float64)
+    face_normals = np.asarray(face_normals, dtype=np.float64)
+    face_sizes = np.asarray(face_sizes)
+    face_keys = np.asarray(face_keys)
+    shared = (faces_of_edges >= 0).all(axis=1)
+    first, second = np.where(shared[:, None], faces_of_edges, 0).T
+    diagonal = (np.abs(edge_coords[:, 1] - edge_coords[:, 0]) > tolerance).sum(axis=1) >= 2
+    triangles = (face_sizes[first] == 3) & (face_sizes[second] == 3)
+    coplanar = (face_normals[first] * face_normals[second]).sum(axis=1) > 1 - tolerance
+    axis_aligned = np.abs(face_normals[first]).max(axis=1) > 1 - tolerance
+    candidates = np.flatnonzero(shared & diagonal & triangles & coplanar & axis_aligned
+                                & (face_keys[first] == face_keys[second]))
+
+    # A triangle with several candidate edges keeps the first one
+    owner = np.full(len(face_sizes), -1, dtype=np.int64)
+    pair_faces = faces_of_edges[candidates]
+    owned_faces, first_use = np.unique(pair_faces.reshape(-1), return_index=True)
+    owner[owned_faces] = candidates[first_use // 2]
+    return candidates[(owner[pair_faces[:, 0]] == candidates) & (owner[pair_faces[:, 1]] == candidates)]
+
+
+def greedy_cells(grid):
+    """Cover the non-zero cells of a key grid with maximal same-key rectangles as (x0, y0, x1, y1, key)."""
+    height, width = grid.shape
+    free = grid != 0
+    rectangles = []
+    for y, x in zip(*np.nonzero(free)):
+        if not free[y, x]:
+            continue
+        key = grid[y, x]
+        row = (grid[y, x:] == key) & free[y, x:]
+        run = int(np.argmin(row)) if not row.all() else width - x
+        bottom = y + 1
+        while bottom < height and np.all((grid[bottom, x:x + run] == key) & free[bottom, x:x + run]):
+            bottom += 1
+        free[y:bottom, x:x + run] = False
+        rectangles.append((int(x), int(y), int(x + run), int(bottom), int(key)))
+    return rectangles
+
+
+def rectangle_outlines(rectangles):
+    """Counter-clockwise outlines of the rectangles through every corner of another rectangle on their sides.
+
+    Neighbouring faces then share their edges, so an extruded region has no walls inside it.
+    Returns the points and the point indices of every outline.
+    """
+    corners = np.array([corner for x0, y0, x1, y1, _ in rectangles
+                        for corner in [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]]).reshape(-1, 2)
+    points = np.unique(corners, axis=0)
+    xs, ys = points[:, 0], points[:, 1]
+    outlines = []
+    for x0, y0, x1, y1, _ in rectangles:
+        sides = [(ys == y0) & (xs >= x0) & (xs < x1), (xs == x1) & (ys >= y0) & (ys < y1),
+                 (ys == y1) & (xs > x0) & (xs <= x1), (xs == x0) & (ys > y0) & (ys <= y1)]
+        keys = [xs, ys, -xs, -ys]
+        outline = []
+        for side, key in zip(sides, keys):
+            indices = np.flatnonzero(side)
+            outline += indices[np.argsort(key[indices])].tolist()
+        outlines.append(outline)
+    return points, outlines
+
+
+def snap_coordinates(values, tolerance):
+    """Sorted distinct coordinates, values closer than tolerance count as one, and the index of every value."""
+    values = np.asarray(values, dtype=np.float64)
+    ordered = np.sort(values.reshape(-1))
+    distinct = ordered[np.concatenate([[True], np.diff(ordered) > tolerance])]
+    return distinct, np.searchsorted(distinct, values + tolerance, side='right') - 1
+
+
+def merge_grid(face_bounds, face_areas, face_keys, tolerance=1e-7):
+    """Merge axis-aligned rectangular faces into maximal rectangles with the same key.
+
+    face_bounds holds x0, y0, x1, y1 of every face in its plane.
+    Returns the points, the outlines and the key of every merged face,
+    or None when a face is not a rectangle or faces overlap.
+    """
+    face_bounds = np.asarray(face_bounds, dtype=np.float64).reshape(-1, 4)
+    face_keys = np.asarray(face_keys)
+    if not len(face_bounds):
+        return None
+    bound_areas = (face_bounds[:, 2] - face_bounds[:, 0]) * (face_bounds[:, 3] - face_bounds[:, 1])
+    if np.abs(bound_areas - np.asarray(face_areas)).max() > tolerance * (face_bounds.max() - face_bounds.min()):
+        return None
+
+    # Compress the coordinates into a grid of cells
+    xs, x_cells = snap_coordinates(face_bounds[:, [0, 2]], tolerance)
+    ys, y_cells = snap_coordinates(face_bounds[:, [1, 3]], tolerance)
+    grid = np.zeros((len(ys) - 1, len(xs) - 1), dtype=np.int64)
+    for (x0, x1), (y0, y1), key in zip(x_cells, y_cells, face_keys):
+        if grid[y0:y1, x0:x1].any():
+            return None
+        grid[y0:y1, x0:x1] = key + 1
+
+    rectangles = greedy_cells(grid)
+    points, outlines = rectangle_outlines(rectangles)
+    return (np.stack([xs[points[:, 0]], ys[points[:, 1]]], axis=1), outlines,
+            np.array([key - 1 for *_, key in rectangles], dtype=np.int64))
+
+
+def enclosed_walls(centers, normals, footprints, offset):
+    """Side faces with a face footprint on both sides, hidden between touching faces after extrusion.
+
+    centers and normals are in the plane of the footprints, footprints hold x0, y0, x1, y1 of the faces.
+    """
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    normals = np.asarray(normals, dtype=np.float64).reshape(-1, 2)
+    footprints = np.asarray(footprints, dtype=np.float64).reshape(-1, 4)
+    probes = centers[:, None] + np.array([1, -1])[None, :, None] * normals[:, None] * offset
+    x, y = probes[..., 0, None], probes[..., 1, None]
+    inside = ((x > footprints[:, 0]) & (x < footprints[:, 2]) & (y > footprints[:, 1]) & (y < footprints[:, 3]))
+    return np.flatnonzero(inside.any(axis=2).all(axis=1))
+
+
+def linear_to_srgb(values):
+    """Material colors back in the sRGB of the palette image."""
+    values = np.clip(np.asarray(values, dtype=np.float64), 0, 1)
+    return np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1 / 2.4) - 0.055)
+
+
+def nearest_texels(colors, texels):
+    """Index of the texel closest in RGB to every color, texels with zero alpha pad the image and are skipped."""
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    texels = np.asarray(texels, dtype=np.float64).reshape(-1, 4)
+    candidates = np.flatnonzero(texels[:, 3] > 0)
+    distances = ((colors[:, None] - texels[None, candidates, :3]) ** 2).sum(axis=2)
+    return candidates[distances.argmin(axis=1)]
+
+
+def has_translucent_texels(texels):
+    """Whether a palette color is partly transparent, texels with zero alpha pad the image and are skipped."""
+    alpha = np.asarray(texels, dtype=np.float64).reshape(-1, 4)[:, 3]
+    return bool(((alpha > 0) & (alpha < 1)).any())
+
+
+def texel_uvs(indices, width, height):
+    """UV of the center of every texel, indices count rows from the bottom like Image.pixels."""
+    indices = np.asarray(indices, dtype=np.int64)
+    return np.column_stack([(indices % width + 0.5) / width, (indices // width + 0.5) / height])
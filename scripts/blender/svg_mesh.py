@@ -0,0 +1,141 @@
+"""Flat mesh from the rects and straight-line paths of a tile SVG, without import_curve.svg or bpy."""
+import re
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+
+PATH_TOKEN = re.compile(r'[A-Za-z]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+STYLE_ITEM = re.compile(r'\s*([\w-]+)\s*:\s*([^;]+)')
+
+
+def srgb_to_linear(values):
+    """Material colors in linear RGB, like the SVG importer."""
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def parse_color(value):
+    """RGB in 0..1 of an SVG color, None for 'none'."""
+    value = value.strip().lower()
+    if value == 'none':
+        return None
+    if value.startswith('#') and len(value) == 4:
+        return [int(c * 2, 16) / 255 for c in value[1:]]
+    if value.startswith('#') and len(value) == 7:
+        return [int(value[i:i + 2], 16) / 255 for i in (1, 3, 5)]
+    if value.startswith('rgb(') and value.endswith(')'):
+        return [min(max(float(c), 0), 255) / 255 for c in value[4:-1].split(',')]
+    raise ValueError(f'Unsupported fill color: {value}')
+
+
+def element_fill(element):
+    """RGBA in 0..1 of an element from its fill attributes or style, None when it is not filled."""
+    attributes = dict(element.attrib)
+    attributes.update(STYLE_ITEM.findall(element.get('style', '')))
+    color = parse_color(attributes.get('fill', '#000000'))
+    if color is None:
+        return None
+    opacity = float(attributes.get('fill-opacity', 1)) * float(attributes.get('opacity', 1))
+    return color + [opacity]
+
+
+def path_polygons(d):
+    """Polygons of the subpaths of a path made of M, L, H, V and Z commands."""
+    tokens = PATH_TOKEN.findall(d)
+    polygons, polygon = [], []
+    x = y = 0.0
+    command = None
+    i = 0
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+            if command in 'Zz':
+                if len(polygon) > 2:
+                    polygons.append(polygon)
+                x, y = polygon[0] if polygon else (x, y)
+                polygon = []
+                continue
+        if command is None or command not in 'MmLlHhVv':
+            raise ValueError(f'Unsupported path command: {command}')
+        relative = command.islower()
+        if command in 'Hh':
+            x = float(tokens[i]) + (x if relative else 0)
+            i += 1
+        elif command in 'Vv':
+            y = float(tokens[i]) + (y if relative else 0)
+            i += 1
+        else:
+            x, y = (float(tokens[i]) + (x if relative else 0), float(tokens[i + 1]) + (y if relative else 0))
+            i += 2
+        if command in 'Mm':
+            if len(polygon) > 2:
+                polygons.append(polygon)
+            polygon = []
+            # Coordinates after a moveto are lineto
+            command = 'l' if relative else 'L'
+        polygon.append((x, y))
+    if len(polygon) > 2:
+        polygons.append(polygon)
+    return polygons
+
+
+def read_svg_shapes(svg_file_path):
+    """Filled polygons of the rects and paths of an SVG as (points, rgba) in SVG user units.
+
+    Raises ValueError for transforms, curves and other content that needs import_curve.svg.
+    """
+    shapes = []
+    for element in ElementTree.parse(svg_file_path).iter():
+        tag = element.tag.rsplit('}', 1)[-1]
+        if element.get('transform') is not None:
+            raise ValueError(f'Unsupported transform on {tag}')
+        if tag in ('circle', 'ellipse', 'line', 'polyline', 'polygon', 'text', 'use', 'image'):
+            raise ValueError(f'Unsupported element: {tag}')
+        if tag not in ('rect', 'path'):
+            continue
+        fill = element_fill(element)
+        if fill is None:
+            continue
+        if tag == 'rect':
+            x, y = float(element.get('x', 0)), float(element.get('y', 0))
+            width, height = float(element.get('width', 0)), float(element.get('height', 0))
+            if width > 0 and height > 0:
+                shapes.append(([(x, y), (x + width, y), (x + width, y + height), (x, y + height)], fill))
+        else:
+            shapes += [(polygon, fill) for polygon in path_polygons(element.get('d', ''))]
+    return shapes
+
+
+def signed_area(points):
+    x, y = points[:, 0], points[:, 1]
+    return np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y) / 2
+
+
+def svg_mesh(shapes, pixel_size):
+    """Vertices, faces, the color index of every face and the linear RGBA colors of the shapes.
+
+    SVG y grows down, so it is flipped and every face winds counter-clockwise with its normal along +Z.
+    Vertices at the same position are shared, like after remove_doubles.
+    """
+    polygons = [np.asarray(polygon, dtype=np.float64) for polygon, _ in shapes]
+    keep = [i for i, polygon in enumerate(polygons) if abs(signed_area(polygon)) > 0]
+    if not keep:
+        return np.zeros((0, 3)), [], np.zeros(0, dtype=np.int64), np.zeros((0, 4))
+    polygons = [polygons[i] for i in keep]
+    sizes = np.array([len(polygon) for polygon in polygons])
+    positions, indices = np.unique(np.round(np.concatenate(polygons), 6), axis=0, return_inverse=True)
+    indices = indices.reshape(-1)
+    vertices = np.column_stack([positions[:, 0], -positions[:, 1], np.zeros(len(positions))]) * pixel_size
+
+    faces = []
+    for start, size in zip(np.cumsum(sizes) - sizes, sizes):
+        face = indices[start:start + size]
+        face = face[np.concatenate([[True], face[1:] != face[:-1]])]
+        if len(face) > 1 and face[0] == face[-1]:
+            face = face[:-1]
+        faces.append(face.tolist() if signed_area(vertices[face]) > 0 else face[::-1].tolist())
+
+    fills = np.array([shapes[i][1] for i in keep], dtype=np.float64)
+    colors, face_colors = np.unique(fills, axis=0, return_inverse=True)
+    colors = np.column_stack([srgb_to_linear(colors[:, :3]), colors[:, 3]])
+    return vertices, faces, face_colors.reshape(-1), colors